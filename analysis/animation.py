@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# animation.py
+
+import os
+import struct
+import sys
+
+import numpy as np
+
+from analysis import frame_parser as fp
+from analysis import plotter
+from analysis import rejection
+
+# The colours of the animation palette, the last entry of the GIF
+# palette is the white background of pixels without a hit
+PALETTE_COLORS = 255
+BACKGROUND = (255, 255, 255)
+
+# The largest code of the GIF flavour of LZW, which uses 12 bit codes
+GIF_MAX_CODE = 4095
+
+
+def _lzw_encode(indices, min_code_size=8):
+    """Compress palette indices with the variable length LZW of GIF
+
+    Parameters
+    ----------
+    indices : (bytes)
+            The palette index of each pixel
+    min_code_size : (int)
+            The number of bits in each palette index
+
+    Returns
+    -------
+    data : (bytes)
+        The packed LZW codes, starting with a clear code and ending
+        with an end of information code
+    """
+    clear = 1 << min_code_size
+    end = clear + 1
+    out = bytearray()
+    bits = 0
+    num_bits = 0
+    size = min_code_size + 1
+
+    def emit(code):
+        nonlocal bits, num_bits
+        bits |= code << num_bits
+        num_bits += size
+        while num_bits >= 8:
+            out.append(bits & 0xff)
+            bits >>= 8
+            num_bits -= 8
+
+    table = {}
+    next_code = end + 1
+    emit(clear)
+    prefix = indices[0] if indices else None
+    for index in indices[1:]:
+        key = (prefix << 8) | index
+        code = table.get(key)
+        if code is not None:
+            prefix = code
+            continue
+        emit(prefix)
+        if next_code <= GIF_MAX_CODE:
+            table[key] = next_code
+            next_code += 1
+            # The decoder adds each entry a code later than the encoder
+            size = min(12, max(min_code_size + 1,
+                               (next_code - 1).bit_length()))
+        else:
+            emit(clear)
+            table = {}
+            next_code = end + 1
+            size = min_code_size + 1
+        prefix = index
+    if prefix is not None:
+        emit(prefix)
+    emit(end)
+    if num_bits:
+        out.append(bits & 0xff)
+    return bytes(out)
+
+
+def _gif_sub_blocks(data):
+    """Split data into the length prefixed sub-blocks of GIF"""
+    blocks = [bytes([len(data[k:k + 255])]) + data[k:k + 255]
+              for k in range(0, len(data), 255)]
+    return b''.join(blocks) + b'\x00'
+
+
+class _GIFWriter:
+    """Write frames of palette indices as an animated GIF
+
+    Each frame is compressed and written as soon as it is given, so
+    only one frame is held in memory at a time.
+
+    Parameters
+    ----------
+    file_name : (string)
+            Path to the GIF
+    shape : (tuple (int, int))
+            The (rows, cols) of every frame
+    palette : (ndarray)
+            The (256, 3) uint8 RGB colour of each index
+    delay : (int)
+            The time each frame is shown for, in hundredths of a second
+    """
+
+    def __init__(self, file_name, shape, palette, delay=10):
+        self._file = open(file_name, 'wb')
+        self._delay = delay
+        rows, cols = shape
+        self._shape = shape
+        self._file.write(b'GIF89a')
+        # A global colour table of 2 ** 8 colours
+        self._file.write(struct.pack('<HHBBB', cols, rows, 0xf7, 0, 0))
+        self._file.write(np.asarray(palette, dtype=np.uint8).tobytes())
+        # Loop the animation forever
+        self._file.write(b'\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00')
+
+    def write(self, indices):
+        """Write a (rows, cols) array of palette indices as a frame"""
+        rows, cols = self._shape
+        self._file.write(struct.pack(
+            '<BBBBHBB', 0x21, 0xf9, 4, 0, self._delay, 0, 0))
+        self._file.write(struct.pack('<BHHHHB', 0x2c, 0, 0, cols, rows, 0))
+        self._file.write(b'\x08')
+        data = _lzw_encode(np.asarray(indices, dtype=np.uint8).tobytes())
+        self._file.write(_gif_sub_blocks(data))
+
+    def close(self):
+        if not self._file.closed:
+            self._file.write(b'\x3b')
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class _PNGSequenceWriter:
+    """Write frames of palette indices as numbered PNG images
+
+    The images are named frame_00000.png, frame_00001.png and so on in
+    the directory, which is created if needed.
+    """
+
+    def __init__(self, directory, shape, palette, delay=10):
+        os.makedirs(directory, exist_ok=True)
+        self._directory = directory
+        self._palette = np.asarray(palette, dtype=np.uint8)
+        self._number = 0
+
+    def write(self, indices):
+        """Write a (rows, cols) array of palette indices as an image"""
+        file_name = os.path.join(
+            self._directory, "frame_{:05}.png".format(self._number))
+        with open(file_name, 'wb') as f:
+            f.write(plotter._encode_png(self._palette[indices]))
+        self._number += 1
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class _RawWriter:
+    """Write frames of palette indices as raw 8 bit RGB frames
+
+    The frames are written one after the other without any header, as
+    read by external encoders such as
+    `ffmpeg -f rawvideo -pix_fmt rgb24 -s 256x256 -i frames.raw`.
+    """
+
+    def __init__(self, file_name, shape, palette, delay=10):
+        self._file = open(file_name, 'wb')
+        self._palette = np.asarray(palette, dtype=np.uint8)
+
+    def write(self, indices):
+        """Write a (rows, cols) array of palette indices as a frame"""
+        self._file.write(self._palette[indices].tobytes())
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# The animation formats along with the writer for each
+ANIMATION_WRITERS = {
+    'gif': _GIFWriter,
+    'png': _PNGSequenceWriter,
+    'raw': _RawWriter}
+
+
+def _palette():
+    """Get the 'Reds' animation palette, followed by the background"""
+    return np.vstack([plotter._colormap_table(num=PALETTE_COLORS),
+                      BACKGROUND]).astype(np.uint8)
+
+
+def _color_scale(frames):
+    """Find the smallest and largest unmasked count of all the frames
+
+    The frames are read one at a time.
+
+    Parameters
+    ----------
+    frames : (iterable (SparseFrame))
+            The frames of the animation
+
+    Returns
+    -------
+    scale : (tuple (number, number))
+        The smallest and largest count, or (0, 0) if there are none
+    """
+    low, high = np.inf, -np.inf
+    for frame in frames:
+        values = frame.values.compressed()
+        if values.size:
+            low = min(low, values.min())
+            high = max(high, values.max())
+    if low > high:
+        return (0, 0)
+    return (low, high)
+
+
+def _iter_sparse_frames(file_names, outliers=None, outlier_method='std',
+                        hot_pixels=None, failures=None):
+    """Load the frame files one at a time, masking any outliers and hot
+    pixels
+
+    Files that cannot be read are reported and added to failures, and
+    the rest of the files are still loaded.
+
+    Returns
+    -------
+    frames : (iterator (string, SparseFrame))
+            Each file that could be read along with its frame
+    """
+    for file_name in file_names:
+        try:
+            frame = plotter._load_sparse_frame(
+                file_name, hot_pixels=hot_pixels)
+        except (OSError, ValueError) as err:
+            print("Failed to read {}: {}".format(file_name, err),
+                  file=sys.stderr)
+            if failures is not None:
+                failures.append((file_name, err))
+            continue
+        if outliers is not None:
+            frame = rejection._mask_outliers(frame, outliers, outlier_method)
+        yield file_name, frame
+
+
+def _write_animation(file_names, output, animation_format='gif', fps=10,
+                     outliers=None, outlier_method='std', hot_pixels=None):
+    """Write the frames of files as an animation
+
+    The frames are read twice, one at a time: first to find the colour
+    scale shared by every frame, then to colour and write each frame.
+
+    Parameters
+    ----------
+    file_names : (list (string))
+            The paths of the frame files, in the order to show them
+    output : (string)
+            The GIF or raw file to write, or the directory to write
+            numbered PNG images to
+    animation_format : (string)
+            One of ANIMATION_WRITERS
+    fps : (number)
+            The frames shown per second by a GIF
+    outliers : (float)
+            The value to be used in outlier calculations
+    outlier_method : (string)
+            The criterion outliers are found by, one of
+            rejection.OUTLIER_METHODS
+    hot_pixels : (ndarray)
+            A boolean mask of fp.FRAME_SHAPE whose hits are masked
+            before finding outliers, or None
+
+    Returns
+    -------
+    (scale, failures) : (tuple (number, number), [(string, Exception)])
+        The counts given the first and last colours of the palette, and
+        each file that could not be read along with its error. Those
+        files are left out of the animation.
+    """
+    if animation_format not in ANIMATION_WRITERS:
+        raise ValueError(
+            "Unknown animation format: {}".format(animation_format))
+    failures = []
+    scale = _color_scale(frame for _, frame in _iter_sparse_frames(
+        file_names, outliers, outlier_method, hot_pixels, failures))
+    failed = {file_name for file_name, _ in failures}
+    file_names = [name for name in file_names if name not in failed]
+    delay = max(1, round(100 / fps))
+    writer_class = ANIMATION_WRITERS[animation_format]
+    with writer_class(output, fp.FRAME_SHAPE, _palette(),
+                      delay) as writer:
+        for count, (file_name, frame) in enumerate(
+                _iter_sparse_frames(
+                    file_names, outliers, outlier_method, hot_pixels,
+                    failures),
+                1):
+            writer.write(plotter._colormap_indices(
+                frame, PALETTE_COLORS, scale))
+            print("[{}/{}] Encoded {}".format(
+                count, len(file_names), file_name))
+    return scale, failures
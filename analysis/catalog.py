@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# catalog.py
+
+import os
+import sqlite3
+import sys
+
+from analysis import dsc_parser as dscp
+from analysis import frame_parser as fp
+
+DEFAULT_CATALOG = "rayleigh.db"
+
+# The catalog columns holding Frame fields, along with their types and
+# the Frame attribute they are taken from
+FRAME_COLUMNS = [
+    ('acquisition_mode', 'INTEGER', '_acquisition_mode'),
+    ('acquisition_time', 'REAL', '_acquisition_time'),
+    ('bias_voltage', 'REAL', '_bias_voltage'),
+    ('chipboard_id', 'TEXT', '_chipboard_id'),
+    ('start_time', 'REAL', '_acquisition_start_time'),
+    ('start_time_string', 'TEXT', '_acquisition_start_time_string'),
+    ('hw_timer_mode', 'INTEGER', '_hw_timer_mode'),
+    ('medipix_type', 'INTEGER', '_medipix_type'),
+    ('detector_polarity', 'INTEGER', '_detector_polarity'),
+    ('pixelman_version', 'TEXT', '_pixelman_version')]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS frames (
+    dsc_path TEXT PRIMARY KEY,
+    frame_path TEXT NOT NULL,
+    frame_number INTEGER,
+    dsc_size INTEGER NOT NULL,
+    dsc_mtime INTEGER NOT NULL,
+    {columns}
+);
+CREATE INDEX IF NOT EXISTS frames_bias_voltage ON frames (bias_voltage);
+CREATE INDEX IF NOT EXISTS frames_acquisition_time
+    ON frames (acquisition_time);
+CREATE INDEX IF NOT EXISTS frames_start_time ON frames (start_time);
+CREATE INDEX IF NOT EXISTS frames_chipboard_id ON frames (chipboard_id);
+""".format(columns=",\n    ".join(
+    "{} {}".format(name, sql_type) for name, sql_type, _ in FRAME_COLUMNS))
+
+
+def _connect(catalog_path):
+    """Open the catalog, creating its tables if needed"""
+    connection = sqlite3.connect(catalog_path)
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def _find_dsc_files(directory, extension=".dsc"):
+    """Get the path of every file with extension below directory"""
+    found = []
+    for root, _, files in os.walk(directory):
+        found.extend(os.path.join(root, name) for name in files
+                     if name.endswith(extension))
+    return sorted(found)
+
+
+def _frame_row(dsc_path, frame, stat):
+    """Get the catalog row for a parsed .dsc file"""
+    frame_path = dsc_path[:-len(".dsc")]
+    try:
+        number = fp._get_frame_file_number(frame_path, ".txt")
+    except ValueError:
+        number = None
+    values = [getattr(frame, attribute) for _, _, attribute in FRAME_COLUMNS]
+    return [dsc_path, frame_path, number, stat.st_size,
+            stat.st_mtime_ns] + values
+
+
+def _index_directory(directory, catalog_path=DEFAULT_CATALOG, jobs=1):
+    """Add the .dsc files below a directory to the catalog
+
+    Only the files that are new or whose size or modification time has
+    changed since they were last indexed are parsed, and files that
+    have been removed are dropped from the catalog.
+
+    Parameters
+    ----------
+    directory : (string)
+            The directory to search for .dsc files, including all of
+            its subdirectories
+    catalog_path : (string), optional
+            Path to the SQLite catalog, which is created if missing
+    jobs : (int), optional
+            The number of worker processes to parse the files with.
+            The default (1) parses the files in this process, 0 uses
+            one worker per CPU.
+
+    Returns
+    -------
+    counts : (dict)
+            The number of files that were 'added', 'updated', 'removed',
+            'unchanged' and 'failed'.
+    """
+    directory = os.path.realpath(directory)
+    counts = dict.fromkeys(
+        ['added', 'updated', 'removed', 'unchanged', 'failed'], 0)
+    # Compared exactly, as LIKE would ignore the case of the directory
+    prefix = directory + os.sep
+    connection = _connect(catalog_path)
+    with connection:
+        indexed = {
+            path: (size, mtime) for path, size, mtime in connection.execute(
+                "SELECT dsc_path, dsc_size, dsc_mtime FROM frames "
+                "WHERE substr(dsc_path, 1, ?) = ?",
+                (len(prefix), prefix))}
+        to_parse = []
+        stats = {}
+        reindexed = set()
+        for path in _find_dsc_files(directory):
+            stat = os.stat(path)
+            old = indexed.pop(path, None)
+            if old == (stat.st_size, stat.st_mtime_ns):
+                counts['unchanged'] += 1
+                continue
+            if old is not None:
+                reindexed.add(path)
+            stats[path] = stat
+            to_parse.append(path)
+        rows = []
+        results = fp._map_files(dscp._parse_dsc_file, to_parse, jobs)
+        for path, (frame, err) in zip(to_parse, results):
+            if err is not None:
+                print("Failed to index {}: {}".format(path, err),
+                      file=sys.stderr)
+                counts['failed'] += 1
+                if path in reindexed:
+                    # The old entry no longer describes the file
+                    indexed[path] = None
+                continue
+            rows.append(_frame_row(path, frame, stats[path]))
+            counts['updated' if path in reindexed else 'added'] += 1
+        connection.executemany(
+            "INSERT OR REPLACE INTO frames VALUES ({})".format(
+                ",".join("?" * (5 + len(FRAME_COLUMNS)))), rows)
+        connection.executemany(
+            "DELETE FROM frames WHERE dsc_path = ?",
+            [(path,) for path in indexed])
+        counts['removed'] = len(indexed) - sum(
+            path in reindexed for path in indexed)
+    connection.close()
+    return counts
+
+
+def _query_catalog(catalog_path=DEFAULT_CATALOG, **criteria):
+    """Select frames from the catalog
+
+    Parameters
+    ----------
+    catalog_path : (string), optional
+            Path to the SQLite catalog
+    criteria : (keyword arguments)
+            Any of the FRAME_COLUMNS names to select frames whose value
+            is equal to the one given, or a column name prefixed with
+            'min_' or 'max_' to select frames whose value is at least or
+            at most the one given. Criteria that are None are ignored.
+
+    Returns
+    -------
+    frame_paths : ([string])
+            The paths of the frame files of the matching frames, ordered
+            by start time and then by path.
+    """
+    columns = [name for name, _, _ in FRAME_COLUMNS]
+    conditions = []
+    values = []
+    for key, value in sorted(criteria.items()):
+        if value is None:
+            continue
+        operator = '='
+        column = key
+        if key.startswith('min_'):
+            operator, column = '>=', key[len('min_'):]
+        elif key.startswith('max_'):
+            operator, column = '<=', key[len('max_'):]
+        if column not in columns:
+            raise ValueError("Unknown catalog column: {}".format(column))
+        conditions.append("{} {} ?".format(column, operator))
+        values.append(value)
+    query = "SELECT frame_path FROM frames"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY start_time, frame_path"
+    if not os.path.exists(catalog_path):
+        raise FileNotFoundError(
+            "No such catalog: {}".format(catalog_path))
+    connection = _connect(catalog_path)
+    with connection:
+        paths = [path for path, in connection.execute(query, values)]
+    connection.close()
+    return paths
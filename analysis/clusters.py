@@ -0,0 +1,492 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# clusters.py
+
+import os
+
+import numpy as np
+
+from analysis import frame_parser as fp
+
+# The columns of a cluster table, one row per cluster: the frame the
+# cluster is in, its number of pixels, the total count of its pixels,
+# its count weighted centroid and its bounding box
+CLUSTER_COLUMNS = ['frame', 'size', 'charge', 'x', 'y',
+                   'x_min', 'x_max', 'y_min', 'y_max']
+
+# The shape features of a cluster, added to its table with
+# features=True: its length and width along and across its principal
+# axis, from the second moments of its pixels, its linearity (1 - the
+# ratio of the eigenvalues of the covariance of its pixels, 0 for a
+# round cluster and 1 for a line), the fraction of its length by width
+# rectangle that is hit, its mean count per pixel and the index of its
+# class in CLUSTER_CLASSES
+FEATURE_COLUMNS = ['length', 'width', 'linearity', 'density',
+                   'mean_charge', 'class']
+
+# The classes of cluster morphology, checked in this order: small
+# clusters are dots or blobs, thick and filled ones are heavy tracks,
+# and the rest are straight or curly tracks by their linearity
+CLUSTER_CLASSES = ['dot', 'small_blob', 'heavy_track', 'straight_track',
+                   'curly_track']
+
+# The limits of the classes
+DOT_MAX_SIZE = 2
+BLOB_MAX_SIZE = 8
+TRACK_MIN_LENGTH = 5
+# Tracks 3 pixels wide measure 2.8 to 3.6 at any angle, and those 2
+# pixels wide 1.6 to 2.4, so heavy tracks are told apart halfway
+HEAVY_MIN_WIDTH = 2.5
+HEAVY_MIN_DENSITY = 0.6
+STRAIGHT_MIN_LINEARITY = 0.95
+
+
+def _pixel_keys(frames, xs, ys):
+    """Get a key for each hit that orders hits by frame, x and then y"""
+    rows, cols = fp.FRAME_SHAPE
+    return (frames.astype(np.int64) * rows + xs) * cols + ys
+
+
+def _neighbour_pairs(keys, xs, ys):
+    """Find the pairs of adjacent hits
+
+    Each hit is paired with the hits after it in (frame, x, y) order
+    that touch it: the next hit if it is at (x, y + 1), and the hits
+    from (x + 1, y - 1) to (x + 1, y + 1), which come one after another
+    from a single binary search. The hits before it find it the same
+    way, so together these are all eight neighbours.
+
+    Parameters
+    ----------
+    keys : (ndarray)
+            The sorted _pixel_keys of the hits
+    xs, ys : (ndarray)
+            The coordinates of the hits, in the same order
+
+    Returns
+    -------
+    (first, second) : (ndarray, ndarray)
+            The positions of each pair of hits that touch, including
+            hits on the same pixel
+    """
+    rows, cols = fp.FRAME_SHAPE
+    steps = np.diff(keys)
+    first = np.flatnonzero((steps == 0) | (steps == 1) & (ys[:-1] < cols - 1))
+    firsts, seconds = [first], [first + 1]
+    first = np.flatnonzero(xs < rows - 1)
+    second = np.searchsorted(keys, keys[first] + cols - 1)
+    while len(first):
+        inside = second < len(keys)
+        first, second = first[inside], second[inside]
+        dy = keys[second] - keys[first] - cols
+        near = dy <= 1
+        first, second, dy = first[near], second[near], dy[near]
+        touching = (ys[first] + dy >= 0) & (ys[first] + dy < cols)
+        firsts.append(first[touching])
+        seconds.append(second[touching])
+        second = second + 1
+    return np.concatenate(firsts), np.concatenate(seconds)
+
+
+def _union_find(num, first, second):
+    """Join the pairs into connected components
+
+    The components are found for every pair at once, by hooking the
+    larger root of each pair onto the smaller and then pointing each
+    element at its grandparent until each points at its root.
+
+    Parameters
+    ----------
+    num : (int)
+            The number of elements
+    first, second : (ndarray)
+            The pairs of elements that are connected
+
+    Returns
+    -------
+    roots : (ndarray)
+            The smallest element of the component of each element
+    """
+    parent = np.arange(num)
+    while True:
+        first_roots = parent[first]
+        second_roots = parent[second]
+        apart = first_roots != second_roots
+        if not apart.any():
+            return parent
+        first, second = first[apart], second[apart]
+        low = np.minimum(first_roots[apart], second_roots[apart])
+        high = np.maximum(first_roots[apart], second_roots[apart])
+        # Roots only ever point at smaller roots, so there are no cycles
+        parent[high] = low
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+
+
+def _label_clusters(frames, xs, ys):
+    """Label the clusters of adjacent hits
+
+    Hits are adjacent when their pixels touch at an edge or a corner
+    in the same frame.
+
+    Parameters
+    ----------
+    frames : (ndarray)
+            The frame of each hit
+    xs, ys : (ndarray)
+            The coordinates of each hit
+
+    Returns
+    -------
+    (labels, num) : (ndarray, int)
+            The cluster of each hit, numbered from 0 in (frame, x, y)
+            order of the first pixel of each cluster, and the number of
+            clusters
+    """
+    xs = np.asarray(xs, dtype=np.int64)
+    ys = np.asarray(ys, dtype=np.int64)
+    keys = _pixel_keys(np.asarray(frames), xs, ys)
+    order = np.argsort(keys, kind='stable')
+    first, second = _neighbour_pairs(keys[order], xs[order], ys[order])
+    roots = _union_find(len(order), first, second)
+    is_root = roots == np.arange(len(roots))
+    # Roots are the first hit of their cluster, so numbering them in
+    # order numbers the clusters in order
+    numbers = np.cumsum(is_root) - 1
+    labels = np.empty(len(order), dtype=np.intp)
+    labels[order] = numbers[roots]
+    return labels, int(is_root.sum())
+
+
+def _principal_extents(xs, ys, size, starts):
+    """Find the length and width of each cluster along and across its
+    principal axis
+
+    The axis is the major eigenvector of the covariance of the pixels of
+    the cluster, which is found for every cluster at once from the
+    closed form for a 2x2 symmetric matrix. The length and width are
+    the sides of the rectangle with the same second moments as the
+    pixels, each pixel being a unit square, so they do not depend on
+    the angle of the cluster: an a by b block of pixels is a long and
+    b wide, and a straight line of pixels is about 1 wide at any angle.
+
+    Parameters
+    ----------
+    xs, ys : (ndarray)
+            The coordinates of the hits, ordered by cluster
+    size : (ndarray)
+            The number of hits in each cluster
+    starts : (ndarray)
+            The position of the first hit of each cluster
+
+    Returns
+    -------
+    (length, width, linearity) : (ndarray, ndarray, ndarray)
+            The length and width in pixels, and 1 - minor / major
+            eigenvalue (0 for single pixels)
+    """
+    def per_cluster(values):
+        return np.add.reduceat(values, starts) / size
+
+    dx = xs - np.repeat(per_cluster(xs), size)
+    dy = ys - np.repeat(per_cluster(ys), size)
+    sxx, syy, sxy = (per_cluster(a * b) for a, b in
+                     ((dx, dx), (dy, dy), (dx, dy)))
+    centre = (sxx + syy) / 2
+    spread = np.hypot((sxx - syy) / 2, sxy)
+    major = centre + spread
+    minor = np.maximum(centre - spread, 0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        linearity = np.where(major > 0, 1 - minor / major, 0)
+    # A side of n pixels has a variance of (n ** 2 - 1) / 12
+    return np.sqrt(12 * major + 1), np.sqrt(12 * minor + 1), linearity
+
+
+def _classify(table):
+    """Classify clusters by their size and shape features
+
+    Parameters
+    ----------
+    table : (dict (string, ndarray))
+            The 'size' column and shape features of the clusters
+
+    Returns
+    -------
+    classes : (ndarray)
+            The index in CLUSTER_CLASSES of the class of each cluster
+    """
+    size = table['size']
+    conditions = [
+        size <= DOT_MAX_SIZE,
+        (size <= BLOB_MAX_SIZE) & (table['length'] < TRACK_MIN_LENGTH),
+        (table['width'] >= HEAVY_MIN_WIDTH) &
+        (table['density'] >= HEAVY_MIN_DENSITY),
+        table['linearity'] >= STRAIGHT_MIN_LINEARITY]
+    return np.select(conditions, np.arange(len(conditions)),
+                     CLUSTER_CLASSES.index('curly_track')).astype(np.int8)
+
+
+def _empty_table(features=False):
+    """Get a cluster table without any clusters"""
+    columns = CLUSTER_COLUMNS + (FEATURE_COLUMNS if features else [])
+    table = {name: np.empty(0) for name in columns}
+    for name in ['frame', 'size', 'charge', 'x_min', 'x_max', 'y_min',
+                 'y_max']:
+        table[name] = np.empty(0, dtype=np.int64)
+    if features:
+        table['class'] = np.empty(0, dtype=np.int8)
+    return table
+
+
+def _cluster_table(frames, hits, labels, num, features=False):
+    """Measure each cluster
+
+    Parameters
+    ----------
+    frames : (ndarray)
+            The frame of each hit
+    hits : (ndarray)
+            The (N, 3) [x, y, c] hits
+    labels : (ndarray)
+            The cluster of each hit, from _label_clusters
+    num : (int)
+            The number of clusters
+    features : (bool), optional
+            Add the FEATURE_COLUMNS. The default (False) does not.
+
+    Returns
+    -------
+    table : (dict (string, ndarray))
+            An array of each of CLUSTER_COLUMNS, and FEATURE_COLUMNS with
+            features, with one row per cluster
+    """
+    if not num:
+        return _empty_table(features)
+    xs, ys, cs = (hits[:, k].astype(np.int64) for k in range(3))
+    size = np.bincount(labels, minlength=num)
+    charge = np.bincount(labels, weights=cs, minlength=num)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x = np.bincount(labels, weights=cs * xs, minlength=num) / charge
+        y = np.bincount(labels, weights=cs * ys, minlength=num) / charge
+    # Clusters without any charge are centred on their pixels instead
+    flat = charge == 0
+    x[flat] = (np.bincount(labels, weights=xs, minlength=num) / size)[flat]
+    y[flat] = (np.bincount(labels, weights=ys, minlength=num) / size)[flat]
+    order = np.argsort(labels, kind='stable')
+    starts = np.cumsum(size) - size
+    table = {'frame': np.asarray(frames, dtype=np.int64)[order][starts],
+             'size': size, 'charge': charge.astype(np.int64),
+             'x': x, 'y': y}
+    xs, ys = xs[order], ys[order]
+    for name, values in [('x', xs), ('y', ys)]:
+        table[name + '_min'] = np.minimum.reduceat(values, starts)
+        table[name + '_max'] = np.maximum.reduceat(values, starts)
+    if features:
+        table['length'], table['width'], table['linearity'] = (
+            _principal_extents(xs, ys, size, starts))
+        table['density'] = size / (table['length'] * table['width'])
+        table['mean_charge'] = charge / size
+        table['class'] = _classify(table)
+    return table
+
+
+def _find_clusters(frames, numbers=None, features=False):
+    """Find the clusters of a batch of frames in one pass
+
+    Parameters
+    ----------
+    frames : (list (list-like (x, y, c)))
+            The hits of each frame. Hits with a count of 0 are left out.
+    numbers : (list (int)), optional
+            The number of each frame, given in the 'frame' column. The
+            default (None) numbers the frames by their position.
+    features : (bool), optional
+            Add the shape features and class of each cluster, the
+            FEATURE_COLUMNS. The default (False) does not.
+
+    Returns
+    -------
+    table : (dict (string, ndarray))
+            An array of each of the columns, with one row per cluster in
+            order of frame
+    """
+    frames = [np.asarray(frame).reshape(-1, 3) for frame in frames]
+    if numbers is None:
+        numbers = range(len(frames))
+    frame_numbers = np.repeat(
+        np.asarray(numbers, dtype=np.int64),
+        [len(frame) for frame in frames])
+    hits = (np.concatenate(frames) if frames
+            else np.empty((0, 3), dtype=fp.FRAME_DTYPE))
+    hit = hits[:, 2] != 0
+    hits, frame_numbers = hits[hit], frame_numbers[hit]
+    # Frames are labelled by position, as their numbers need not be
+    # unique or in order
+    positions = np.repeat(np.arange(len(frames)),
+                          [len(frame) for frame in frames])[hit]
+    labels, num = _label_clusters(positions, hits[:, 0], hits[:, 1])
+    return _cluster_table(frame_numbers, hits, labels, num, features)
+
+
+def _iter_cluster_tables(frames, batch_size=100, features=False):
+    """Find the clusters of a run of frames, a batch at a time
+
+    Parameters
+    ----------
+    frames : (iterable ((int, list-like (x, y, c))))
+            The number and hits of each frame, which are read one at a
+            time
+    batch_size : (int), optional
+            The number of frames whose clusters are found together
+    features : (bool), optional
+            Add the FEATURE_COLUMNS to the tables
+
+    Returns
+    -------
+    tables : (iterator (dict (string, ndarray)))
+            The cluster table of each batch of frames, or a single empty
+            table if there are no frames
+    """
+    numbers, batch = [], []
+    batches = 0
+    for number, frame in frames:
+        numbers.append(number)
+        batch.append(frame)
+        if len(batch) == batch_size:
+            yield _find_clusters(batch, numbers, features)
+            numbers, batch = [], []
+            batches += 1
+    if batch or not batches:
+        yield _find_clusters(batch, numbers, features)
+
+
+def _iter_numbered_frames(paths, numbers=None):
+    """Load the frames of files and directories along with their numbers
+
+    The frames are found by loader._frame_refs. Frames are numbered by
+    their frame number where it is known, otherwise by their position
+    in their 'frames' file, or else their position in the run.
+    """
+    from analysis import loader
+    from analysis import plotter
+    for position, ref in enumerate(loader._frame_refs(paths, numbers)):
+        number = getattr(ref, 'number', None)
+        if number is None:
+            number = getattr(ref, 'index', None)
+        if number is None:
+            number = position
+        yield number, plotter._load_frame_file(ref)
+
+
+def _format_column(name, values):
+    """Format the values of a column for a CSV file"""
+    if name == 'class':
+        return np.asarray(CLUSTER_CLASSES)[values]
+    if np.issubdtype(values.dtype, np.integer):
+        return values.astype(str)
+    return np.char.mod('%.3f', values)
+
+
+def _write_clusters_csv(tables, file_name):
+    """Write cluster tables to a CSV file with a header of the columns
+
+    Classes are written by name.
+
+    Parameters
+    ----------
+    tables : (iterable (dict (string, ndarray)))
+            The tables to be written one after another, such as the
+            batches of _iter_cluster_tables
+    file_name : (string)
+            The path of the CSV file
+
+    Returns
+    -------
+    num : (int)
+            The number of clusters written
+    """
+    num = 0
+    with open(file_name, 'w') as file:
+        for count, table in enumerate(tables):
+            if not count:
+                file.write(",".join(table) + "\n")
+            columns = [_format_column(name, values)
+                       for name, values in table.items()]
+            file.writelines(
+                ",".join(row) + "\n" for row in zip(*columns))
+            num += len(table['frame'])
+    return num
+
+
+def _write_clusters_npz(tables, file_name):
+    """Write cluster tables to a NumPy .npz file of their columns
+
+    The file holds an array for each column, along with the names of
+    the CLUSTER_CLASSES that the 'class' column indexes.
+
+    Parameters
+    ----------
+    tables : (iterable (dict (string, ndarray)))
+            The tables to be joined and written
+    file_name : (string)
+            The path of the .npz file
+
+    Returns
+    -------
+    num : (int)
+            The number of clusters written
+    """
+    tables = list(tables)
+    columns = {name: np.concatenate([table[name] for table in tables])
+               for name in tables[0]} if tables else _empty_table()
+    with open(file_name, 'wb') as f:
+        np.savez(f, classes=np.asarray(CLUSTER_CLASSES), **columns)
+    return len(columns['frame'])
+
+
+# The cluster table writer for each file extension
+CLUSTER_WRITERS = {'.csv': _write_clusters_csv, '.npz': _write_clusters_npz}
+
+
+def _write_run_clusters(paths, file_name, numbers=None, batch_size=100,
+                        features=False):
+    """Find the clusters of the frames of files and directories
+
+    Parameters
+    ----------
+    paths : (list (string))
+            The files and directories holding the frames, as given to
+            loader._frame_refs
+    file_name : (string)
+            The file to write the cluster table to, written by the entry
+            of CLUSTER_WRITERS for its extension, in any case. Files with
+            other extensions are written as CSV.
+    numbers : (container (int)), optional
+            The frame numbers to select. The default (None) selects every
+            frame.
+    batch_size : (int), optional
+            The number of frames whose clusters are found together
+    features : (bool), optional
+            Add the shape features and class of each cluster
+
+    Returns
+    -------
+    (num_frames, num_clusters) : (int, int)
+            The number of frames searched and clusters found
+    """
+    writer = CLUSTER_WRITERS.get(
+        os.path.splitext(file_name)[1].lower(), _write_clusters_csv)
+    num_frames = 0
+
+    def counted(frames):
+        nonlocal num_frames
+        for frame in frames:
+            num_frames += 1
+            yield frame
+    num_clusters = writer(_iter_cluster_tables(
+        counted(_iter_numbered_frames(paths, numbers)), batch_size,
+        features), file_name)
+    return num_frames, num_clusters
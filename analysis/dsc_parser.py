@@ -4,34 +4,129 @@
 
 import pickle as pk
 import re
-from collections import deque
+import sys
+from collections import OrderedDict, deque, namedtuple
+
+from analysis import frame_parser as fp
 
 pk_protocol = 4
 
+# Sections whose title is replaced, matched anywhere in the title line
+ALTERNATE_NAMES = [
+    (re.compile('[Ss]tart time \\(string\\)'),
+     "acquisition start time string"),
+    (re.compile('ChipboardID'), 'chipboard id')]
+# Sections named by their short name rather than their long name
+USE_SHORT_NAMES = ["DACs values of all chips", "Medipix or chipboard ID"]
+# Sections holding a list of values, along with the separator
+EXPECT_LIST = [("DACs", " ")]
+
+
+def _str_to_num(s):
+    """Attempt to convert a string to an int or float"""
+    try:
+        value = int(s)
+    except ValueError:
+        try:
+            value = float(s)
+        except ValueError:
+            value = s
+    return value
+
+
+# The Frame fields that are usually the same for every frame of an
+# acquisition. These are kept in a FrameMetadata shared between frames.
+METADATA_FIELDS = (
+    "acquisition_mode", "acquisition_time", "chipboard_id", "dacs",
+    "firmware_version", "bias_voltage", "hw_timer_mode",
+    "medipix_interface", "medipix_clock", "medipix_type",
+    "name_and_serial_number", "pixelman_version", "detector_polarity",
+    "timepix_clock")
+# The Frame fields that are different for each frame
+FRAME_FIELDS = (
+    "frame", "acquisition_start_time", "acquisition_start_time_string")
+
+FrameMetadata = namedtuple('FrameMetadata', METADATA_FIELDS)
+
+# The FrameMetadata shared by _intern_metadata, most recent last
+MAX_INTERNED_METADATA = 64
+_interned_metadata = OrderedDict()
+
+
+def _intern_metadata(metadata):
+    """Get the shared FrameMetadata equal to metadata
+
+    Like sys.intern for strings, every equal metadata block maps to a
+    single object, so frames from the same acquisition share one. Only
+    the last MAX_INTERNED_METADATA blocks are kept, so reading many
+    acquisitions does not grow the table without bound.
+    """
+    if metadata in _interned_metadata:
+        _interned_metadata.move_to_end(metadata)
+        return _interned_metadata[metadata]
+    _interned_metadata[metadata] = metadata
+    while len(_interned_metadata) > MAX_INTERNED_METADATA:
+        _interned_metadata.popitem(last=False)
+    return metadata
+
 
 class Frame:
-    """Frame object to represent the data contained within .dsc files"""
+    """Frame object to represent the data contained within .dsc files
+
+    The acquisition settings that are shared between frames (see
+    METADATA_FIELDS) are held in an immutable, interned FrameMetadata,
+    so that frames from the same acquisition share a single copy.
+    The DACs are stored as a tuple. Every field is available as an
+    attribute with a leading underscore, as in frame._bias_voltage.
+
+    Frames compare equal when all of their fields are equal. They are
+    not hashable, as the _frame field is a mutable dict.
+    """
+    __slots__ = tuple("_" + field for field in FRAME_FIELDS) + (
+        "_metadata",)
+
     def __init__(self, **kwargs):
         self._frame = kwargs.get("frame", None)
-        self._acquisition_mode = kwargs.get("acquisition_mode", None)
-        self._acquisition_time = kwargs.get("acquisition_time", None)
-        self._chipboard_id = kwargs.get("chipboard_id", None)
-        self._dacs = kwargs.get("dacs", None)
-        self._firmware_version = kwargs.get("firmware_version", None)
-        self._bias_voltage = kwargs.get("bias_voltage", None)
-        self._hw_timer_mode = kwargs.get("hw_timer_mode", None)
-        self._medipix_interface = kwargs.get("medipix_interface", None)
-        self._medipix_clock = kwargs.get("medipix_clock", None)
-        self._medipix_type = kwargs.get("medipix_type", None)
-        self._name_and_serial_number = kwargs.get(
-            "name_and_serial_number", None)
-        self._pixelman_version = kwargs.get("pixelman_version", None)
-        self._detector_polarity = kwargs.get("detector_polarity", None)
         self._acquisition_start_time = kwargs.get(
             "acquisition_start_time", None)
         self._acquisition_start_time_string = kwargs.get(
             "acquisition_start_time_string", None)
-        self._timepix_clock = kwargs.get("timepix_clock", None)
+        dacs = kwargs.get("dacs", None)
+        if dacs is not None:
+            kwargs["dacs"] = tuple(dacs)
+        self._metadata = _intern_metadata(FrameMetadata(
+            *[kwargs.get(field, None) for field in METADATA_FIELDS]))
+
+    def __getattr__(self, name):
+        field = name[1:]
+        if name.startswith("_") and field in METADATA_FIELDS:
+            return getattr(self._metadata, field)
+        raise AttributeError(
+            "'Frame' object has no attribute '{}'".format(name))
+
+    def _asdict(self):
+        """Get every field of the frame, keyed by its attribute name"""
+        fields = {"_" + field: getattr(self, "_" + field)
+                  for field in FRAME_FIELDS}
+        fields.update(("_" + field, value) for field, value
+                      in zip(METADATA_FIELDS, self._metadata))
+        return fields
+
+    def __eq__(self, other):
+        if not isinstance(other, Frame):
+            return NotImplemented
+        return self._asdict() == other._asdict()
+
+    __hash__ = None
+
+    def __getstate__(self):
+        return (self._frame, self._acquisition_start_time,
+                self._acquisition_start_time_string, self._metadata)
+
+    def __setstate__(self, state):
+        (self._frame, self._acquisition_start_time,
+         self._acquisition_start_time_string, metadata) = state
+        self._metadata = _intern_metadata(FrameMetadata(*metadata))
 
 
 class DSCParser:
@@ -97,29 +192,18 @@ class DSCParser:
         title = match_dict('title', 0)
         str_value = match_dict('value', 2)['value']
 
-        def try_str_to_num(s):
-            """Attemp to convert a string to an int or float"""
-            try:
-                value = int(s)
-            except ValueError:
-                try:
-                    value = float(s)
-                except ValueError:
-                    value = s
-            return value
-
         def first(x):
             return x[0]
         exps = map(first, expect_list)
         for name in expect_list:
             if first(name) in title.values():
                 value = str_value.split(name[1])
-                value = list(map(try_str_to_num, value))
+                value = list(map(_str_to_num, value))
                 if ('') in value:
                     value.remove('')
                 break
         else:
-            value = try_str_to_num(str_value)
+            value = _str_to_num(str_value)
 
         for a in use_alternate:
             if re.findall(first(a), first(config)):
@@ -137,3 +221,131 @@ class DSCParser:
             return return_hash('short_name')
         else:
             return return_hash('long_name')
+
+
+class StreamingDSCParser(DSCParser):
+    """Single pass parser for DSC files
+
+    The lines of a file are read once, in order, and each section is
+    handled as soon as its three lines have been read. The name of each
+    section is worked out once per distinct title line and cached, so
+    parsing many files from the same acquisition only runs the title
+    regex a handful of times. The Frame objects produced are the same
+    as those from DSCParser.
+    """
+    def __init__(self):
+        super().__init__()
+        self._section_keys = {}
+
+    def _frame_from_dsc(self, dsc_data):
+        """Parse a .dsc file and create a frame object"""
+        return self._frame_from_lines(dsc_data.splitlines())
+
+    def _frame_from_file(self, file_name):
+        """Parse the .dsc file at file_name and create a frame object"""
+        with open(file_name) as file:
+            return self._frame_from_lines(file)
+
+    def _frame_from_lines(self, lines):
+        """Create a frame object from the lines of a .dsc file
+
+        Parameters
+        ----------
+        lines : (iterable (string))
+                The lines of the file, with or without line endings
+
+        Returns
+        -------
+        frame : (Frame)
+                The frame described by the file
+        """
+        lines = (line.rstrip('\r\n') for line in lines)
+        header = [next(lines) for _ in range(3)]
+        frame, _ = self._analyse_dsc_header(header)
+        kvs = {'frame': frame}
+        for title in lines:
+            if not title.strip():
+                continue
+            next(lines, None)
+            value = next(lines, '')
+            key, separator = self._section_key(title)
+            if separator is None:
+                kvs[key] = _str_to_num(value)
+            else:
+                values = list(map(_str_to_num, value.split(separator)))
+                if '' in values:
+                    values.remove('')
+                kvs[key] = values
+        return Frame(**kvs)
+
+    def _section_key(self, title):
+        """Get the Frame keyword and list separator for a section title
+
+        The separator is None for sections holding a single value.
+        """
+        with_key = self._section_keys.get(title)
+        if with_key is not None:
+            return with_key
+        names = self._dsc_reg['title'].match(title).groupdict()
+        separator = None
+        for name, sep in EXPECT_LIST:
+            if name in names.values():
+                separator = sep
+                break
+        for regex, alternate in ALTERNATE_NAMES:
+            if regex.search(title):
+                names = {'short_name': alternate, 'long_name': alternate}
+                break
+        name = names['long_name']
+        if name in USE_SHORT_NAMES:
+            name = names['short_name']
+        key = name.strip().replace(" ", "_").lower()
+        self._section_keys[title] = (key, separator)
+        return key, separator
+
+
+_streaming_parser = StreamingDSCParser()
+
+
+def _parse_dsc_file(file_name):
+    """Parse a single .dsc file, returning errors rather than raising
+
+    Returns
+    -------
+    result : (Frame or None, Exception or None)
+            The frame and None on success,
+            otherwise None and the error that occurred.
+    """
+    try:
+        return _streaming_parser._frame_from_file(file_name), None
+    except (OSError, ValueError, AttributeError, StopIteration) as err:
+        return None, err
+
+
+def _frames_from_directory(directory, extension=".txt.dsc", jobs=1):
+    """Parse every .dsc file in a directory
+
+    Parameters
+    ----------
+    directory : (string)
+            Path to the directory holding the .dsc files
+    extension : (string), optional
+            The extension of the files to parse.
+    jobs : (int), optional
+            The number of worker processes to parse the files with.
+            The default (1) parses the files in this process, 0 uses
+            one worker per CPU.
+
+    Returns
+    -------
+    frames : (iterator (string, Frame or None, Exception or None))
+            The path, frame and error of each file, in frame number
+            order. The frame is None for files that failed to parse.
+    """
+    files = fp._sorted_frame_files(directory, extension)
+    results = fp._map_files(_parse_dsc_file, files, jobs)
+    for file, (frame, err) in zip(files, results):
+        if err is not None:
+            print("Failed to parse {}: {}".format(file, err),
+                  file=sys.stderr)
+        yield file, frame, err
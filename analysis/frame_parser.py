@@ -2,25 +2,69 @@
 # -*- coding: utf-8 -*-
 # frame_parser.py
 
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from contextlib import suppress
-import csv
+import functools
 import glob
+import hashlib
 import json
+import mmap
 import os
 import re
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+import zipfile
 
+import numpy as np
 
-def _detect_input_and_write(input_, out_file=None):
+# The integer type of the [X,Y,C] hits of a frame. Counts can be up to
+# the 65535 of the uint16 column of the binary formats, and more in JSON.
+FRAME_DTYPE = np.int32
+
+# The (x, y) size of a TimePix frame in pixels
+FRAME_SHAPE = (256, 256)
+
+# The output formats frames can be written in, with their extensions.
+# The binary formats store each frame as typed x, y and c columns.
+OUTPUT_FORMATS = {
+    'json': '.json', 'npz': '.npz', 'bin': '.bin', 'archive': '.rla'}
+COLUMN_DTYPES = (('x', np.uint8), ('y', np.uint8), ('c', np.dtype('<u2')))
+
+# A frame archive is a header, then the columns of each frame packed one
+# frame after another, then an index of the offset, hit count and number
+# of each frame. Keeping the index last lets frames be appended in place.
+ARCHIVE_MAGIC = b'RLFA'
+ARCHIVE_VERSION = 1
+ARCHIVE_HEADER_DTYPE = np.dtype([
+    ('magic', 'S4'), ('version', '<u4'), ('count', '<u8'),
+    ('index_offset', '<u8')])
+ARCHIVE_INDEX_DTYPE = np.dtype([
+    ('offset', '<u8'), ('count', '<u4'), ('number', '<i8')])
+
+# Incremental conversion records converted files in this output file
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def _detect_input_and_write(input_, out_file=None, jobs=1, **kwargs):
     """Perform file conversion based on input type
 
     If input is a directory, then perform a conversion on each
-    file in the directory.
+    file in the directory, using jobs worker processes. Any further
+    keyword arguments are passed on to _write_output_directory.
+    The files that failed to convert are returned.
 
     If input is a file, then perform conversion on only that file."""
     if os.path.isdir(input_):
-        _write_output_directory(input_)
+        return _write_output_directory(input_, jobs=jobs, **kwargs)
     elif os.path.isfile(input_):
-        _parse_file_and_write(input_, out_file)
+        output_format = kwargs.get('output_format', 'json')
+        _parse_file_and_write(input_, out_file, output_format)
+        return []
     else:
         raise FileNotFoundError(
             "Not a valid file or directory: {}".format(input_))
@@ -43,6 +87,54 @@ def _gen_output_data(data):
     return json.dumps(data, **json_format)
 
 
+def _retrieve_frame_array(data, truncate=False):
+    """Retrieve frame from a string of data as an array of hits
+
+    Parameters
+    ----------
+    data : (string)
+            The data to be parsed, whitespace separated [X,Y,C] values.
+    truncate : (bool), optional
+            Truncate values that are not integers, as the plotter has
+            always read frame JSON. The default (False) rejects them.
+
+    Returns
+    -------
+    frame : (ndarray)
+            An (N, 3) array of FRAME_DTYPE, one [x, y, c] row per hit.
+
+    Raises
+    ------
+    ValueError
+            If the data is not a whole number of [X,Y,C] hits, or a
+            value is not an integer that fits in FRAME_DTYPE.
+    """
+    if not data.strip():
+        return np.empty((0, 3), dtype=FRAME_DTYPE)
+    with warnings.catch_warnings():
+        # Older versions of NumPy only warn on unparseable data
+        warnings.simplefilter('error', DeprecationWarning)
+        try:
+            values = np.fromstring(data, dtype=np.int64, sep=' ')
+        except (ValueError, DeprecationWarning):
+            # Not all integers, fall back to reading them as floats
+            values = np.fromstring(data, sep=' ')
+    if values.size % 3 != 0:
+        raise ValueError(
+            "Frame data is not a list of [X,Y,C] hits: "
+            "got {} values".format(values.size))
+    if values.dtype.kind == 'f':
+        if not np.all(np.isfinite(values)) or not (
+                truncate or np.all(np.mod(values, 1) == 0)):
+            raise ValueError("Frame data has values that are not integers")
+        values = np.trunc(values)
+    limits = np.iinfo(FRAME_DTYPE)
+    if values.size and (values.min() < limits.min
+                        or values.max() > limits.max):
+        raise ValueError("Frame data has values out of range")
+    return values.reshape(-1, 3).astype(FRAME_DTYPE)
+
+
 def _retrieve_frame(data):
     """Retrieve frame from a string of data
 
@@ -53,32 +145,30 @@ def _retrieve_frame(data):
 
     Returns
     -------
-    frame : ([[Numeric, Numeric, Numeric]])
+    frame : ([[int, int, int]])
             The frame as a list of [x, y, c] hits, where
             x is the x-coordinate, y is the y-coordinate and
-            c is the intensity of the hit.
+            c is the intensity of the hit. The values are ints, so the
+            JSON written from them holds 77 where the floats once read
+            with the csv module wrote 77.0.
     """
+    return _retrieve_frame_array(data).tolist()
+
 
-    space_separated = type(
-        'space_sep', (),
-        {
-            'delimiter': ' ',
-            'skipinitialspace': True,
-            'quoting': csv.QUOTE_NONNUMERIC})
-    frame = data.replace('\t', ' ')
-    vals = csv.reader(frame.splitlines(), dialect=space_separated)
-    return list(vals)
+def _get_frame_array_from_file(file_name):
+    """Retrieve frame from a file object as an array of hits"""
+    with open(file_name) as file:
+        contents = file.read()
+    return _retrieve_frame_array(contents)
 
 
 def _get_frame_from_file(file_name):
     """Retrieve frame from a file object"""
-    with open(file_name) as file:
-        contents = file.read()
-    return _retrieve_frame(contents)
+    return _get_frame_array_from_file(file_name).tolist()
 
 
-def _parse_file_and_write(in_file, out_file=None):
-    """Perform the JSON conversion on a single file
+def _parse_file_and_write(in_file, out_file=None, output_format='json'):
+    """Perform the conversion on a single file
 
     Parameters
     ----------
@@ -88,19 +178,25 @@ def _parse_file_and_write(in_file, out_file=None):
             The path to write the output data to.
             The default (None) will automatically generate a filename based on
             the input file.
+    output_format : (string), optional
+            One of OUTPUT_FORMATS, the format to write the frame in.
+            The default ('json') writes a JSON list of [x, y, c] hits.
 
     Returns
     -------
     Nothing - used for side effects.
     """
-    data = _get_output_data_from_file(in_file)
     if out_file is not None:
         to_write = out_file
     else:
-        to_write = _gen_output_path(in_file)
+        to_write = _gen_output_path(in_file, OUTPUT_FORMATS[output_format])
     with suppress(FileExistsError):
         os.mkdir(os.path.dirname(to_write))
-    _write_data(data, to_write)
+    if output_format == 'json':
+        _write_data(_get_output_data_from_file(in_file), to_write)
+    else:
+        _write_frame(_get_frame_array_from_file(in_file), to_write,
+                     output_format)
 
 
 def _write_data(data, file_name):
@@ -108,6 +204,117 @@ def _write_data(data, file_name):
         fname.write(data)
 
 
+def _frame_columns(frame):
+    """Split a frame into the typed columns of the binary formats
+
+    Parameters
+    ----------
+    frame : (ndarray)
+            An (N, 3) array of [x, y, c] hits
+
+    Returns
+    -------
+    columns : ([ndarray])
+            The x, y and c columns, typed as in COLUMN_DTYPES
+
+    Raises
+    ------
+    ValueError
+            If a hit does not fit in the column types.
+    """
+    frame = np.asarray(frame).reshape(-1, 3)
+    if frame.size and (frame.min() < 0 or frame[:, :2].max() > 255
+                       or frame[:, 2].max() > 65535):
+        raise ValueError(
+            "Frame hits do not fit in the binary output formats")
+    return [frame[:, i].astype(dtype)
+            for i, (_, dtype) in enumerate(COLUMN_DTYPES)]
+
+
+def _frame_from_columns(x, y, c):
+    """Join x, y and c columns back into an (N, 3) frame array"""
+    return np.column_stack([x, y, c]).astype(FRAME_DTYPE)
+
+
+def _write_frame(frame, file_name, output_format='json'):
+    """Write a frame array to file_name in the given output format"""
+    if output_format == 'json':
+        _write_data(_gen_output_data(np.asarray(frame).tolist()), file_name)
+    elif output_format == 'npz':
+        names = [name for name, _ in COLUMN_DTYPES]
+        # Written to an open file, as np.savez adds .npz to other names
+        with open(file_name, 'wb') as file:
+            np.savez(file, **dict(zip(names, _frame_columns(frame))))
+    elif output_format == 'bin':
+        with open(file_name, 'wb') as file:
+            for column in _frame_columns(frame):
+                file.write(column.tobytes())
+    elif output_format == 'archive':
+        with _ArchiveFramesWriter(file_name) as archive:
+            archive.write(frame)
+    else:
+        raise ValueError("Unknown output format: {}".format(output_format))
+
+
+def _drop_hot_pixels(frame, hot_pixels):
+    """Remove the hits of a frame array that are on hot pixels
+
+    Parameters
+    ----------
+    frame : (ndarray)
+            An (N, 3) array of [x, y, c] hits
+    hot_pixels : (ndarray)
+            A boolean mask of FRAME_SHAPE, True for the hot pixels
+
+    Returns
+    -------
+    frame : (ndarray)
+            The hits that are not on a hot pixel
+    """
+    return frame[~hot_pixels[frame[:, 0], frame[:, 1]]]
+
+
+def _read_frame_file(file_name, hot_pixels=None):
+    """Read a converted frame file in any of the output formats
+
+    The format is chosen by the extension of the file, files without
+    a binary format extension are read as JSON. Only the first frame
+    of a frame archive is read.
+
+    Parameters
+    ----------
+    file_name : (string)
+            Path to the frame file
+    hot_pixels : (ndarray), optional
+            A boolean mask of FRAME_SHAPE whose hits are dropped, such
+            as the hot pixels of hotpixels._read_hot_pixels.
+
+    Returns
+    -------
+    frame : (ndarray)
+            An (N, 3) array of FRAME_DTYPE, one [x, y, c] row per hit.
+    """
+    if hot_pixels is not None:
+        return _drop_hot_pixels(_read_frame_file(file_name), hot_pixels)
+    extension = os.path.splitext(file_name)[1]
+    if extension == OUTPUT_FORMATS['npz']:
+        with np.load(file_name) as data:
+            return _frame_from_columns(
+                *[data[name] for name, _ in COLUMN_DTYPES])
+    elif extension == OUTPUT_FORMATS['archive']:
+        with FrameArchive(file_name) as archive:
+            return archive[0]
+    elif extension == OUTPUT_FORMATS['bin']:
+        raw = np.fromfile(file_name, dtype=np.uint8)
+        if raw.size % 4 != 0:
+            raise ValueError(
+                "Not a binary frame file: {}".format(file_name))
+        num = raw.size // 4
+        return _frame_from_columns(
+            raw[:num], raw[num:2 * num], raw[2 * num:].view('<u2'))
+    return _read_frame_json(file_name)
+
+
 def _get_output_data_from_file(file_name):
     """Generate the JSON data from a frame file
 
@@ -121,11 +328,634 @@ def _get_output_data_from_file(file_name):
     result : (String)
             The JSON serialised string
     """
-    frame = _get_frame_from_file(file_name)
-    return _gen_output_data(frame)
+    frame = _get_frame_array_from_file(file_name)
+    return _gen_output_data(frame.tolist())
+
+
+class _FramesWriter:
+    """Stream JSON serialised frames into a single JSON array
+
+    Each frame is written as soon as it is given, so only one frame
+    needs to be held at a time. The output is the same as serialising
+    the list of all frames with _gen_output_data.
+    """
+    def __init__(self, file_name):
+        self._file = open(file_name, 'w')
+        self._count = 0
+
+    def write(self, data, number=-1):
+        """Append a frame, given as the string from _gen_output_data
+
+        The frame number is only recorded by frame archives.
+        """
+        self._file.write(",\n  " if self._count else "[\n  ")
+        self._file.write(data.replace("\n", "\n  "))
+        self._count += 1
+
+    def close(self):
+        """Finish the array and close the file"""
+        self._file.write("\n]" if self._count else "[]")
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class _NPZFramesWriter(_FramesWriter):
+    """Stream frame arrays into a single .npz file
+
+    The file holds the x, y and c columns of every frame joined end to
+    end, along with a 'counts' array of the number of hits in each
+    frame. The columns are spooled to temporary files while writing,
+    so only one frame needs to be held in memory at a time.
+    """
+    def __init__(self, file_name):
+        self._file_name = file_name
+        self._columns = [tempfile.TemporaryFile() for _ in COLUMN_DTYPES]
+        self._counts = tempfile.TemporaryFile()
+        self._count = 0
+
+    def write(self, frame, number=-1):
+        """Append a frame, given as an (N, 3) array of hits"""
+        columns = _frame_columns(frame)
+        for spool, column in zip(self._columns, columns):
+            spool.write(column.tobytes())
+        self._counts.write(np.array([len(columns[0])], '<u4').tobytes())
+        self._count += 1
+
+    def close(self):
+        """Write the spooled columns into the .npz file
+
+        Each column is written as a .npy file of its own and added to
+        the archive with ZipFile.write, as writing to the members of a
+        ZipFile needs Python 3.6.
+        """
+        names = [name for name, _ in COLUMN_DTYPES] + ['counts']
+        dtypes = [dtype for _, dtype in COLUMN_DTYPES] + [np.dtype('<u4')]
+        spools = self._columns + [self._counts]
+        with tempfile.TemporaryDirectory() as directory, \
+                zipfile.ZipFile(self._file_name, 'w') as archive:
+            for name, dtype, spool in zip(names, dtypes, spools):
+                dtype = np.dtype(dtype)
+                size = spool.tell()
+                spool.seek(0)
+                npy_path = os.path.join(directory, name + '.npy')
+                with open(npy_path, 'wb') as member:
+                    np.lib.format.write_array_header_1_0(member, {
+                        'descr': np.lib.format.dtype_to_descr(dtype),
+                        'fortran_order': False,
+                        'shape': (size // dtype.itemsize,)})
+                    shutil.copyfileobj(spool, member)
+                spool.close()
+                archive.write(npy_path, name + '.npy')
+                os.remove(npy_path)
+
+
+class _BinFramesWriter(_FramesWriter):
+    """Stream frame arrays into a single raw binary file
+
+    Each frame is stored as a little-endian uint32 hit count followed
+    by the x, y and c columns of the frame, as in a .bin frame file.
+    With append, the frames are added to the end of an existing file.
+    """
+    def __init__(self, file_name, append=False):
+        self._file = open(file_name, 'ab' if append else 'wb')
+        self._count = 0
+
+    def write(self, frame, number=-1):
+        """Append a frame, given as an (N, 3) array of hits"""
+        columns = _frame_columns(frame)
+        self._file.write(np.array([len(columns[0])], '<u4').tobytes())
+        for column in columns:
+            self._file.write(column.tobytes())
+        self._count += 1
+
+    def close(self):
+        """Close the file"""
+        self._file.close()
+
+
+def _read_archive_header(file):
+    """Read the frame count and index offset from an open archive"""
+    file.seek(0)
+    raw = file.read(ARCHIVE_HEADER_DTYPE.itemsize)
+    if len(raw) != ARCHIVE_HEADER_DTYPE.itemsize:
+        raise ValueError("Not a frame archive: the file is too short")
+    header = np.frombuffer(raw, ARCHIVE_HEADER_DTYPE)[0]
+    if header['magic'] != ARCHIVE_MAGIC:
+        raise ValueError("Not a frame archive: bad magic number")
+    if header['version'] != ARCHIVE_VERSION:
+        raise ValueError("Unsupported frame archive version: {}".format(
+            header['version']))
+    return int(header['count']), int(header['index_offset'])
+
+
+class _ArchiveFramesWriter(_FramesWriter):
+    """Stream frame arrays into a frame archive
+
+    The columns of each frame are written as soon as it is given, the
+    index and header are written when the writer is closed.
+
+    Parameters
+    ----------
+    file_name : (string)
+            Path to the archive
+    append : (bool), optional
+            Add the frames to the end of an existing archive, writing
+            over its old index. The default (False) replaces any
+            existing file. A missing archive is created either way.
+    """
+    def __init__(self, file_name, append=False):
+        if append and os.path.exists(file_name):
+            self._file = open(file_name, 'r+b')
+            count, index_offset = _read_archive_header(self._file)
+            self._file.seek(index_offset)
+            self._index = [np.frombuffer(
+                self._file.read(count * ARCHIVE_INDEX_DTYPE.itemsize),
+                ARCHIVE_INDEX_DTYPE)]
+            self._file.seek(index_offset)
+        else:
+            self._file = open(file_name, 'wb')
+            self._file.write(bytes(ARCHIVE_HEADER_DTYPE.itemsize))
+            self._index = []
+        self._count = sum(len(entries) for entries in self._index)
+
+    def write(self, frame, number=-1):
+        """Append a frame, given as an (N, 3) array of hits
+
+        The frame number is recorded in the index of the archive.
+        """
+        columns = _frame_columns(frame)
+        self._index.append(np.array(
+            [(self._file.tell(), len(columns[0]), number)],
+            ARCHIVE_INDEX_DTYPE))
+        for column in columns:
+            self._file.write(column.tobytes())
+        self._count += 1
+
+    def close(self):
+        """Write the index and header and close the archive"""
+        index_offset = self._file.tell()
+        if self._index:
+            self._file.write(np.concatenate(self._index).tobytes())
+        self._file.truncate()
+        header = np.array(
+            [(ARCHIVE_MAGIC, ARCHIVE_VERSION, self._count, index_offset)],
+            ARCHIVE_HEADER_DTYPE)
+        self._file.seek(0)
+        self._file.write(header.tobytes())
+        self._file.close()
+
+
+class FrameArchive:
+    """Read-only, memory-mapped view of a frame archive
+
+    Frames are indexed by their position in the archive, archive[k]
+    being the (N, 3) array of [x, y, c] hits of frame k. Only the
+    index and the requested frame are read from the file.
+
+    Parameters
+    ----------
+    file_name : (string)
+            Path to the archive
+    """
+    def __init__(self, file_name):
+        with open(file_name, 'rb') as file:
+            count, index_offset = _read_archive_header(file)
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._index = np.frombuffer(
+            self._map, ARCHIVE_INDEX_DTYPE, count, index_offset)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __getitem__(self, k):
+        return _frame_from_columns(*self._column_views(k))
+
+    def __iter__(self):
+        for k in range(len(self)):
+            yield self[k]
+
+    @property
+    def numbers(self):
+        """The frame number of each frame in the archive"""
+        return self._index['number'].copy()
+
+    @property
+    def counts(self):
+        """The number of hits in each frame in the archive"""
+        return self._index['count'].copy()
+
+    def columns(self, k):
+        """Get the x, y and c columns of frame k
+
+        The columns are copied out of the mapped file, so they can be
+        kept after the archive is closed.
+        """
+        return [column.copy() for column in self._column_views(k)]
+
+    def _column_views(self, k):
+        """Get the x, y and c columns of frame k as read-only views onto
+        the mapped file, which must not outlive the archive"""
+        if not -len(self) <= k < len(self):
+            raise IndexError("Frame index out of range: {}".format(k))
+        entry = self._index[k]
+        offset, num = int(entry['offset']), int(entry['count'])
+        columns = []
+        for _, dtype in COLUMN_DTYPES:
+            dtype = np.dtype(dtype)
+            columns.append(np.frombuffer(self._map, dtype, num, offset))
+            offset += num * dtype.itemsize
+        return columns
+
+    def close(self):
+        """Release the mapping of the archive"""
+        self._index = None
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Read as whitespace when parsing the values of frame JSON, whose own
+# whitespace is dropped to leave fewer bytes for NumPy to scan
+JSON_SEPARATORS = bytes.maketrans(b'[],', b'   ')
+JSON_WHITESPACE = b' \t\n\r'
+# The bytes of a frame JSON other than its brackets and commas
+JSON_VALUES = bytes(set(range(256)) - set(b'[],'))
+
+
+def _parse_frame_json(data):
+    """Parse the JSON of a frame as an array of hits
+
+    The values are read by NumPy once the brackets and commas are
+    replaced with spaces, rather than building a Python list of lists
+    first. Values that are not integers are truncated.
+
+    Parameters
+    ----------
+    data : (bytes)
+            The [[x, y, c], ...] JSON list of the hits of a frame
+
+    Returns
+    -------
+    frame : (ndarray)
+            An (N, 3) array of FRAME_DTYPE, one [x, y, c] row per hit.
+
+    Raises
+    ------
+    ValueError
+            If the data is not a list of [x, y, c] hits.
+    """
+    frame = _retrieve_frame_array(
+        bytes(data).translate(JSON_SEPARATORS, JSON_WHITESPACE).decode(
+            'ascii'), truncate=True)
+    if not _is_hits_json(data, len(frame)):
+        raise ValueError("Frame JSON is not a list of [x, y, c] hits")
+    return frame
+
+
+def _is_hits_json(data, num_hits):
+    """Check that frame JSON is a list of num_hits [x, y, c] hits
+
+    Everything but the brackets and commas is removed, which leaves
+    '[[,,],[,,]]' for a frame of two hits.
+    """
+    return (bytes(data).translate(None, JSON_VALUES)
+            == b'[' + b','.join([b'[,,]'] * num_hits) + b']')
+
+
+def _read_frame_json(file_name):
+    """Read a single frame JSON file as an array of hits"""
+    with open(file_name, 'rb') as file:
+        return _parse_frame_json(file.read())
+
+
+def _json_array_spans(buffer, chunk_size=1 << 24):
+    """Find the elements of a JSON array of arrays
+
+    The brackets are found and their depth counted with NumPy, a chunk
+    of the buffer at a time.
+
+    Parameters
+    ----------
+    buffer : (buffer)
+            The JSON array, such as a memory-mapped frames JSON file
+    chunk_size : (int)
+            The number of bytes to scan at a time
+
+    Returns
+    -------
+    (starts, ends) : (ndarray, ndarray)
+            The offsets of the opening bracket of each element and of
+            the byte after its closing bracket.
+    """
+    starts = [np.empty(0, dtype=np.intp)]
+    ends = [np.empty(0, dtype=np.intp)]
+    depth = 0
+    for offset in range(0, len(buffer), chunk_size):
+        chunk = np.frombuffer(
+            buffer, np.uint8, min(chunk_size, len(buffer) - offset), offset)
+        positions = np.flatnonzero((chunk == ord('[')) | (chunk == ord(']')))
+        steps = np.where(chunk[positions] == ord('['), 1, -1)
+        # The depth after each bracket
+        depths = depth + np.cumsum(steps)
+        starts.append(positions[(steps == 1) & (depths == 2)] + offset)
+        ends.append(positions[(steps == -1) & (depths == 1)] + offset + 1)
+        if len(depths):
+            depth = depths[-1]
+    return np.concatenate(starts), np.concatenate(ends)
+
+
+class FramesJSON:
+    """Read-only, memory-mapped view of a frames JSON file
+
+    Frames are indexed by their position in the file, frames[k] being
+    the (N, 3) array of [x, y, c] hits of frame k. Opening the file
+    finds where each frame is, and only the requested frame is parsed.
+
+    Parameters
+    ----------
+    file_name : (string)
+            Path to a JSON list of frames, as written by _FramesWriter
+    """
+    def __init__(self, file_name):
+        with open(file_name, 'rb') as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                raise ValueError(
+                    "Not a frames JSON file: {}".format(file_name))
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._starts, self._ends = _json_array_spans(self._map)
+
+    def __len__(self):
+        return len(self._starts)
+
+    def __getitem__(self, k):
+        if not -len(self) <= k < len(self):
+            raise IndexError("Frame index out of range: {}".format(k))
+        return _parse_frame_json(self._map[self._starts[k]:self._ends[k]])
+
+    def __iter__(self):
+        for k in range(len(self)):
+            yield self[k]
+
+    def close(self):
+        """Release the mapping of the file"""
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# The aggregate frames writer for each of the OUTPUT_FORMATS
+FRAMES_WRITERS = {
+    'json': _FramesWriter, 'npz': _NPZFramesWriter, 'bin': _BinFramesWriter,
+    'archive': _ArchiveFramesWriter}
+
+
+def _iter_frames_file(file_name, hot_pixels=None):
+    """Iterate over the frames of an aggregate frames file
+
+    Parameters
+    ----------
+    file_name : (string)
+            Path to a frames file written by one of FRAMES_WRITERS,
+            the format is chosen by its extension.
+    hot_pixels : (ndarray), optional
+            A boolean mask of FRAME_SHAPE whose hits are dropped from
+            every frame.
+
+    Returns
+    -------
+    frames : (iterator (ndarray))
+            The (N, 3) array of hits for each frame, in order
+    """
+    if hot_pixels is not None:
+        for frame in _iter_frames_file(file_name):
+            yield _drop_hot_pixels(frame, hot_pixels)
+        return
+    extension = os.path.splitext(file_name)[1]
+    if extension == OUTPUT_FORMATS['npz']:
+        with np.load(file_name) as data:
+            counts = data['counts']
+            columns = [data[name] for name, _ in COLUMN_DTYPES]
+        ends = np.cumsum(counts)
+        for start, end in zip(ends - counts, ends):
+            yield _frame_from_columns(
+                *[column[start:end] for column in columns])
+    elif extension == OUTPUT_FORMATS['archive']:
+        with FrameArchive(file_name) as archive:
+            yield from archive
+    elif extension == OUTPUT_FORMATS['bin']:
+        with open(file_name, 'rb') as file:
+            while True:
+                count = file.read(4)
+                if not count:
+                    break
+                num = int(np.frombuffer(count, '<u4')[0])
+                raw = np.frombuffer(file.read(4 * num), np.uint8)
+                yield _frame_from_columns(
+                    raw[:num], raw[num:2 * num], raw[2 * num:].view('<u2'))
+    else:
+        with FramesJSON(file_name) as frames:
+            yield from frames
+
+
+def _is_frames_file(file_name):
+    """Determine whether a file holds many frames rather than one
+
+    Frame archives and the 'frames' files written for a directory by
+    FRAMES_WRITERS hold every frame of the directory.
+    """
+    name, extension = os.path.splitext(os.path.basename(file_name))
+    return extension == OUTPUT_FORMATS['archive'] or (
+        name == "frames" and extension in OUTPUT_FORMATS.values())
+
+
+def _get_valid_files(directory, ext):
+    """Get a list of the (files) that match the extension in directory"""
+    files = os.listdir(directory)
+    matches = glob.fnmatch.filter(files, '*{}'.format(ext))
+    full_matches = [os.path.join(directory, file) for file in matches]
+    return [file for file in full_matches if os.path.isfile(file)]
 
 
-def _write_output_directory(directory, extension=".txt"):
+def _get_frame_file_number(file_name, extension=".txt"):
+    """Get the frame number associated with the file
+
+    The frame number is the run of digits immediately before the
+    extension, so 'data12.txt' is frame 12.
+
+    Raises
+    ------
+    ValueError
+            If there are no digits before the extension
+    """
+    base = os.path.basename(file_name)
+    match = re.search('(\\d+){}$'.format(re.escape(extension)), base)
+    if match is None:
+        raise ValueError("No frame number in file name: {}".format(base))
+    return int(match.group(1))
+
+
+def _sorted_frame_files(directory, extension=".txt", report=True):
+    """Get a sorted array of the files
+
+    This needs to be done so that the JSON output will have
+    the frames in the correct order. Files with no frame number, such
+    as 'notes.txt', are left out, and reported unless report is False.
+    """
+    numbered = []
+    for file in _get_valid_files(directory, extension):
+        try:
+            numbered.append((_get_frame_file_number(file, extension), file))
+        except ValueError as err:
+            if report:
+                print("Skipping {}: {}".format(file, err), file=sys.stderr)
+    return [file for _, file in sorted(numbered)]
+
+
+def _convert_file(file_name, output_format='json', frame_files=True):
+    """Convert a single frame file and write its output
+
+    This is run in the worker processes when converting a directory,
+    so errors are returned rather than raised to allow the rest of
+    the batch to continue.
+
+    Parameters
+    ----------
+    file_name : (string)
+            Path to the frame file to be converted
+    output_format : (string), optional
+            One of OUTPUT_FORMATS, the format to write the frame in.
+    frame_files : (bool), optional
+            Write the frame to its own file. The default (True) does,
+            except for the 'archive' format. Otherwise any earlier file
+            of the frame is removed, so that a later incremental
+            conversion does not take it to be up to date.
+
+    Returns
+    -------
+    result : (String or ndarray or None, Exception or None)
+            The frame as it is given to the FRAMES_WRITERS entry for the
+            format (the JSON serialised frame for 'json', otherwise the
+            frame array) and None on success, otherwise None and the
+            error that occurred. Frames converted for an archive are
+            not written to their own file.
+    """
+    out_file = _gen_output_path(file_name, OUTPUT_FORMATS[output_format])
+    try:
+        if output_format == 'json':
+            data = _get_output_data_from_file(file_name)
+            if frame_files:
+                _write_data(data, out_file)
+        elif output_format == 'archive' or not frame_files:
+            data = _get_frame_array_from_file(file_name)
+        else:
+            data = _get_frame_array_from_file(file_name)
+            _write_frame(data, out_file, output_format)
+        if not frame_files and output_format != 'archive':
+            with suppress(FileNotFoundError):
+                os.remove(out_file)
+    except (OSError, ValueError) as err:
+        return None, err
+    return data, None
+
+
+def _map_files(function, files, jobs=1):
+    """Apply function to each of files, yielding the results in order
+
+    With more than one job the files are spread across a pool of
+    worker processes, otherwise they are handled in this process.
+    A jobs value of 0 uses one worker per CPU.
+
+    Only a few files per worker are submitted ahead of the results
+    being consumed, so the results of a large directory do not all
+    build up in memory at once.
+    """
+    if jobs == 1:
+        yield from map(function, files)
+        return
+    with ProcessPoolExecutor(max_workers=jobs or None) as executor:
+        window = 4 * (jobs or os.cpu_count() or 1)
+        pending = deque()
+        for file in files:
+            pending.append(executor.submit(function, file))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _file_signature(file_name, stat=None):
+    """Get the size, modification time and SHA-1 hash of a file"""
+    stat = stat or os.stat(file_name)
+    with open(file_name, 'rb') as file:
+        digest = hashlib.sha1(file.read()).hexdigest()
+    return {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'sha1': digest}
+
+
+def _read_manifest(manifest_path, output_format='json'):
+    """Read the signatures of previously converted files
+
+    A missing or unreadable manifest, or one written for another
+    output format, is treated as empty, so every file will be
+    converted again.
+    """
+    try:
+        with open(manifest_path) as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    if (manifest.get('version') != MANIFEST_VERSION
+            or manifest.get('format', 'json') != output_format):
+        return {}
+    return manifest.get('files', {})
+
+
+def _write_manifest(manifest_path, files, output_format='json'):
+    """Write the signatures of the converted files"""
+    temp_path = manifest_path + ".tmp"
+    with open(temp_path, 'w') as file:
+        json.dump({'version': MANIFEST_VERSION, 'format': output_format,
+                   'files': files},
+                  file, indent=2, sort_keys=True)
+    os.replace(temp_path, manifest_path)
+
+
+def _is_unchanged(file_name, entry, out_file):
+    """Determine whether a file still matches its manifest entry
+
+    Returns the (possibly refreshed) entry if the file is unchanged
+    and its output file out_file (None if there is none) still exists,
+    otherwise None. The
+    file is only hashed if its size matches but its modification
+    time does not.
+    """
+    if entry is None or out_file is None or not os.path.isfile(out_file):
+        return None
+    stat = os.stat(file_name)
+    if stat.st_size != entry['size']:
+        return None
+    if stat.st_mtime_ns == entry['mtime']:
+        return entry
+    signature = _file_signature(file_name, stat)
+    return signature if signature['sha1'] == entry['sha1'] else None
+
+
+def _write_output_directory(directory, extension=".txt", jobs=1,
+                            incremental=False, force=False,
+                            output_format='json', frame_files=True,
+                            occupancy=False):
     """Parse a directory and write to output directory
 
     Parameters
@@ -136,53 +966,331 @@ def _write_output_directory(directory, extension=".txt"):
             The file extension that determines the files to be read.
             The default (".txt") causes files within the directory that
             have the extension '.txt' to be parsed.
+    jobs : (int), optional
+            The number of worker processes to convert the files with.
+            The default (1) converts the files in this process, 0 uses
+            one worker per CPU.
+    incremental : (bool), optional
+            Record the size, modification time and hash of each converted
+            file in a manifest in the output directory, and only convert
+            the files that are new or have changed since the last
+            incremental conversion. The default (False) converts every
+            file and leaves the manifest alone.
+    force : (bool), optional
+            Convert every file even when the manifest says that it is
+            unchanged. The manifest is still rewritten.
+    output_format : (string), optional
+            One of OUTPUT_FORMATS, the format to write the frames in.
+            Each frame is written to its own file and all of the frames
+            to a 'frames' file with the extension of the format.
+            The default ('json') writes JSON lists of [x, y, c] hits.
+            With 'archive' the frames are only written to a single frame
+            archive, and an incremental conversion that only adds frames
+            after the archived ones appends them to the archive.
+    frame_files : (bool), optional
+            Write each frame to its own file as well as to the 'frames'
+            file. The default (True) does. Without them, the plotter can
+            still read the frames from the 'frames' file, but an
+            incremental conversion converts every file again unless the
+            format is 'archive'.
+    occupancy : (bool), optional
+            Count the frames in which each pixel is hit in a
+            hotpixels.PixelOccupancy, written to the output directory
+            along with its hot pixels. An incremental conversion adds
+            the frames not yet counted to the previous counts, without
+            reading the counted frames again. A counted frame that has
+            changed keeps its first count. The default (False) leaves
+            the occupancy alone.
 
     Returns
     -------
-    Nothing - Used for side-effects.
+    failures : ([(string, Exception)])
+            The files that could not be converted, along with the error.
+            These files are left out of the total frames.
     """
-
-    def get_valid_files(directory, ext):
-        """Get a list of the (files) that match the extension in directory"""
-        files = os.listdir(directory)
-        matches = glob.fnmatch.filter(files, '*{}'.format(ext))
-        full_matches = [os.path.join(directory, file) for file in matches]
-        return [file for file in full_matches if os.path.isfile(file)]
-
     with suppress(FileExistsError):
         os.mkdir(directory + "/output/")
 
-    frames = []
+    out_extension = OUTPUT_FORMATS[output_format]
+    manifest_path = directory + "/output/" + MANIFEST_NAME
+    old_manifest = {}
+    if incremental and not force:
+        old_manifest = _read_manifest(manifest_path, output_format)
+    manifest = {}
 
-    def get_frame_file_number(file_name):
-        """Get the frame number associated with the file"""
-        base = os.path.basename(file_name)
-        print("Got file: {}".format(file_name))
-        return int(
-            re.match('^.*(\d+){}$'.format(
-                re.escape(extension)), base).groups()[0])
+    files = _sorted_frame_files(directory, extension)
+    numbers = [_get_frame_file_number(file, extension) for file in files]
+    frames_path = directory + "/output/frames" + out_extension
 
-    def frame_compare():
-        """Get a sorted array of the files
+    pixel_occupancy = None
+    if occupancy:
+        from analysis import hotpixels
+        occupancy_path = directory + "/output/" + hotpixels.OCCUPANCY_NAME
+        pixel_occupancy = hotpixels.PixelOccupancy()
+        if incremental and not force:
+            with suppress(OSError, ValueError):
+                pixel_occupancy = hotpixels._read_occupancy(occupancy_path)
 
-        This needs to be done so that the JSON output will have
-        the frames in the correct order.
-        """
-        return sorted(
-            get_valid_files(directory, extension),
-            key=get_frame_file_number)
-
-    def write_to_frames_list():
-        """Append the contents of each frame
-        (sorted by frame number) to the total frames"""
-        for file in frame_compare():
-            curr_frame_data = _get_output_data_from_file(file)
-            frames.append(json.loads(curr_frame_data))
-            _write_data(curr_frame_data, _gen_output_path(file))
-
-    write_to_frames_list()
-    with open(directory + "/output/frames.json", 'w') as file:
-        file.write(json.dumps(frames, indent=2))
+    # Frames are archived by number, so unchanged frames can only be
+    # taken from the old archive if it holds their number.
+    old_archive = None
+    archived = {}
+    if output_format == 'archive' and old_manifest:
+        with suppress(OSError, ValueError):
+            old_archive = FrameArchive(frames_path)
+            archived = {number: k
+                        for k, number in enumerate(old_archive.numbers)}
+
+    for file, number in zip(files, numbers):
+        if output_format == 'archive':
+            out_file = frames_path if number in archived else None
+        elif not frame_files:
+            out_file = None
+        else:
+            out_file = _gen_output_path(file, out_extension)
+        entry = _is_unchanged(
+            file, old_manifest.get(os.path.basename(file)), out_file)
+        if entry is not None:
+            manifest[os.path.basename(file)] = entry
+    to_convert = [
+        file for file in files if os.path.basename(file) not in manifest]
+    convert = functools.partial(_convert_file, output_format=output_format,
+                                frame_files=frame_files)
+    results = zip(to_convert, _map_files(convert, to_convert, jobs))
+
+    # An archive whose frames are the unchanged prefix of the directory
+    # is appended to, any other archive is rewritten alongside the old
+    # one, which is still needed for the unchanged frames.
+    append = False
+    writer_path = frames_path
+    if old_archive is not None:
+        num_kept = len(manifest)
+        append = (list(old_archive.numbers) == numbers[:num_kept] and all(
+            os.path.basename(file) in manifest
+            for file in files[:num_kept]))
+        if append:
+            if pixel_occupancy is not None:
+                # The archived frames are not read again when appending
+                for file, number in zip(files[:num_kept], numbers):
+                    if os.path.basename(file) not in pixel_occupancy.names:
+                        pixel_occupancy.add(old_archive[archived[number]],
+                                            os.path.basename(file))
+            old_archive.close()
+        else:
+            writer_path = frames_path + ".tmp"
+
+    failures = []
+    frames_writer = FRAMES_WRITERS[output_format]
+    writer_options = {'append': True} if append else {}
+    with frames_writer(writer_path, **writer_options) as frames:
+        for file, number in zip(files, numbers):
+            if os.path.basename(file) in manifest:
+                if append:
+                    continue
+                elif old_archive is not None:
+                    data = old_archive[archived[number]]
+                    frames.write(data, number)
+                elif output_format == 'json':
+                    cached = _gen_output_path(file, out_extension)
+                    with open(cached) as cached_file:
+                        data = cached_file.read()
+                    frames.write(data)
+                else:
+                    cached = _gen_output_path(file, out_extension)
+                    data = _read_frame_file(cached)
+                    frames.write(data)
+                if pixel_occupancy is not None:
+                    pixel_occupancy.add(data, os.path.basename(file))
+                continue
+            _, (data, err) = next(results)
+            if err is not None:
+                print("Failed to convert {}: {}".format(file, err),
+                      file=sys.stderr)
+                failures.append((file, err))
+                continue
+            print("Got file: {}".format(file))
+            frames.write(data, number)
+            if pixel_occupancy is not None:
+                pixel_occupancy.add(data, os.path.basename(file))
+            if incremental:
+                manifest[os.path.basename(file)] = _file_signature(file)
+
+    if old_archive is not None and not append:
+        old_archive.close()
+        os.replace(writer_path, frames_path)
+    if incremental:
+        _write_manifest(manifest_path, manifest, output_format)
+    if pixel_occupancy is not None:
+        hotpixels._write_occupancy(pixel_occupancy, occupancy_path)
+    return failures
+
+
+def _append_frames_json(file_name, data):
+    """Append a JSON serialised frame to an existing frames.json
+
+    Only the end of the file is rewritten, the frames already in
+    the file are left alone.
+    """
+    with open(file_name, 'r+b') as file:
+        file.seek(0, os.SEEK_END)
+        size = file.tell()
+        file.seek(max(0, size - 2))
+        end = file.read()
+        indented = data.replace("\n", "\n  ").encode()
+        if end == b"[]":
+            file.seek(size - 2)
+            file.write(b"[\n  " + indented + b"\n]")
+        elif end == b"\n]":
+            file.seek(size - 2)
+            file.write(b",\n  " + indented + b"\n]")
+        else:
+            raise ValueError(
+                "Cannot append to frames file: {}".format(file_name))
+
+
+def _append_frame(frames_path, data, number, output_format='json'):
+    """Append a converted frame to an aggregate frames file
+
+    Parameters
+    ----------
+    frames_path : (string)
+            Path to the frames file, which is created if missing
+    data : (String or ndarray)
+            The frame as returned by _convert_file
+    number : (int)
+            The frame number
+    output_format : (string), optional
+            One of the OUTPUT_FORMATS other than 'npz', which cannot be
+            appended to.
+    """
+    if not os.path.exists(frames_path):
+        with FRAMES_WRITERS[output_format](frames_path) as frames:
+            frames.write(data, number)
+    elif output_format == 'json':
+        _append_frames_json(frames_path, data)
+    elif output_format in ('archive', 'bin'):
+        writer = FRAMES_WRITERS[output_format]
+        with writer(frames_path, append=True) as frames:
+            frames.write(data, number)
+    else:
+        raise ValueError(
+            "Cannot append to {} frames files".format(output_format))
+
+
+def _watch_directory(directory, extension=".txt", output_format='json',
+                     interval=1.0, polls=None, frame_files=True,
+                     occupancy=False):
+    """Convert frames as they are written to a directory
+
+    The directory is first brought up to date with an incremental
+    conversion. It is then polled every interval seconds, and each new
+    file whose size is the same in two polls in a row is converted and
+    appended to the aggregate frames file. Only os.stat is used, so
+    this works on any file system. A file that fails to convert is
+    reported once, and only tried again after it changes.
+
+    Parameters
+    ----------
+    directory : (string)
+            Path to the directory to watch
+    extension : (string), optional
+            The file extension of the frame files to convert.
+    output_format : (string), optional
+            One of the OUTPUT_FORMATS other than 'npz'.
+    interval : (float), optional
+            The number of seconds between polls.
+    polls : (int), optional
+            Stop after this many polls. The default (None) watches until
+            interrupted.
+    frame_files : (bool), optional
+            Write each frame to its own file as well as appending it to
+            the 'frames' file. The default (True) does.
+    occupancy : (bool), optional
+            Add each converted frame to the pixel occupancy of the
+            directory, as with _write_output_directory.
+
+    Returns
+    -------
+    latencies : ([(string, float)])
+            Each converted file along with the number of seconds from
+            when it was last written to when its frame was appended.
+    """
+    if output_format == 'npz':
+        raise ValueError("Cannot watch a directory with the npz format")
+    failures = _write_output_directory(
+        directory, extension, incremental=True, output_format=output_format,
+        frame_files=frame_files, occupancy=occupancy)
+    out_extension = OUTPUT_FORMATS[output_format]
+    frames_path = directory + "/output/frames" + out_extension
+    manifest_path = directory + "/output/" + MANIFEST_NAME
+    manifest = _read_manifest(manifest_path, output_format)
+    pixel_occupancy = None
+    if occupancy:
+        from analysis import hotpixels
+        occupancy_path = directory + "/output/" + hotpixels.OCCUPANCY_NAME
+        pixel_occupancy = hotpixels._read_occupancy(occupancy_path)
+
+    # The size and modification time of each file that failed to convert
+    failed = {}
+    for file, _ in failures:
+        with suppress(FileNotFoundError):
+            stat = os.stat(file)
+            failed[file] = (stat.st_size, stat.st_mtime_ns)
+    sizes = {}
+    latencies = []
+    poll = 0
+    try:
+        while polls is None or poll < polls:
+            if poll:
+                time.sleep(interval)
+            poll += 1
+            stable = []
+            new_sizes = {}
+            for file in _sorted_frame_files(
+                    directory, extension, report=False):
+                if os.path.basename(file) in manifest:
+                    continue
+                with suppress(FileNotFoundError):
+                    stat = os.stat(file)
+                    if failed.get(file) == (stat.st_size, stat.st_mtime_ns):
+                        continue
+                    new_sizes[file] = stat.st_size
+                    if sizes.get(file) == new_sizes[file]:
+                        stable.append((file, stat))
+            sizes = new_sizes
+            stable.sort(key=lambda item: _get_frame_file_number(
+                item[0], extension))
+            for file, stat in stable:
+                data, err = _convert_file(file, output_format, frame_files)
+                if err is not None:
+                    print("Failed to convert {}: {}".format(file, err),
+                          file=sys.stderr)
+                    failed[file] = (stat.st_size, stat.st_mtime_ns)
+                    continue
+                failed.pop(file, None)
+                number = _get_frame_file_number(file, extension)
+                _append_frame(frames_path, data, number, output_format)
+                if pixel_occupancy is not None:
+                    pixel_occupancy.add(data, os.path.basename(file))
+                signature = _file_signature(file)
+                manifest[os.path.basename(file)] = signature
+                latency = time.time() - signature['mtime'] / 1e9
+                latencies.append((file, latency))
+                print("Converted {} ({:.3f}s after it was written)".format(
+                    file, latency))
+            if stable:
+                _write_manifest(manifest_path, manifest, output_format)
+                if pixel_occupancy is not None:
+                    hotpixels._write_occupancy(
+                        pixel_occupancy, occupancy_path)
+    except KeyboardInterrupt:
+        pass
+    if latencies:
+        times = [latency for _, latency in latencies]
+        print("Converted {} file(s), latency mean {:.3f}s, "
+              "max {:.3f}s".format(
+                  len(times), sum(times) / len(times), max(times)))
+    return latencies
 
 
 def _gen_output_path(fname, extension='.json'):
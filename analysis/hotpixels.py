@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# hotpixels.py
+
+import os
+
+import numpy as np
+
+from analysis import frame_parser as fp
+from analysis import sparse
+
+# The name of the occupancy file written to the output directory
+OCCUPANCY_NAME = "occupancy.npz"
+
+# A pixel hit in at least this fraction of the frames is hot
+HOT_PIXEL_OCCUPANCY = 0.1
+
+# No pixel is hot until at least this many frames have been counted
+HOT_PIXEL_MIN_FRAMES = 100
+
+
+class PixelOccupancy:
+    """The number of frames in which each pixel of a run was hit
+
+    A particle hits only a few hundred of the 65536 pixels of a frame,
+    so a pixel hit in a large fraction of the frames is hot or noisy.
+    Frames are added one at a time and only the counts are kept, so the
+    occupancy of a growing run is updated without reading its earlier
+    frames again.
+
+    Parameters
+    ----------
+    threshold : (float), optional
+            The occupancy at which a pixel is hot
+    min_frames : (int), optional
+            The number of frames needed before any pixel is hot
+
+    Attributes
+    ----------
+    frames : (int)
+            The number of frames added
+    hits : (ndarray)
+            The number of frames in which each pixel was hit
+    names : (set (string))
+            The names of the frames added, which are not counted again
+    """
+
+    def __init__(self, threshold=HOT_PIXEL_OCCUPANCY,
+                 min_frames=HOT_PIXEL_MIN_FRAMES):
+        self.threshold = threshold
+        self.min_frames = min_frames
+        self.frames = 0
+        self.hits = np.zeros(fp.FRAME_SHAPE, dtype=np.int64)
+        self.names = set()
+
+    @property
+    def occupancy(self):
+        """The fraction of the frames in which each pixel was hit"""
+        if not self.frames:
+            return np.zeros(fp.FRAME_SHAPE)
+        return self.hits / self.frames
+
+    @property
+    def hot_pixels(self):
+        """The mask of the pixels at or above the threshold occupancy"""
+        if self.frames < max(self.min_frames, 1):
+            return np.zeros(fp.FRAME_SHAPE, dtype=bool)
+        return self.occupancy >= self.threshold
+
+    def add(self, frame, name=None):
+        """Add the hits of a frame
+
+        Parameters
+        ----------
+        frame : (SparseFrame or string or list-like (x, y, c))
+                The hits of the frame, or its JSON as written by the
+                frame parser. Hits with a count of 0 are left out.
+        name : (string), optional
+                The name of the frame. A frame whose name has already
+                been added is not counted again.
+
+        Returns
+        -------
+        added : (bool)
+                Whether the frame was counted
+        """
+        if name is not None:
+            if name in self.names:
+                return False
+            self.names.add(name)
+        if isinstance(frame, str):
+            frame = fp._parse_frame_json(frame.encode())
+        if isinstance(frame, sparse.SparseFrame):
+            keep = ~frame.mask
+            xs, ys = frame.x[keep], frame.y[keep]
+        else:
+            xs, ys, cs = np.asarray(frame).reshape(-1, 3).transpose()
+            keep = cs != 0
+            xs, ys = xs[keep].astype(np.intp), ys[keep].astype(np.intp)
+        hit = np.zeros(fp.FRAME_SHAPE, dtype=bool)
+        hit[xs, ys] = True
+        self.hits += hit
+        self.frames += 1
+        return True
+
+
+def _read_occupancy(file_name):
+    """Read a PixelOccupancy written by _write_occupancy
+
+    Raises
+    ------
+    OSError
+            If the file cannot be read
+    ValueError
+            If the file is not an occupancy file
+    """
+    with np.load(file_name) as data:
+        try:
+            occupancy = PixelOccupancy(float(data['threshold']),
+                                       int(data['min_frames']))
+            occupancy.frames = int(data['frames'])
+            hits = data['hits']
+            names = data['names']
+        except KeyError as err:
+            raise ValueError("Not an occupancy file: {}".format(
+                file_name)) from err
+    if hits.shape != fp.FRAME_SHAPE:
+        raise ValueError("Not an occupancy file: {}".format(file_name))
+    occupancy.hits = hits.astype(np.int64)
+    occupancy.names = set(names.tolist())
+    return occupancy
+
+
+def _write_occupancy(occupancy, file_name):
+    """Write the counts of a PixelOccupancy along with its hot pixels
+
+    The file is replaced in one step, so an interrupted update leaves
+    the previous counts behind.
+    """
+    temp_path = file_name + ".tmp.npz"
+    np.savez(temp_path, frames=occupancy.frames, hits=occupancy.hits,
+             names=np.array(sorted(occupancy.names), dtype=str),
+             threshold=occupancy.threshold,
+             min_frames=occupancy.min_frames,
+             hot_pixels=occupancy.hot_pixels)
+    os.replace(temp_path, file_name)
+
+
+def _read_hot_pixels(file_name, threshold=None):
+    """Read the hot pixel mask of an occupancy file
+
+    Parameters
+    ----------
+    file_name : (string)
+            The occupancy file written by _write_occupancy
+    threshold : (float), optional
+            The occupancy at which a pixel is hot. The default (None)
+            uses the threshold the file was written with.
+
+    Returns
+    -------
+    hot_pixels : (ndarray)
+            The (256, 256) boolean mask of the hot pixels
+    """
+    occupancy = _read_occupancy(file_name)
+    if threshold is not None:
+        occupancy.threshold = threshold
+    return occupancy.hot_pixels
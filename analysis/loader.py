@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# loader.py
+
+import collections
+import os
+
+from analysis import dsc_parser as dscp
+from analysis import frame_parser as fp
+from analysis import sparse
+
+
+class Frame:
+    """The pixel data of a frame file along with its DSC metadata
+
+    The hits are read when the frame is loaded, the .dsc file is only
+    parsed the first time that metadata is needed. The fields of the
+    metadata are also available as attributes of the frame, as in
+    frame._bias_voltage.
+
+    Parameters
+    ----------
+    path : (string)
+            Path to the frame file
+    hits : (ndarray)
+            The (N, 3) array of [x, y, c] hits of the frame
+    number : (int), optional
+            The frame number
+    dsc_path : (string), optional
+            Path to the .dsc file describing the frame, if there is one
+    """
+    __slots__ = ('_path', '_hits', '_number', '_dsc_path', '_metadata')
+
+    def __init__(self, path, hits, number=None, dsc_path=None):
+        self._path = path
+        self._hits = hits
+        self._number = number
+        self._dsc_path = dsc_path
+        self._metadata = None
+
+    @property
+    def path(self):
+        """Path to the frame file"""
+        return self._path
+
+    @property
+    def hits(self):
+        """The (N, 3) array of [x, y, c] hits"""
+        return self._hits
+
+    @property
+    def sparse(self):
+        """The hits as a sparse.SparseFrame"""
+        return sparse.SparseFrame.from_hits(self._hits)
+
+    @property
+    def number(self):
+        """The frame number"""
+        return self._number
+
+    @property
+    def dsc_path(self):
+        """Path to the .dsc file, None if the frame does not have one"""
+        return self._dsc_path
+
+    @property
+    def metadata(self):
+        """The dsc_parser.Frame parsed from the .dsc file
+
+        The file is parsed on first access. This is None if the frame
+        does not have a .dsc file.
+        """
+        if self._metadata is None and self._dsc_path is not None:
+            self._metadata = dscp._streaming_parser._frame_from_file(
+                self._dsc_path)
+        return self._metadata
+
+    def __getattr__(self, name):
+        field = name[1:]
+        if name.startswith('_') and (
+                field in dscp.METADATA_FIELDS or field in dscp.FRAME_FIELDS):
+            metadata = self.metadata
+            if metadata is None:
+                raise AttributeError(
+                    "Frame {} has no .dsc file for '{}'".format(
+                        self._path, field))
+            return getattr(metadata, name)
+        raise AttributeError(
+            "'Frame' object has no attribute '{}'".format(name))
+
+
+def _load_frame(file_name, extension=".txt"):
+    """Load a frame file and pair it with its .dsc file
+
+    Parameters
+    ----------
+    file_name : (string)
+            Path to the frame file, as in 'data12.txt'. Its .dsc file is
+            expected at the same path with '.dsc' appended.
+    extension : (string), optional
+            The extension of the frame file, used to find its number.
+
+    Returns
+    -------
+    frame : (Frame)
+            The frame, whose metadata has not been parsed yet
+    """
+    hits = fp._get_frame_array_from_file(file_name)
+    try:
+        number = fp._get_frame_file_number(file_name, extension)
+    except ValueError:
+        number = None
+    dsc_path = file_name + ".dsc"
+    if not os.path.isfile(dsc_path):
+        dsc_path = None
+    return Frame(file_name, hits, number, dsc_path)
+
+
+def _iter_directory(directory, extension=".txt", numbers=None):
+    """Load the frames of a directory in frame number order
+
+    Each frame file is only read when its frame is reached, so
+    stopping part way through a directory does not read the rest.
+
+    Parameters
+    ----------
+    directory : (string)
+            Path to the directory holding the frame files
+    extension : (string), optional
+            The extension of the frame files.
+    numbers : (container (int)), optional
+            The frame numbers to load, such as a range. The files of
+            other frames are not read. The default (None) loads every
+            frame.
+
+    Returns
+    -------
+    frames : (iterator (Frame))
+            The frames, in frame number order
+    """
+    for file_name in fp._sorted_frame_files(directory, extension):
+        if numbers is not None and (
+                fp._get_frame_file_number(file_name, extension)
+                not in numbers):
+            continue
+        yield _load_frame(file_name, extension)
+
+
+class FrameRef(str):
+    """A frame to be read later, from a frame file or a 'frames' file
+
+    Plotting a run only needs one frame at a time, so the frames of
+    directories and 'frames' files are referred to by where they are
+    until they are drawn. A FrameRef is also a string, the name that
+    plots of the frame are written by: the frame file itself, or
+    'frames_<number>' next to a 'frames' file. Being a string, rather
+    than only defining __fspath__, lets it be passed to os.path before
+    Python 3.6.
+
+    Parameters
+    ----------
+    path : (string)
+            Path to the unconverted frame file, or to the 'frames' file
+            or frame archive holding the frame
+    index : (int), optional
+            The position of the frame in the 'frames' file. The default
+            (None) reads path as a single unconverted frame file.
+    number : (int), optional
+            The frame number
+    """
+    def __new__(cls, path, index=None, number=None):
+        name = path
+        if index is not None:
+            base = os.path.splitext(os.path.basename(path))[0]
+            name = os.path.join(os.path.dirname(path), "{}_{}".format(
+                base, index if number is None else number))
+        ref = super().__new__(cls, name)
+        ref._path = path
+        ref._index = index
+        ref._number = number
+        return ref
+
+    def __getnewargs__(self):
+        return (self._path, self._index, self._number)
+
+    @property
+    def path(self):
+        """Path to the file holding the frame"""
+        return self._path
+
+    @property
+    def index(self):
+        """The position of the frame in its 'frames' file, if it has one"""
+        return self._index
+
+    @property
+    def number(self):
+        """The frame number"""
+        return self._number
+
+    def load(self):
+        """Read the (N, 3) array of [x, y, c] hits of the frame"""
+        if self._index is None:
+            return fp._get_frame_array_from_file(self._path)
+        stat = os.stat(self._path)
+        frames = _open_frames_file(
+            self._path, stat.st_size, stat.st_mtime_ns)
+        return frames[self._index]
+
+    def __str__(self):
+        return str.__str__(self)
+
+    def __repr__(self):
+        return "FrameRef({!r}, {!r}, {!r})".format(
+            self._path, self._index, self._number)
+
+    def __eq__(self, other):
+        if not isinstance(other, FrameRef):
+            return NotImplemented
+        return ((self._path, self._index, self._number) ==
+                (other._path, other._index, other._number))
+
+    def __hash__(self):
+        return hash((self._path, self._index, self._number))
+
+
+# The 'frames' files kept open by _open_frames_file, most recent last
+MAX_OPEN_FRAMES_FILES = 4
+_open_files = collections.OrderedDict()
+
+
+def _open_frames_file(file_name, size=None, mtime=None):
+    """Open a 'frames' file for reading its frames by position
+
+    The last MAX_OPEN_FRAMES_FILES files opened are kept for the next
+    frame, and closed once they are no longer among them. The size and
+    modification time of the file are part of the key so that a file
+    that has changed is opened again. Frame archives and frames JSON
+    files are memory-mapped and each frame is only read when it is
+    asked for, the frames of other formats are all read at once.
+    """
+    key = (file_name, size, mtime)
+    if key in _open_files:
+        _open_files.move_to_end(key)
+        return _open_files[key]
+    extension = os.path.splitext(file_name)[1]
+    if extension == fp.OUTPUT_FORMATS['archive']:
+        frames = fp.FrameArchive(file_name)
+    elif extension == fp.OUTPUT_FORMATS['json']:
+        frames = fp.FramesJSON(file_name)
+    else:
+        frames = list(fp._iter_frames_file(file_name))
+    _open_files[key] = frames
+    while len(_open_files) > MAX_OPEN_FRAMES_FILES:
+        _, evicted = _open_files.popitem(last=False)
+        _close_frames(evicted)
+    return frames
+
+
+def _close_frames(frames):
+    """Close the frames returned by _open_frames_file, if they are open"""
+    if isinstance(frames, (fp.FrameArchive, fp.FramesJSON)):
+        frames.close()
+
+
+def _close_frames_files():
+    """Close every 'frames' file kept open by _open_frames_file"""
+    while _open_files:
+        _close_frames(_open_files.popitem()[1])
+
+
+def _frame_refs(paths, numbers=None, extension=".txt"):
+    """Find the frames of files and directories without reading them
+
+    Parameters
+    ----------
+    paths : (list (string))
+            The files and directories holding the frames. Directories
+            are read as unconverted frame files with the extension, in
+            frame number order. Frame archives and 'frames' files give
+            each of their frames, any other file is a converted frame
+            file and is given as it is.
+    numbers : (container (int)), optional
+            The frame numbers to select from directories and 'frames'
+            files, such as a range. The frames of 'frames' files without
+            frame numbers are numbered by their position. The default
+            (None) selects every frame. Converted frame files are always
+            selected.
+    extension : (string), optional
+            The extension of the frame files in directories
+
+    Returns
+    -------
+    frames : (list (FrameRef or string))
+            A FrameRef for each selected frame of a directory or
+            'frames' file, and the path of each converted frame file
+    """
+    refs = []
+    for path in paths:
+        if os.path.isdir(path):
+            for file_name in fp._sorted_frame_files(path, extension):
+                number = fp._get_frame_file_number(file_name, extension)
+                if numbers is None or number in numbers:
+                    refs.append(FrameRef(file_name, number=number))
+        elif fp._is_frames_file(path):
+            stat = os.stat(path)
+            frames = _open_frames_file(path, stat.st_size, stat.st_mtime_ns)
+            if isinstance(frames, fp.FrameArchive):
+                frame_numbers = frames.numbers.tolist()
+            else:
+                frame_numbers = range(len(frames))
+            refs.extend(
+                FrameRef(path, index, number)
+                for index, number in enumerate(frame_numbers)
+                if numbers is None or number in numbers)
+        else:
+            refs.append(path)
+    return refs
@@ -1,19 +1,38 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from matplotlib import pyplot as plt
-
 import numpy as np
 import numpy.ma as ma
 
 from contextlib import suppress
-import json
+from functools import partial
 import math
 import os
+import struct
+import sys
+import time
+import zlib
+
+from analysis import frame_parser as fp
+from analysis import loader
+from analysis import rejection
+from analysis import sparse
+
+# The ColorBrewer colours of matplotlib's 'Reds' colormap, from low to high
+REDS = ['fff5f0', 'fee0d2', 'fcbba1', 'fc9272', 'fb6a4a', 'ef3b2c', 'cb181d',
+        'a50f15', '67000d']
+
 
+def _write_multi(files, output=None, outliers=None, outlier_method='std',
+                 hot_pixels=None):
+    """Read several files and write their heatmaps as a single image
 
-def _write_multi(files, output=None):
-    fig, ax, heatmap = _read_and_generate_heatmaps(files)
+    The outliers, outlier_method and hot_pixels are as for
+    _read_and_generate_heatmaps.
+    """
+    fig, ax, heatmap = _read_and_generate_heatmaps(
+        files, outliers=outliers, outlier_method=outlier_method,
+        hot_pixels=hot_pixels)
     dname = os.path.dirname(files[0]) + "/plots"
     with suppress(FileExistsError):
         os.mkdir(dname)
@@ -39,13 +58,62 @@ def _gen_heatmap_from_file(file_name, **kwargs):
     heatmap : (Todo: Unknown)
         The actual heatmap object
     """
-    with open(file_name) as f:
-        frame = json.load(f, parse_float=lambda x: int(float(x)))
-    data = _generate_with_coordinates(frame, **kwargs)
-    return _gen_heatmap(data)
+    return _gen_heatmap(_load_sparse_frame(file_name, **kwargs))
+
+
+def _load_sparse_frame(file_name, outliers=None, outlier_method='std',
+                       hot_pixels=None):
+    """Load a frame file as a SparseFrame, masking any outliers
 
+    Parameters
+    ----------
+    file_name : (string)
+            The name of the file to be read
+    outliers : (number)
+            The value to be used when calculating outliers, or None
+            for outliers not to be calculated.
+    outlier_method : (string)
+            The criterion outliers are found by, one of
+            rejection.OUTLIER_METHODS
+    hot_pixels : (ndarray)
+            A boolean mask of fp.FRAME_SHAPE, such as the hot pixels of
+            hotpixels._read_hot_pixels, whose hits are masked, or None
+
+    Returns
+    -------
+    frame : (SparseFrame)
+            The hits of the frame
+    """
+    return _sparse_frame(_load_frame_file(file_name), outliers=outliers,
+                         outlier_method=outlier_method,
+                         hot_pixels=hot_pixels)
+
+
+def _load_frame_file(file_name):
+    """Load the [x, y, c] hits of a frame file
+
+    Frame files in the binary formats written by the frame parser
+    ('.npz', '.bin' and the first frame of a '.rla' frame archive)
+    are read directly, anything else is read as a JSON list of hits.
+
+    Parameters
+    ----------
+    file_name : (string or loader.FrameRef)
+            The name of the file to be read, or a reference to a frame
+            of a directory or 'frames' file
+
+    Returns
+    -------
+    frame : (list-like (x, y, z))
+            The hits of the frame
+    """
+    if isinstance(file_name, loader.FrameRef):
+        return file_name.load()
+    return fp._read_frame_file(file_name)
 
-def _write_heatmap_from_file(input_file, output=None):
+
+def _write_heatmap_from_file(input_file, output=None, outliers=None,
+                             outlier_method='std', hot_pixels=None):
     """Read a file and write a heatmap image
 
     Parameters
@@ -55,12 +123,22 @@ def _write_heatmap_from_file(input_file, output=None):
     output     : (string)
             The path to write the heatmap to - will save to a plots folder
             if not specified
+    outliers   : (float)
+            The value to be used in outlier calculations
+    outlier_method : (string)
+            The criterion outliers are found by, one of
+            rejection.OUTLIER_METHODS
+    hot_pixels : (ndarray)
+            A boolean mask of fp.FRAME_SHAPE whose hits are masked
+            before finding outliers, or None
 
     Returns
     -------
     Nothing - Used for side effects
     """
-    fig, ax, heatmap = _gen_heatmap_from_file(input_file)
+    fig, ax, heatmap = _gen_heatmap_from_file(
+        input_file, outliers=outliers, outlier_method=outlier_method,
+        hot_pixels=hot_pixels)
     dname = os.path.dirname(input_file) + "/plots"
     with suppress(FileExistsError):
         os.mkdir(dname)
@@ -69,6 +147,361 @@ def _write_heatmap_from_file(input_file, output=None):
         (fig, ax, heatmap))
 
 
+def _plot_path(file_name, folder="plots"):
+    """Get the path of the heatmap image for a frame file
+
+    The image is written to a folder ('plots' by default) next to the
+    file, which is created if needed.
+    """
+    dname = os.path.dirname(file_name) + "/" + folder
+    with suppress(FileExistsError):
+        os.mkdir(dname)
+    return "{}/{}.png".format(dname, os.path.basename(file_name))
+
+
+class _HeatmapRenderer:
+    """Render many frame heatmaps with a single figure
+
+    The figure, axes and heatmap are built once. Each frame then only
+    replaces the data of the heatmap before the figure is saved, so
+    rendering does not create a figure per frame and the figure is
+    closed once rendering is done.
+
+    Use as a context manager, or call close when done.
+    """
+
+    def __init__(self):
+        from matplotlib import pyplot as plt
+        self._plt = plt
+        self.fig, self.ax = _generate_basic_figure()
+        empty = ma.masked_all((256, 256))
+        self.heatmap = self.ax.pcolormesh(empty, cmap='Reds')
+
+    def render(self, data, output_path):
+        """Write the heatmap of data to output_path
+
+        Parameters
+        ----------
+        data : (SparseFrame or ndarray)
+                The frame to be plotted, or its (256, 256) data as
+                generated by _generate_with_coordinates
+        output_path : (string)
+                The path for the heatmap to be saved to
+        """
+        self.heatmap.set_array(sparse._to_dense(data))
+        # Scale the colours to this frame as a new heatmap would
+        self.heatmap.autoscale()
+        self.fig.savefig(output_path)
+
+    def close(self):
+        """Close the figure"""
+        self._plt.close(self.fig)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _render_heatmap_file(renderer, file_name, outliers=None,
+                         outlier_method='std', hot_pixels=None):
+    """Write the heatmap of a file with renderer
+
+    Errors are returned rather than raised, so that the rest of a batch
+    of files can still be plotted.
+
+    Returns
+    -------
+    (output_path, err) : (string, Exception)
+        The path the heatmap was written to and None, or None and the
+        error that stopped the file being plotted.
+    """
+    try:
+        data = _load_sparse_frame(
+            file_name, outliers, outlier_method, hot_pixels)
+        output_path = _plot_path(file_name)
+        renderer.render(data, output_path)
+    except (OSError, ValueError) as err:
+        return None, err
+    return output_path, None
+
+
+# The renderer of a worker process, created by its first file
+_worker_renderer = None
+
+
+def _render_heatmap_in_worker(file_name, outliers=None, outlier_method='std',
+                              hot_pixels=None):
+    """Write the heatmap of a file with the renderer of this worker
+
+    Each worker process draws with the non-interactive Agg backend and
+    keeps a single renderer for all of the files it is given.
+    """
+    global _worker_renderer
+    if _worker_renderer is None:
+        import matplotlib
+        matplotlib.use('Agg')
+        _worker_renderer = _HeatmapRenderer()
+    return _render_heatmap_file(
+        _worker_renderer, file_name, outliers, outlier_method, hot_pixels)
+
+
+def _write_heatmaps_from_files(file_names, outliers=None, jobs=1,
+                               outlier_method='std', hot_pixels=None):
+    """Write a heatmap image for each of the files
+
+    The images are written to a plots folder next to each file, as
+    with _write_heatmap_from_file, but each process reuses the same
+    figure for every file. The progress is printed as the files are
+    plotted, followed by the number of heatmaps written per second.
+
+    Parameters
+    ----------
+    file_names : (list (string))
+            The paths of the files to be read
+    outliers   : (float)
+            The value to be used in outlier calculations
+    jobs       : (int)
+            The number of worker processes to plot the files with.
+            The default (1) plots the files in this process, 0 uses
+            one worker per CPU.
+    outlier_method : (string)
+            The criterion outliers are found by, one of
+            rejection.OUTLIER_METHODS
+    hot_pixels : (ndarray)
+            A boolean mask of fp.FRAME_SHAPE whose hits are masked
+            before finding outliers, or None
+
+    Returns
+    -------
+    failures : (list (string, Exception))
+        The files that could not be plotted, along with the error
+    """
+    start = time.perf_counter()
+    if jobs == 1:
+        with _HeatmapRenderer() as renderer:
+            failures = _report_plots(file_names, (
+                _render_heatmap_file(
+                    renderer, file_name, outliers, outlier_method,
+                    hot_pixels)
+                for file_name in file_names))
+    else:
+        failures = _report_plots(file_names, fp._map_files(
+            partial(_render_heatmap_in_worker, outliers=outliers,
+                    outlier_method=outlier_method, hot_pixels=hot_pixels),
+            file_names, jobs))
+    elapsed = time.perf_counter() - start
+    written = len(file_names) - len(failures)
+    print("Wrote {} heatmap(s) in {:.1f}s ({:.1f} per second)".format(
+        written, elapsed, written / elapsed if elapsed else 0.0))
+    return failures
+
+
+def _report_plots(file_names, results):
+    """Print the progress of plotting file_names, returning the failures"""
+    failures = []
+    for count, (file_name, (output_path, err)) in enumerate(
+            zip(file_names, results), 1):
+        if err is not None:
+            print("Failed to plot {}: {}".format(file_name, err),
+                  file=sys.stderr)
+            failures.append((file_name, err))
+            continue
+        print("[{}/{}] Wrote {}".format(count, len(file_names), output_path))
+    return failures
+
+
+def _colormap_table(colors=REDS, num=256):
+    """Build a lookup table of num colours spread evenly along colors
+
+    The table matches the one matplotlib builds for a colormap of the
+    same colours, so that the thumbnails look like the heatmaps.
+
+    Parameters
+    ----------
+    colors : (list (string))
+            The hex RGB colours of the colormap, from low to high
+    num    : (int)
+            The number of entries in the table
+
+    Returns
+    -------
+    table : (ndarray)
+        The (num, 3) uint8 RGB lookup table
+    """
+    points = np.array([bytearray.fromhex(c) for c in colors], dtype=float)
+    stops = np.linspace(0, num - 1, len(colors))
+    table = np.column_stack(
+        [np.interp(np.arange(num), stops, points[:, k] / 255)
+         for k in range(3)])
+    return (table * 255).astype(np.uint8)
+
+
+def _colormap_indices(data, num, scale=None):
+    """Get the index of the colour of each pixel in a table of num colours
+
+    The values are scaled between the smallest and largest unmasked
+    value, as the heatmaps are, unless a fixed scale is given. Masked
+    values get the index num, one past the end of the table. The rows
+    are flipped so that the first row of data is at the bottom of the
+    image, as it is in the heatmaps.
+
+    Parameters
+    ----------
+    data  : (SparseFrame or MaskedArray)
+            The frame to be coloured, or its array as from
+            _generate_with_coordinates
+    num   : (int)
+            The number of colours in the table
+    scale : (tuple (number, number))
+            The values given the first and last colours, values outside
+            of the scale get the nearest of the two.
+
+    Returns
+    -------
+    index : (ndarray)
+        The (rows, cols) array of indices
+    """
+    data = sparse._to_dense(data)
+    values = ma.getdata(data)[::-1].astype(float)
+    mask = ma.getmaskarray(data)[::-1]
+    if scale is None:
+        unmasked = values[~mask]
+        scale = (unmasked.min(), unmasked.max()) if unmasked.size else (0, 0)
+    low, high = scale
+    if high > low:
+        values -= low
+        values *= num / (high - low)
+        np.clip(values, 0, num - 1, out=values)
+        index = values.astype(np.intp)
+    else:
+        index = np.zeros(values.shape, dtype=np.intp)
+    index[mask] = num
+    return index
+
+
+def _apply_colormap(data, table, background=(255, 255, 255), scale=None):
+    """Colour a frame array with a lookup table
+
+    The colours are chosen as by _colormap_indices, and masked values
+    get the background colour.
+
+    Parameters
+    ----------
+    data  : (SparseFrame or MaskedArray)
+            The frame to be coloured, or its array as from
+            _generate_with_coordinates
+    table : (ndarray)
+            The (N, 3) uint8 RGB lookup table
+    background : (tuple (int))
+            The RGB colour of masked values
+    scale : (tuple (number, number))
+            The values given the first and last colours, by default the
+            smallest and largest values of the frame.
+
+    Returns
+    -------
+    rgb : (ndarray)
+        The (rows, cols, 3) uint8 image
+    """
+    index = _colormap_indices(data, len(table), scale)
+    # Masked values take the background colour appended to the table
+    return np.vstack([table, background]).astype(np.uint8)[index]
+
+
+def _png_chunk(chunk_type, data):
+    """Pack a PNG chunk"""
+    return (struct.pack(">I", len(data)) + chunk_type + data +
+            struct.pack(">I", zlib.crc32(chunk_type + data) & 0xffffffff))
+
+
+def _encode_png(rgb, level=6):
+    """Encode an RGB image as a PNG
+
+    Parameters
+    ----------
+    rgb   : (ndarray)
+            The (rows, cols, 3) uint8 image
+    level : (int)
+            The zlib compression level
+
+    Returns
+    -------
+    png : (bytes)
+        The PNG file contents
+    """
+    rows, cols, _ = rgb.shape
+    # Each row of the image data starts with its filter type, 0 for none
+    raw = np.zeros((rows, cols * 3 + 1), dtype=np.uint8)
+    raw[:, 1:] = rgb.reshape(rows, cols * 3)
+    header = struct.pack(">IIBBBBB", cols, rows, 8, 2, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' +
+            _png_chunk(b'IHDR', header) +
+            _png_chunk(b'IDAT', zlib.compress(raw.tobytes(), level)) +
+            _png_chunk(b'IEND', b''))
+
+
+def _write_thumbnail(data, output_path, table=None):
+    """Write a frame array as a PNG image without matplotlib
+
+    Parameters
+    ----------
+    data : (SparseFrame or ndarray)
+            The frame to be plotted, or its array as from
+            _generate_with_coordinates
+    output_path : (string)
+            The path for the image to be saved to
+    table : (ndarray)
+            The RGB lookup table, the 'Reds' colormap by default
+
+    Returns
+    -------
+    Nothing - Used for side effects
+    """
+    if table is None:
+        table = _colormap_table()
+    with open(output_path, 'wb') as f:
+        f.write(_encode_png(_apply_colormap(data, table)))
+
+
+def _write_thumbnails_from_files(file_names, outliers=None,
+                                 outlier_method='std', hot_pixels=None):
+    """Write a thumbnail image for each of the files
+
+    The images are written to a thumbnails folder next to each file.
+    Files that cannot be plotted are reported, and the rest are still
+    written.
+
+    Parameters
+    ----------
+    file_names : (list (string))
+            The paths of the files to be read
+    outliers   : (float)
+            The value to be used in outlier calculations
+    hot_pixels : (ndarray)
+            A boolean mask of fp.FRAME_SHAPE whose hits are masked
+            before finding outliers, or None
+
+    Returns
+    -------
+    failures : ([(string, Exception)])
+            Each file that could not be plotted, along with its error
+    """
+    table = _colormap_table()
+
+    def write(file_name):
+        try:
+            data = _load_sparse_frame(
+                file_name, outliers, outlier_method, hot_pixels)
+            output_path = _plot_path(file_name, "thumbnails")
+            _write_thumbnail(data, output_path, table)
+        except (OSError, ValueError) as err:
+            return None, err
+        return output_path, None
+    return _report_plots(file_names, map(write, file_names))
+
+
 def _write_heatmap(output_path, heatmap):
     """Write the heatmap to the specified path
 
@@ -107,6 +540,9 @@ def _generate_basic_figure(num=1):
         y = math.ceil(num / x)
         return (x, y)
 
+    # Imported here so that loading frames does not load matplotlib
+    from matplotlib import pyplot as plt
+
     rows, cols = get_shape(num)
     if cols > 1 and rows == 1:
         rows = 2
@@ -139,8 +575,8 @@ def _gen_heatmap(data):
 
     Parameters
     ----------
-    data : (ndarray)
-            The data to be plotted on the heatmap
+    data : (SparseFrame or ndarray)
+            The frame to be plotted on the heatmap, or its data
 
     Returns
     -------
@@ -152,10 +588,157 @@ def _gen_heatmap(data):
         The actual heatmap object
     """
     fig, ax = _generate_basic_figure()
-    heatmap = ax.pcolormesh(data, cmap=plt.cm.Reds)
+    heatmap = ax.pcolormesh(sparse._to_dense(data), cmap='Reds')
     return fig, ax, heatmap
 
 
+def _mosaic_layout(num, columns=None, downsample=1, gap=2):
+    """Get the layout of a mosaic of num frames
+
+    Returns
+    -------
+    (rows, columns, tile, step) : (int, int, int, int)
+        The number of rows and columns of tiles, the size of each tile
+        in pixels and the distance between the starts of the tiles
+    """
+    columns = columns or max(1, math.ceil(math.sqrt(num)))
+    rows = max(1, math.ceil(num / columns))
+    tile = -(-fp.FRAME_SHAPE[0] // downsample)
+    return rows, columns, tile, tile + gap
+
+
+def _build_mosaic(frames, columns=None, downsample=1, gap=2):
+    """Tile frames into a single array
+
+    The frames are laid out in rows from the top left, each oriented
+    as in its own heatmap. Only the hits of each frame are placed, so
+    building the mosaic takes time in proportion to its size and the
+    number of hits rather than to the number of frames.
+
+    Parameters
+    ----------
+    frames : (list (SparseFrame or list-like (x, y, z)))
+            The frames to be tiled
+    columns : (int)
+            The number of frames in each row, by default enough to make
+            the mosaic roughly square
+    downsample : (int)
+            The factor to shrink each frame by. Each pixel of a
+            downsampled tile has the largest count of the block of
+            pixels it covers.
+    gap : (int)
+            The number of blank pixels between tiles
+
+    Returns
+    -------
+    mosaic : (MaskedArray)
+        The mosaic, masked where there is no hit
+    """
+    rows, columns, tile, step = _mosaic_layout(
+        len(frames), columns, downsample, gap)
+    shape = (rows * step - gap, columns * step - gap)
+    data = np.zeros(shape)
+    mask = np.ones(shape, dtype=bool)
+    for k, frame in enumerate(frames):
+        if not isinstance(frame, sparse.SparseFrame):
+            frame = sparse.SparseFrame.from_hits(frame)
+        keep = ~frame.mask
+        row, column = divmod(k, columns)
+        # Flipped so that the first row of a frame is at the bottom
+        pixels = (row * step + tile - 1 - frame.x[keep] // downsample,
+                  column * step + frame.y[keep] // downsample)
+        np.maximum.at(data, pixels, frame.c[keep])
+        mask[pixels] = False
+    return ma.masked_array(data, mask=mask)
+
+
+def _gen_mosaic(frames, labels=None, columns=None, downsample=1):
+    """Draw many frames as a single image
+
+    Unlike _gen_multi_plots, which makes an Axes for each frame, the
+    frames are tiled into one array and drawn once, with one colour
+    scale for all of them.
+
+    Parameters
+    ----------
+    frames : (list (SparseFrame or list-like (x, y, z)))
+            The frames to be drawn
+    labels : (list (string))
+            A label for each frame, drawn at the top left of its tile
+    columns : (int)
+            The number of frames in each row
+    downsample : (int)
+            The factor to shrink each frame by
+
+    Returns
+    -------
+    fig : (Figure)
+        The figure object
+    ax  : (Axes)
+        The axes object
+    image : (AxesImage)
+        The image of the mosaic
+    """
+    from matplotlib import pyplot as plt
+
+    mosaic = _build_mosaic(frames, columns, downsample)
+    _, columns, tile, step = _mosaic_layout(len(frames), columns, downsample)
+    height, width = mosaic.shape
+    # One pixel of the image for each pixel of the mosaic
+    dpi = 100
+    fig = plt.figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+    ax = fig.add_axes([0, 0, 1, 1])
+    ax.set_axis_off()
+    image = ax.imshow(mosaic, cmap='Reds', interpolation='nearest')
+    for k, label in enumerate(labels or []):
+        row, column = divmod(k, columns)
+        ax.text(column * step + 1, row * step + 1, label,
+                fontsize=max(3, tile / 24), va='top', ha='left')
+    return fig, ax, image
+
+
+def _read_and_generate_mosaic(file_names, outliers=None,
+                              outlier_method='std', columns=None,
+                              downsample=1, labels=True, hot_pixels=None):
+    """Read multiple files and draw them as a mosaic
+
+    Parameters
+    ----------
+    file_names : (list (string))
+            The paths of the files to be read
+    outliers   : (float)
+            The value to be used in outlier calculations
+    outlier_method : (string)
+            The criterion outliers are found by, one of
+            rejection.OUTLIER_METHODS
+    columns    : (int)
+            The number of frames in each row
+    downsample : (int)
+            The factor to shrink each frame by
+    labels     : (bool)
+            Whether to label each frame with its file name
+    hot_pixels : (ndarray)
+            A boolean mask of fp.FRAME_SHAPE whose hits are masked
+            before finding outliers, or None
+
+    Returns
+    -------
+    (Figure, Axes, AxesImage)
+    The figure and axes of the mosaic, along with its image
+    """
+    frames = _sparse_frames_from_files(
+        file_names, outliers, outlier_method, hot_pixels)
+    names = [os.path.basename(name) for name in file_names] if labels else None
+    return _gen_mosaic(frames, names, columns, downsample)
+
+
+def _write_mosaic(files, mosaic, output=None):
+    """Write a mosaic of files, by default to the plots folder next to
+    the first file"""
+    _write_heatmap(output or os.path.splitext(_plot_path(files[0]))[0] +
+                   ".mosaic.png", mosaic)
+
+
 def _gen_multi_plots(frames):
     fig, axes = _generate_basic_figure(len(frames))
     heatmaps = []
@@ -166,12 +749,13 @@ def _gen_multi_plots(frames):
             ax = axes[i][j]
             if ax.axison:
                 heatmaps.append(
-                    ax.pcolormesh(frames[c], cmap='Reds'))
+                    ax.pcolormesh(sparse._to_dense(frames[c]), cmap='Reds'))
                 c += 1
     return fig, axes, heatmaps
 
 
-def _generate_with_coordinates(frame, outliers=None):
+def _generate_with_coordinates(frame, outliers=None, outlier_method='std',
+                               hot_pixels=None):
     """Generate a numpy array to be used for coordinate plotting.
 
     Parameters
@@ -182,38 +766,104 @@ def _generate_with_coordinates(frame, outliers=None):
     Default : None
             The value to be used when calculating outliers.
             If the value is None then outliers will not be calculated.
+    outlier_method : (string)
+    Default : 'std'
+            The criterion outliers are found by, one of
+            rejection.OUTLIER_METHODS
+    hot_pixels : (ndarray)
+    Default : None
+            A boolean mask of fp.FRAME_SHAPE whose hits are masked
+            before finding outliers.
 
     Returns
     -------
     arr : (ndarray)
         The generated numpy array
     """
-    arr = np.vstack(frame)
-    xs, ys, zs = arr.transpose()
-    zeros = np.zeros((256, 256))
-    zeros[(xs, ys)] = zs
-    zmask = ma.masked_array(zeros, mask=zeros == 0)
+    return _sparse_frame(
+        frame, outliers, outlier_method, hot_pixels).to_dense()
+
+
+def _sparse_frame(frame, outliers=None, outlier_method='std',
+                  hot_pixels=None):
+    """Build a SparseFrame from the hits of a frame
+
+    Parameters
+    ----------
+    frame : (list-like (x, y, z))
+            The (x, y, z) values of the hits
+    outliers : (number)
+    Default : None
+            The value to be used when calculating outliers.
+            If the value is None then outliers will not be calculated.
+    outlier_method : (string)
+    Default : 'std'
+            The criterion outliers are found by, one of
+            rejection.OUTLIER_METHODS
+    hot_pixels : (ndarray)
+    Default : None
+            A boolean mask of fp.FRAME_SHAPE whose hits are masked
+            before finding outliers, so that they do not count towards
+            the statistics of the frame.
+
+    Returns
+    -------
+    frame : (SparseFrame)
+        The hits, with any outliers and hot pixels masked
+    """
+    hits = sparse.SparseFrame.from_hits(frame)
+    if hot_pixels is not None:
+        hits = hits.masked(hot_pixels[hits.x, hits.y])
 
-    # Use Chauvenet's criterion to find the outliers
     if outliers is not None:
-        d_max = np.abs(zmask - zmask.mean()) / zmask.std()
-        return ma.masked_array(zmask, mask=d_max >= outliers)
-    return zmask
+        return rejection._mask_outliers(hits, outliers, outlier_method)
+    return hits
+
 
+def _gen_multi_from_files(file_names, outliers=None, outlier_method='std',
+                          hot_pixels=None):
+    """Read multiple files into a stack of frame arrays
 
-def _gen_multi_from_files(file_names, outliers=None):
-    data = []
+    The outliers of all of the frames are found in a single pass.
 
-    for file_name in file_names:
-        with open(file_name) as f:
-            loaded_data = json.load(f, parse_float=lambda x: int(float(x)))
-            data.append(
-                _generate_with_coordinates(
-                    loaded_data, outliers=outliers))
-    return np.array(data)
+    Parameters
+    ----------
+    file_names : (list (string))
+            The paths of the files to be read
+    outliers   : (float)
+            The value to be used in outlier calculations
+    outlier_method : (string)
+            The criterion outliers are found by, one of
+            rejection.OUTLIER_METHODS
+    hot_pixels : (ndarray)
+            A boolean mask of fp.FRAME_SHAPE whose hits are masked
+            before finding outliers, or None
+
+    Returns
+    -------
+    frames : (MaskedArray)
+        The (frames, 256, 256) stack, masked where each frame was not
+        hit or has an outlier
+    """
+    frames = _sparse_frames_from_files(
+        file_names, outliers, outlier_method, hot_pixels)
+    return ma.stack([frame.to_dense() for frame in frames])
+
+
+def _sparse_frames_from_files(file_names, outliers=None,
+                              outlier_method='std', hot_pixels=None):
+    """Read multiple files as SparseFrames, masking their outliers and
+    any hot pixels"""
+    frames = [_load_sparse_frame(file_name, hot_pixels=hot_pixels)
+              for file_name in file_names]
+    if outliers is not None:
+        frames = rejection._mask_sparse_outliers(
+            frames, outliers, outlier_method)
+    return frames
 
 
-def _read_and_generate_heatmaps(file_names, outliers=None):
+def _read_and_generate_heatmaps(file_names, outliers=None,
+                                outlier_method='std', hot_pixels=None):
     """Read multiple files and generate subplots
 
     Parameters
@@ -222,6 +872,12 @@ def _read_and_generate_heatmaps(file_names, outliers=None):
             The paths of the files to be read
     outliers   : (float)
             The value to be used in outlier calculations
+    outlier_method : (string)
+            The criterion outliers are found by, one of
+            rejection.OUTLIER_METHODS
+    hot_pixels : (ndarray)
+            A boolean mask of fp.FRAME_SHAPE whose hits are masked
+            before finding outliers, or None
 
     Returns
     -------
@@ -229,5 +885,6 @@ def _read_and_generate_heatmaps(file_names, outliers=None):
     The figure and associated subplot axes, along with
     the list of heatmaps generated.
     """
-    frames = _gen_multi_from_files(file_names, outliers=outliers)
+    frames = _sparse_frames_from_files(
+        file_names, outliers, outlier_method, hot_pixels)
     return _gen_multi_plots(frames)
@@ -5,13 +5,124 @@
 import argparse
 import os
 import sys
+import time
 
-from matplotlib import pyplot as plt
+import analysis
 
-from analysis import frame_parser as fp
-from analysis import plotter
+# The frame_parser output formats, kept here so that building the
+# argument parser does not need to import frame_parser (and NumPy)
+OUTPUT_FORMATS = ['archive', 'bin', 'json', 'npz']
 
-import analysis
+# Must match catalog.DEFAULT_CATALOG
+DEFAULT_CATALOG = "rayleigh.db"
+
+# Must match rejection.OUTLIER_METHODS
+OUTLIER_METHODS = ['std', 'mad']
+
+# Must match animation.ANIMATION_WRITERS
+ANIMATION_FORMATS = ['gif', 'png', 'raw']
+
+# Must match hotpixels.OCCUPANCY_NAME
+OCCUPANCY_NAME = "occupancy.npz"
+
+# Must match stack.STACK_IMAGES
+STACK_IMAGES = ['sum', 'mean', 'max', 'hits']
+
+# The 'query' criteria, given to catalog._query_catalog
+QUERY_CRITERIA = [
+    ('acquisition_mode', int, "Acquisition mode of the frames"),
+    ('bias_voltage', float, "Bias voltage of the frames (V)"),
+    ('min_bias_voltage', float, "Minimum bias voltage (V)"),
+    ('max_bias_voltage', float, "Maximum bias voltage (V)"),
+    ('min_acquisition_time', float, "Minimum acquisition time (s)"),
+    ('max_acquisition_time', float, "Maximum acquisition time (s)"),
+    ('chipboard_id', str, "Chipboard ID of the frames"),
+    ('min_start_time', float,
+     "Earliest acquisition start time (seconds since the epoch)"),
+    ('max_start_time', float,
+     "Latest acquisition start time (seconds since the epoch)")]
+
+
+def _import_pyplot(headless=False):
+    """Import matplotlib.pyplot, using the Agg backend if headless
+
+    The plotting modules are only imported when a plot command is run,
+    so that the other commands do not pay for loading matplotlib.
+    """
+    import matplotlib
+    if headless:
+        matplotlib.use('Agg')
+    from matplotlib import pyplot as plt
+    return plt
+
+
+def _read_hot_pixels(path, threshold=None):
+    """Read the hot pixel mask of an occupancy file, exiting if it cannot
+    be read
+
+    A directory is taken to be a converted directory, whose occupancy
+    file is in its output directory.
+    """
+    from analysis import hotpixels
+    if os.path.isdir(path):
+        path = os.path.join(path, "output", OCCUPANCY_NAME)
+    try:
+        return hotpixels._read_hot_pixels(path, threshold)
+    except (OSError, ValueError) as err:
+        print("Failed to read hot pixels: {}".format(err))
+        sys.exit(1)
+
+
+def _frame_range(text):
+    """Parse a range of frame numbers, as in '100:200' or '150'
+
+    The range starts at the first number and stops before the second,
+    either of which can be left out to start at 0 or not stop.
+    """
+    try:
+        if ':' not in text:
+            return range(int(text), int(text) + 1)
+        start, stop = text.split(':')
+        return range(int(start or 0), int(stop) if stop else sys.maxsize)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            "invalid frame range: '{}'".format(text))
+
+
+def _positive_int(text):
+    """Parse a whole number of at least 1, as for --downsample"""
+    try:
+        value = int(text)
+    except ValueError:
+        value = 0
+    if value < 1:
+        raise argparse.ArgumentTypeError(
+            "invalid positive integer: '{}'".format(text))
+    return value
+
+
+def _positive_float(text):
+    """Parse a number greater than 0, as for --fps"""
+    try:
+        value = float(text)
+    except ValueError:
+        value = 0.0
+    if not 0 < value < float('inf'):
+        raise argparse.ArgumentTypeError(
+            "invalid positive number: '{}'".format(text))
+    return value
+
+
+def _non_negative_int(text):
+    """Parse a whole number of at least 0, as for --jobs"""
+    try:
+        value = int(text)
+    except ValueError:
+        value = -1
+    if value < 0:
+        raise argparse.ArgumentTypeError(
+            "invalid non-negative integer: '{}'".format(text))
+    return value
 
 
 class RayleighApp():
@@ -32,6 +143,7 @@ class RayleighApp():
             title="commands")
 
         def run_parser_frame(args):
+            from analysis import frame_parser as fp
             fname = args.file
             outname = args.output_file
             out_file = os.path.realpath(outname) if outname else None
@@ -39,7 +151,28 @@ class RayleighApp():
             if not os.path.exists(file_name):
                 print("No such file or directory: {}".format(fname))
                 sys.exit(1)
-            fp._detect_input_and_write(file_name, out_file)
+            if args.watch:
+                if not os.path.isdir(file_name):
+                    print("Can only watch a directory: {}".format(fname))
+                    sys.exit(1)
+                try:
+                    fp._watch_directory(
+                        file_name, output_format=args.output_format,
+                        interval=args.interval,
+                        frame_files=args.frame_files,
+                        occupancy=args.occupancy)
+                except ValueError as err:
+                    print(err)
+                    sys.exit(1)
+                return
+            failures = fp._detect_input_and_write(
+                file_name, out_file, jobs=args.jobs,
+                incremental=args.incremental, force=args.force,
+                output_format=args.output_format,
+                frame_files=args.frame_files, occupancy=args.occupancy)
+            if failures:
+                print("Failed to convert {} file(s)".format(len(failures)))
+                sys.exit(1)
 
         self._parser_frame = subparsers.add_parser(
             'frame',
@@ -56,7 +189,58 @@ class RayleighApp():
             help="File to write output to",
             default=None, metavar="FILE")
 
+        self._parser_frame.add_argument(
+            "-f", "--format", dest="output_format",
+            help=("Format to write the frames in: JSON, NumPy .npz or raw "
+                  "binary columns (default: json)"),
+            default='json', choices=OUTPUT_FORMATS)
+
+        self._parser_frame.add_argument(
+            "-j", "--jobs",
+            help=("Number of worker processes to convert a directory with "
+                  "(0 uses one per CPU)"),
+            default=1, type=_non_negative_int, metavar="N")
+
+        self._parser_frame.add_argument(
+            "-i", "--incremental",
+            help=("Only convert the files in a directory that are new or "
+                  "have changed since the last incremental conversion"),
+            default=False, action='store_true')
+
+        self._parser_frame.add_argument(
+            "--force",
+            help=("With --incremental, convert every file even if it "
+                  "has not changed"),
+            default=False, action='store_true')
+
+        self._parser_frame.add_argument(
+            "--watch",
+            help=("Keep converting the new frames written to a directory "
+                  "until interrupted"),
+            default=False, action='store_true')
+
+        self._parser_frame.add_argument(
+            "--interval",
+            help="Seconds between checks for new frames with --watch",
+            default=1.0, type=float, metavar="SECONDS")
+
+        self._parser_frame.add_argument(
+            "--no-frame-files",
+            help=("Only write the 'frames' file of a directory, not a "
+                  "file for each frame"),
+            default=True, action='store_false', dest='frame_files')
+
+        self._parser_frame.add_argument(
+            "--occupancy",
+            help=("Count the frames in which each pixel of a directory is "
+                  "hit, and the hot pixels hit in most of them, in "
+                  "output/{}. With --incremental or --watch only the new "
+                  "frames are counted".format(OCCUPANCY_NAME)),
+            default=False, action='store_true')
+
         def run_parser_plot(args):
+            from analysis import loader
+            from analysis import plotter
             files = args.files
 
             def check_file(fname):
@@ -64,27 +248,91 @@ class RayleighApp():
                 if not os.path.exists(full):
                     print("No such file or directory {}".format(fname))
                     sys.exit(1)
-                if os.path.isdir(full):
-                    print("{} is a directory")
-                    sys.exit(1)
                 return full
-            file_names = list(map(check_file, files))
+            try:
+                file_names = loader._frame_refs(
+                    list(map(check_file, files)), numbers=args.frames)
+            except (OSError, ValueError) as err:
+                print("Failed to read frames: {}".format(err))
+                sys.exit(1)
+            if not file_names:
+                print("No frames to plot")
+                sys.exit(1)
+            hot_pixels = None
+            if args.hot_pixels:
+                hot_pixels = _read_hot_pixels(
+                    args.hot_pixels, args.hot_pixel_threshold)
+
+            if args.thumbnails:
+                # Thumbnails are drawn without matplotlib
+                failures = plotter._write_thumbnails_from_files(
+                    file_names, outliers=args.outliers,
+                    outlier_method=args.outlier_method,
+                    hot_pixels=hot_pixels)
+                if failures:
+                    print("Failed to plot {} file(s)".format(len(failures)))
+                    sys.exit(1)
+                return
+
+            if args.animate:
+                # Animations are encoded without matplotlib
+                from analysis import animation
+                _, failures = animation._write_animation(
+                    file_names, os.path.realpath(args.animate),
+                    args.animation_format, fps=args.fps,
+                    outliers=args.outliers,
+                    outlier_method=args.outlier_method,
+                    hot_pixels=hot_pixels)
+                if failures:
+                    print("Failed to read {} file(s)".format(len(failures)))
+                    sys.exit(1)
+                return
+
+            plt = _import_pyplot(headless=args.no_view)
+            if len(file_names) > 1 and args.mosaic:
+                mosaic = plotter._read_and_generate_mosaic(
+                    file_names, outliers=args.outliers,
+                    outlier_method=args.outlier_method,
+                    columns=args.columns, downsample=args.downsample,
+                    labels=args.labels, hot_pixels=hot_pixels)
 
-            if len(file_names) > 1:
+                if args.write:
+                    plotter._write_mosaic(file_names, mosaic)
+            elif len(file_names) > 1:
                 if args.single_figure:
                     plotter._read_and_generate_heatmaps(
-                        file_names, outliers=args.outliers)
+                        file_names, outliers=args.outliers,
+                        outlier_method=args.outlier_method,
+                        hot_pixels=hot_pixels)
 
-                if args.write:
-                    plotter._write_multi(file_names)
+                # Only the batch mode of --no-view writes each heatmap
+                if args.write and (args.single_figure or not args.no_view):
+                    plotter._write_multi(
+                        file_names, outliers=args.outliers,
+                        outlier_method=args.outlier_method,
+                        hot_pixels=hot_pixels)
+                elif args.write:
+                    failures = plotter._write_heatmaps_from_files(
+                        file_names, outliers=args.outliers,
+                        outlier_method=args.outlier_method, jobs=args.jobs,
+                        hot_pixels=hot_pixels)
+                    if failures:
+                        print("Failed to plot {} file(s)".format(
+                            len(failures)))
+                        sys.exit(1)
             else:
                 file_name = file_names[0]
                 # Assume heatmap for the moment
                 figmap = plotter._gen_heatmap_from_file(
-                    file_name, outliers=args.outliers)
+                    file_name, outliers=args.outliers,
+                    outlier_method=args.outlier_method,
+                    hot_pixels=hot_pixels)
 
                 if args.write:
-                    plotter._write_heatmap_from_file(file_name)
+                    plotter._write_heatmap_from_file(
+                        file_name, outliers=args.outliers,
+                        outlier_method=args.outlier_method,
+                        hot_pixels=hot_pixels)
 
             if not args.no_view:
                 plt.show()
@@ -109,29 +357,283 @@ class RayleighApp():
 
         self._parser_plot.add_argument(
             'files',
-            help="Files to be read",
+            help=("Frame files, directories of unconverted frame files, "
+                  "frame archives or 'frames' files to be read"),
             default=None,
             nargs='*')
 
+        self._parser_plot.add_argument(
+            '--frames',
+            help=("Only plot the frames of directories and 'frames' files "
+                  "numbered from START up to, but not including, STOP"),
+            default=None, type=_frame_range, metavar='START:STOP')
+
         self._parser_plot.add_argument(
             '--outliers',
             help="Provide the value to be used when finding outliers",
             default=None, type=float, metavar='FLOAT')
 
+        self._parser_plot.add_argument(
+            '--outlier-method',
+            help=("Find outliers by their distance from the mean in "
+                  "standard deviations (std), or from the median in "
+                  "median absolute deviations (mad) (default: std)"),
+            default='std', choices=OUTLIER_METHODS, dest='outlier_method')
+
+        self._parser_plot.add_argument(
+            '--hot-pixels',
+            help=("Mask the hot pixels of an occupancy file written by "
+                  "'frame --occupancy', or of the converted directory it "
+                  "was written for, before finding outliers"),
+            default=None, metavar='PATH', dest='hot_pixels')
+
+        self._parser_plot.add_argument(
+            '--hot-pixel-threshold',
+            help=("With --hot-pixels, the fraction of frames a pixel must "
+                  "be hit in to be hot (default: the threshold the file "
+                  "was written with)"),
+            default=None, type=float, metavar='FRACTION',
+            dest='hot_pixel_threshold')
+
         self._parser_plot.add_argument(
             '--single-figure',
             help="Plot all the frames on a single figure",
             default=False, action='store_true')
 
+        self._parser_plot.add_argument(
+            "-j", "--jobs",
+            help=("Number of worker processes to write the heatmaps of "
+                  "several files with --no-view (0 uses one per CPU)"),
+            default=1, type=_non_negative_int, metavar="N")
+
+        self._parser_plot.add_argument(
+            '--mosaic',
+            help=("Plot all the frames as tiles of a single image, which "
+                  "is much faster than --single-figure for many frames"),
+            default=False, action='store_true')
+
+        self._parser_plot.add_argument(
+            '--columns',
+            help="Number of frames in each row of a mosaic",
+            default=None, type=_positive_int, metavar='N')
+
+        self._parser_plot.add_argument(
+            '--downsample',
+            help="Shrink each frame of a mosaic by a factor of N",
+            default=1, type=_positive_int, metavar='N')
+
+        self._parser_plot.add_argument(
+            '--no-labels',
+            help="Do not label the frames of a mosaic with their file names",
+            default=True, action='store_false', dest='labels')
+
+        self._parser_plot.add_argument(
+            '--animate',
+            help=("Write the frames, in the order given, as an animation "
+                  "with one colour scale for every frame"),
+            default=None, metavar='FILE')
+
+        self._parser_plot.add_argument(
+            '--animation-format',
+            help=("Format of the --animate output: a GIF, a directory of "
+                  "numbered PNG images, or raw 8 bit RGB frames for "
+                  "external encoders (default: gif)"),
+            default='gif', choices=ANIMATION_FORMATS,
+            dest='animation_format')
+
+        self._parser_plot.add_argument(
+            '--fps',
+            help="Frames per second of an animated GIF (default: 10)",
+            default=10.0, type=_positive_float)
+
+        self._parser_plot.add_argument(
+            '--thumbnails',
+            help=("Write a quick PNG thumbnail of each frame to a "
+                  "thumbnails folder, without drawing any graphs"),
+            default=False, action='store_true')
+
+        def run_parser_index(args):
+            from analysis import catalog
+            directory = os.path.realpath(args.directory)
+            if not os.path.isdir(directory):
+                print("No such directory: {}".format(args.directory))
+                sys.exit(1)
+            counts = catalog._index_directory(
+                directory, args.catalog, jobs=args.jobs)
+            print("Indexed {}: {added} added, {updated} updated, "
+                  "{removed} removed, {unchanged} unchanged, "
+                  "{failed} failed".format(args.directory, **counts))
+
+        self._parser_index = subparsers.add_parser(
+            'index',
+            help="Build or update a catalog of the .dsc files in a directory")
+        self._parser_index.set_defaults(func=run_parser_index)
+
+        self._parser_index.add_argument(
+            "directory",
+            help="Directory to search for .dsc files, including "
+                 "subdirectories")
+
+        self._parser_index.add_argument(
+            "-c", "--catalog",
+            help="The catalog to update (default: {})".format(
+                DEFAULT_CATALOG),
+            default=DEFAULT_CATALOG, metavar="FILE")
+
+        self._parser_index.add_argument(
+            "-j", "--jobs",
+            help=("Number of worker processes to parse the files with "
+                  "(0 uses one per CPU)"),
+            default=1, type=_non_negative_int, metavar="N")
+
+        def run_parser_query(args):
+            from analysis import catalog
+            criteria = {name: getattr(args, name)
+                        for name, _, _ in QUERY_CRITERIA}
+            try:
+                paths = catalog._query_catalog(args.catalog, **criteria)
+            except FileNotFoundError as err:
+                print(err)
+                sys.exit(1)
+            for path in paths:
+                print(path)
+
+        self._parser_query = subparsers.add_parser(
+            'query',
+            help="List the frames in a catalog that match the criteria")
+        self._parser_query.set_defaults(func=run_parser_query)
+
+        self._parser_query.add_argument(
+            "-c", "--catalog",
+            help="The catalog to query (default: {})".format(
+                DEFAULT_CATALOG),
+            default=DEFAULT_CATALOG, metavar="FILE")
+
+        for name, value_type, help_text in QUERY_CRITERIA:
+            self._parser_query.add_argument(
+                "--" + name.replace("_", "-"), dest=name,
+                help=help_text, default=None, type=value_type)
+
+        def run_parser_stack(args):
+            paths = []
+            for path in args.paths:
+                full = os.path.realpath(path)
+                if not os.path.exists(full):
+                    print("No such file or directory {}".format(path))
+                    sys.exit(1)
+                paths.append(full)
+            hot_pixels = None
+            if args.hot_pixels:
+                hot_pixels = _read_hot_pixels(args.hot_pixels)
+            _import_pyplot(headless=True)
+            from analysis import stack
+            output = os.path.realpath(args.output_file)
+            heatmap_path = os.path.splitext(output)[0] + ".png"
+            try:
+                frames = stack._stack_frames(
+                    stack._iter_input_frames(paths, hot_pixels=hot_pixels))
+            except (OSError, ValueError) as err:
+                print("Failed to stack frames: {}".format(err))
+                sys.exit(1)
+            stack._write_stack(frames, output)
+            stack._write_stack_heatmap(frames, heatmap_path, args.image)
+            print("Stacked {} frame(s) into {} and {}".format(
+                frames.frames, output, heatmap_path))
+
+        self._parser_stack = subparsers.add_parser(
+            'stack',
+            help="Integrate frames into sum, mean, max and hit count images")
+        self._parser_stack.set_defaults(func=run_parser_stack)
+
+        self._parser_stack.add_argument(
+            "paths",
+            help=("Directories of frame files, frame archives, 'frames' "
+                  "files or converted frame files to stack"),
+            nargs='+')
+
+        self._parser_stack.add_argument(
+            "-o", "--output-file", dest="output_file",
+            help=("The .npz file to write the images to, the heatmap is "
+                  "written next to it as a .png (default: stack.npz)"),
+            default="stack.npz", metavar="FILE")
+
+        self._parser_stack.add_argument(
+            "--image",
+            help="The image to draw as a heatmap (default: sum)",
+            default='sum', choices=STACK_IMAGES)
+
+        self._parser_stack.add_argument(
+            '--hot-pixels',
+            help=("Leave out the hits on the hot pixels of an occupancy "
+                  "file written by 'frame --occupancy', or of the "
+                  "converted directory it was written for"),
+            default=None, metavar='PATH', dest='hot_pixels')
+
+        def run_parser_clusters(args):
+            from analysis import clusters
+            paths = []
+            for path in args.paths:
+                full = os.path.realpath(path)
+                if not os.path.exists(full):
+                    print("No such file or directory {}".format(path))
+                    sys.exit(1)
+                paths.append(full)
+            output = os.path.realpath(args.output_file)
+            start = time.perf_counter()
+            try:
+                num_frames, num_clusters = clusters._write_run_clusters(
+                    paths, output, numbers=args.frames,
+                    features=args.features)
+            except (OSError, ValueError) as err:
+                print("Failed to find clusters: {}".format(err))
+                sys.exit(1)
+            elapsed = time.perf_counter() - start
+            print("Found {} cluster(s) in {} frame(s) in {:.1f}s "
+                  "({:.0f} frames per second), wrote {}".format(
+                      num_clusters, num_frames, elapsed,
+                      num_frames / elapsed if elapsed else 0, output))
+
+        self._parser_clusters = subparsers.add_parser(
+            'clusters',
+            help="Find the clusters of adjacent hits in frames")
+        self._parser_clusters.set_defaults(func=run_parser_clusters)
+
+        self._parser_clusters.add_argument(
+            "paths",
+            help=("Directories of frame files, frame archives, 'frames' "
+                  "files or converted frame files to search"),
+            nargs='+')
+
+        self._parser_clusters.add_argument(
+            "-o", "--output-file", dest="output_file",
+            help=("The file to write the size, charge, centroid and "
+                  "bounding box of each cluster to, as NumPy arrays if "
+                  "its name ends in .npz and as CSV otherwise (default: "
+                  "clusters.csv)"),
+            default="clusters.csv", metavar="FILE")
+
+        self._parser_clusters.add_argument(
+            '--features',
+            help=("Also write the length, width, linearity, density and "
+                  "mean charge of each cluster, and classify it as a dot, "
+                  "small blob, heavy track, straight track or curly track"),
+            default=False, action='store_true')
+
+        self._parser_clusters.add_argument(
+            '--frames',
+            help=("Only search the frames of directories and 'frames' "
+                  "files numbered from START up to, but not including, "
+                  "STOP"),
+            default=None, type=_frame_range, metavar='START:STOP')
+
     def _run(self, args):
         args_ = self._parser.parse_args(args)
-        try:
-            args_.func(args_)
-        except AttributeError:
+        if not hasattr(args_, 'func'):
             print(
                 "No command specified, "
                 + "use 'rayleigh --help' to see a complete list")
             sys.exit(1)
+        args_.func(args_)
 
 
 def main():
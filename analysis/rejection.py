@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# rejection.py
+
+import numpy as np
+import numpy.ma as ma
+
+# The criteria a hit can be rejected by: its distance from the mean
+# count of its frame in standard deviations ('std', Chauvenet's
+# criterion), or its distance from the median count in scaled median
+# absolute deviations ('mad'), which a few large outliers do not skew.
+OUTLIER_METHODS = ['std', 'mad']
+
+# Scales the median absolute deviation of normally distributed values
+# to their standard deviation
+MAD_SCALE = 1.4826
+
+
+def _grouped_median(values, groups, num_groups):
+    """Get the median of the values in each group
+
+    Groups without any values have a median of NaN.
+    """
+    order = np.lexsort((values, groups))
+    ordered = values[order]
+    counts = np.bincount(groups, minlength=num_groups)
+    starts = np.cumsum(counts) - counts
+    medians = np.full(num_groups, np.nan)
+    some = counts > 0
+    low = (starts + (counts - 1) // 2)[some]
+    high = (starts + counts // 2)[some]
+    medians[some] = (ordered[low] + ordered[high]) / 2
+    return medians
+
+
+def _reject(values, groups, num_groups, outliers, method='std'):
+    """Find the outlying values of each group in one pass
+
+    Parameters
+    ----------
+    values : (ndarray)
+            The values of every group
+    groups : (ndarray)
+            The group of each value, from 0 to num_groups - 1
+    num_groups : (int)
+            The number of groups
+    outliers : (number)
+            The distance from the centre of its group, in units of the
+            spread of the group, at which a value is an outlier
+    method : (string)
+            One of OUTLIER_METHODS
+
+    Returns
+    -------
+    rejected : (ndarray)
+        Whether each value is an outlier. Groups whose values are all
+        the same have no outliers.
+    """
+    values = np.asarray(values, dtype=float)
+    counts = np.bincount(groups, minlength=num_groups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if method == 'std':
+            centre = np.bincount(
+                groups, weights=values, minlength=num_groups) / counts
+            deviation = np.abs(values - centre[groups])
+            spread = np.sqrt(np.bincount(
+                groups, weights=deviation ** 2,
+                minlength=num_groups) / counts)
+        elif method == 'mad':
+            centre = _grouped_median(values, groups, num_groups)
+            deviation = np.abs(values - centre[groups])
+            spread = MAD_SCALE * _grouped_median(
+                deviation, groups, num_groups)
+        else:
+            raise ValueError("Unknown outlier method: {}".format(method))
+        spread[spread == 0] = np.nan
+        # Comparisons with NaN are False, so flat groups keep every value
+        return deviation / spread[groups] >= outliers
+
+
+def _mask_stack_outliers(frames, outliers, method='std'):
+    """Mask the outliers of each frame of a stack of dense frames
+
+    Parameters
+    ----------
+    frames : (MaskedArray)
+            The (frames, rows, cols) stack. Masked pixels are not counted
+            in the statistics of their frame and stay masked.
+    outliers : (number)
+            The distance at which a pixel is an outlier
+    method : (string)
+            One of OUTLIER_METHODS
+
+    Returns
+    -------
+    frames : (MaskedArray)
+        The stack with the outlying pixels of each frame masked as well
+    """
+    frames = ma.asarray(frames)
+    mask = ma.getmaskarray(frames)
+    kept = ~mask
+    groups = np.nonzero(kept)[0]
+    rejected = mask.copy()
+    rejected[kept] = _reject(
+        frames.data[kept], groups, len(frames), outliers, method)
+    return ma.masked_array(frames.data, mask=rejected)
+
+
+def _mask_sparse_outliers(frames, outliers, method='std'):
+    """Mask the outlying hits of each of a batch of sparse frames
+
+    Parameters
+    ----------
+    frames : (list (SparseFrame))
+            The frames to be filtered. Masked hits are not counted in the
+            statistics of their frame and stay masked.
+    outliers : (number)
+            The distance at which a hit is an outlier
+    method : (string)
+            One of OUTLIER_METHODS
+
+    Returns
+    -------
+    frames : (list (SparseFrame))
+        Copies of the frames with their outlying hits masked
+    """
+    if not frames:
+        return []
+    lengths = [len(frame) for frame in frames]
+    counts = np.concatenate([frame.c for frame in frames])
+    mask = np.concatenate([frame.mask for frame in frames])
+    groups = np.repeat(np.arange(len(frames)), lengths)
+    kept = ~mask
+    rejected = np.zeros(len(counts), dtype=bool)
+    rejected[kept] = _reject(
+        counts[kept], groups[kept], len(frames), outliers, method)
+    splits = np.cumsum(lengths)[:-1]
+    return [frame.masked(frame_rejected) for frame, frame_rejected
+            in zip(frames, np.split(rejected, splits))]
+
+
+def _mask_outliers(frame, outliers, method='std'):
+    """Mask the outlying hits of a single SparseFrame"""
+    return _mask_sparse_outliers([frame], outliers, method)[0]
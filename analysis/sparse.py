@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# sparse.py
+
+import numpy as np
+import numpy.ma as ma
+
+from analysis import frame_parser as fp
+
+
+class SparseFrame:
+    """The hits of a frame as coordinate and value arrays
+
+    Frames usually hit a few hundred of their 65536 pixels, so only the
+    hits are kept. Like the masked arrays the plotter draws, a hit can
+    be masked, which leaves its pixel blank. Hits with a count of 0 are
+    always masked.
+
+    Parameters
+    ----------
+    x, y : (ndarray)
+            The coordinates of each hit
+    c : (ndarray)
+            The count of each hit
+    mask : (ndarray), optional
+            Which of the hits are masked, in addition to those with a
+            count of 0.
+    """
+    __slots__ = ('x', 'y', 'c', 'mask')
+
+    def __init__(self, x, y, c, mask=None):
+        self.x = np.asarray(x, dtype=np.intp)
+        self.y = np.asarray(y, dtype=np.intp)
+        self.c = np.asarray(c)
+        self.mask = self.c == 0
+        if mask is not None:
+            self.mask |= np.asarray(mask, dtype=bool)
+
+    @classmethod
+    def from_hits(cls, frame):
+        """Build a SparseFrame from a list-like of [x, y, c] hits"""
+        xs, ys, cs = np.asarray(frame).reshape(-1, 3).transpose()
+        return cls(xs, ys, cs)
+
+    def __len__(self):
+        return len(self.c)
+
+    @property
+    def values(self):
+        """The counts of the hits as a masked array"""
+        return ma.masked_array(self.c, mask=self.mask)
+
+    @property
+    def nbytes(self):
+        """The memory used by the hits"""
+        return sum(a.nbytes for a in (self.x, self.y, self.c, self.mask))
+
+    def masked(self, mask):
+        """Get a copy of the frame with mask added to the hit mask"""
+        return SparseFrame(self.x, self.y, self.c, self.mask | mask)
+
+    def to_dense(self):
+        """Scatter the hits into a frame sized masked array
+
+        Returns
+        -------
+        arr : (MaskedArray)
+            The float array of counts, masked where there is no hit or
+            the hit is masked
+        """
+        data = np.zeros(fp.FRAME_SHAPE)
+        data[self.x, self.y] = self.c
+        mask = np.ones(fp.FRAME_SHAPE, dtype=bool)
+        keep = ~self.mask
+        mask[self.x[keep], self.y[keep]] = False
+        return ma.masked_array(data, mask=mask)
+
+
+def _to_dense(frame):
+    """Get the dense array of a SparseFrame, other arrays are unchanged"""
+    if isinstance(frame, SparseFrame):
+        return frame.to_dense()
+    return frame
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# stack.py
+
+import os
+
+import numpy as np
+import numpy.ma as ma
+
+from analysis import frame_parser as fp
+from analysis import sparse
+
+# The images kept by a FrameStack
+STACK_IMAGES = ['sum', 'mean', 'max', 'hits']
+
+
+class FrameStack:
+    """The integrated images of a run of frames
+
+    Frames are added one at a time and only the (256, 256) images are
+    kept, so stacking uses the same memory however many frames there
+    are.
+
+    Attributes
+    ----------
+    frames : (int)
+            The number of frames added
+    sum : (ndarray)
+            The total count of each pixel
+    max : (ndarray)
+            The largest count of each pixel in any one frame
+    hits : (ndarray)
+            The number of frames in which each pixel was hit
+    """
+
+    def __init__(self):
+        self.frames = 0
+        self.sum = np.zeros(fp.FRAME_SHAPE, dtype=np.int64)
+        self.max = np.zeros(fp.FRAME_SHAPE, dtype=np.int64)
+        self.hits = np.zeros(fp.FRAME_SHAPE, dtype=np.int64)
+
+    @property
+    def mean(self):
+        """The mean count of each pixel per frame"""
+        if not self.frames:
+            return np.zeros(fp.FRAME_SHAPE)
+        return self.sum / self.frames
+
+    def add(self, frame):
+        """Add the hits of a frame
+
+        Parameters
+        ----------
+        frame : (SparseFrame or list-like (x, y, c))
+                The hits of the frame. The masked hits of a SparseFrame
+                are left out.
+
+        Raises
+        ------
+        ValueError
+                If a hit is outside the pixels of a frame
+        """
+        if isinstance(frame, sparse.SparseFrame):
+            keep = ~frame.mask
+            xs, ys, cs = (a[keep].astype(np.int64)
+                          for a in (frame.x, frame.y, frame.c))
+        else:
+            xs, ys, cs = np.asarray(frame).reshape(-1, 3).astype(
+                np.int64).transpose()
+        if xs.size and (min(xs.min(), ys.min()) < 0
+                        or xs.max() >= fp.FRAME_SHAPE[0]
+                        or ys.max() >= fp.FRAME_SHAPE[1]):
+            raise ValueError("Frame hits are outside the {} by {} "
+                             "pixels".format(*fp.FRAME_SHAPE))
+        pixels = (xs, ys)
+        np.add.at(self.sum, pixels, cs)
+        np.maximum.at(self.max, pixels, cs)
+        hit = np.zeros(fp.FRAME_SHAPE, dtype=bool)
+        hit[pixels] = True
+        self.hits += hit
+        self.frames += 1
+
+    def image(self, name):
+        """Get one of the STACK_IMAGES by name"""
+        if name not in STACK_IMAGES:
+            raise ValueError("Unknown stack image: {}".format(name))
+        return getattr(self, name)
+
+
+def _stack_frames(frames):
+    """Stack frames into a FrameStack
+
+    Parameters
+    ----------
+    frames : (iterable (SparseFrame or list-like (x, y, c)))
+            The hits of each frame, which are read one at a time
+
+    Returns
+    -------
+    stack : (FrameStack)
+            The integrated images of the frames
+    """
+    stack = FrameStack()
+    for frame in frames:
+        stack.add(frame)
+    return stack
+
+
+def _iter_input_frames(paths, extension=".txt", hot_pixels=None):
+    """Iterate over the frames of files and directories
+
+    Directories are read as frame files with the extension, in frame
+    number order. Frame archives and the 'frames' files written by the
+    frame parser give each of their frames, any other file is read as
+    a single converted frame.
+
+    Parameters
+    ----------
+    paths : (list (string))
+            The files and directories to read
+    extension : (string), optional
+            The extension of the frame files in directories
+    hot_pixels : (ndarray), optional
+            A boolean mask of fp.FRAME_SHAPE whose hits are dropped from
+            every frame, such as from hotpixels._read_hot_pixels
+
+    Returns
+    -------
+    frames : (iterator (ndarray))
+            The hits of each frame
+    """
+    from analysis import plotter
+    for path in paths:
+        if os.path.isdir(path):
+            for file_name in fp._sorted_frame_files(path, extension):
+                frame = fp._get_frame_array_from_file(file_name)
+                if hot_pixels is not None:
+                    frame = fp._drop_hot_pixels(frame, hot_pixels)
+                yield frame
+            continue
+        if fp._is_frames_file(path):
+            yield from fp._iter_frames_file(path, hot_pixels)
+        else:
+            frame = plotter._load_frame_file(path)
+            if hot_pixels is not None:
+                frame = fp._drop_hot_pixels(np.asarray(frame), hot_pixels)
+            yield frame
+
+
+def _write_stack(stack, file_name):
+    """Write the images of a stack to an .npz file
+
+    The file holds an array for each of STACK_IMAGES along with the
+    number of 'frames' stacked.
+    """
+    images = {name: stack.image(name) for name in STACK_IMAGES}
+    # Written to an open file, as np.savez adds .npz to other names
+    with open(file_name, 'wb') as file:
+        np.savez(file, frames=stack.frames, **images)
+
+
+def _write_stack_heatmap(stack, output_path, image='sum'):
+    """Write a heatmap of one of the images of a stack
+
+    Pixels that were never hit are left blank.
+    """
+    from matplotlib import pyplot as plt
+    from analysis import plotter
+    data = ma.masked_array(stack.image(image), mask=stack.hits == 0)
+    heatmap = plotter._gen_heatmap(data)
+    plotter._write_heatmap(output_path, heatmap)
+    plt.close(heatmap[0])
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# bench_animation.py
+
+"""Measure the time to encode frame files as an animation in each of
+the animation formats, including both passes over the files.
+
+Run from the repository root with `python3 -m benchmarks.bench_animation`.
+"""
+
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from analysis import animation
+
+
+def main():
+    rng = np.random.RandomState(0)
+    directory = tempfile.mkdtemp()
+    num_frames = 100
+    file_names = []
+    for k in range(num_frames):
+        file_name = os.path.join(directory, "data{}.npz".format(k))
+        np.savez(file_name, x=rng.randint(0, 256, 300).astype('u1'),
+                 y=rng.randint(0, 256, 300).astype('u1'),
+                 c=rng.randint(1, 11810, 300).astype('<u2'))
+        file_names.append(file_name)
+    print("{:<8} {:>8} {:>16} {:>12}".format(
+        'format', 'frames', 'per frame (ms)', 'size (kB)'))
+    try:
+        for animation_format, output in [('gif', "run.gif"),
+                                         ('png', "run"),
+                                         ('raw', "run.raw")]:
+            output = os.path.join(directory, output)
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                animation._write_animation(
+                    file_names, output, animation_format)
+            elapsed = time.perf_counter() - start
+            if os.path.isdir(output):
+                size = sum(os.path.getsize(os.path.join(output, name))
+                           for name in os.listdir(output))
+            else:
+                size = os.path.getsize(output)
+            print("{:<8} {:>8} {:>16.1f} {:>12.0f}".format(
+                animation_format, num_frames,
+                elapsed / num_frames * 1000, size / 1000))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# bench_batch_plot.py
+
+"""Compare writing many heatmaps with a new figure per frame against
+reusing one figure with the plotter's _HeatmapRenderer.
+
+The 'new figure' rows write each frame as `rayleigh plot --write` did
+before batch rendering, leaving every figure open.
+
+Run from the repository root with `python3 -m benchmarks.bench_batch_plot`.
+"""
+
+import os
+import resource
+import shutil
+import tempfile
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+matplotlib.rcParams['figure.max_open_warning'] = 0
+from matplotlib import pyplot as plt  # noqa: E402
+import numpy as np  # noqa: E402
+
+from analysis import plotter  # noqa: E402
+
+
+def _gen_frame(num_hits, rng):
+    """Generate an (N, 3) frame array with num_hits hits"""
+    return np.column_stack([
+        rng.randint(0, 256, num_hits),
+        rng.randint(0, 256, num_hits),
+        rng.randint(1, 11810, num_hits)])
+
+
+def _max_rss_mb():
+    """Get the peak resident set size of this process in MB"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _new_figures(frames, directory):
+    for k, frame in enumerate(frames):
+        data = plotter._generate_with_coordinates(frame)
+        heatmap = plotter._gen_heatmap(data)
+        plotter._write_heatmap(
+            os.path.join(directory, "{}.png".format(k)), heatmap)
+
+
+def _renderer(frames, directory):
+    with plotter._HeatmapRenderer() as renderer:
+        for k, frame in enumerate(frames):
+            data = plotter._generate_with_coordinates(frame)
+            renderer.render(data, os.path.join(directory, "{}.png".format(k)))
+
+
+def main():
+    rng = np.random.RandomState(0)
+    num_frames = 200
+    frames = [_gen_frame(200, rng) for _ in range(num_frames)]
+    directory = tempfile.mkdtemp()
+    print("{:<12} {:>8} {:>14} {:>14}".format(
+        'method', 'frames', 'per frame (ms)', 'peak RSS (MB)'))
+    try:
+        # The renderer runs first, as peak RSS only ever grows
+        for name, method in [('renderer', _renderer),
+                             ('new figure', _new_figures)]:
+            start = time.perf_counter()
+            method(frames, directory)
+            elapsed = time.perf_counter() - start
+            print("{:<12} {:>8} {:>14.1f} {:>14.0f}".format(
+                name, num_frames, elapsed / num_frames * 1000, _max_rss_mb()))
+            plt.close('all')
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# bench_cluster_features.py
+
+"""Compare measuring the shape features of clusters one at a time, with
+np.cov and np.linalg.eigh for each, against the batched features of
+clusters._cluster_table, for about a million clusters.
+
+Run from the repository root with
+`python3 -m benchmarks.bench_cluster_features`.
+"""
+
+import time
+
+import numpy as np
+
+from analysis import clusters
+from benchmarks import bench_clusters
+
+
+def _cluster_features(xs, ys):
+    """The length, width and linearity of one cluster"""
+    points = np.column_stack([xs, ys]).astype(float)
+    if len(points) < 2:
+        return 1.0, 1.0, 0.0
+    values, vectors = np.linalg.eigh(np.cov(points.T, bias=True))
+    projected = (points - points.mean(axis=0)) @ vectors
+    extent = projected.max(axis=0) - projected.min(axis=0) + 1
+    linearity = 1 - values[0] / values[1] if values[1] > 0 else 0.0
+    return extent[1], extent[0], linearity
+
+
+def main():
+    rng = np.random.RandomState(0)
+    frames = [bench_clusters._gen_frame(rng) for _ in range(100)]
+    frames_hits = np.concatenate(frames)
+    frame_ids = np.repeat(np.arange(len(frames)), [len(f) for f in frames])
+    labels, num = clusters._label_clusters(
+        frame_ids, frames_hits[:, 0], frames_hits[:, 1])
+    # Repeat the batch, as if it were a run of frames
+    copies = 1000000 // num + 1
+    hits = np.tile(frames_hits, (copies, 1))
+    all_frames = np.repeat(np.arange(copies), len(frames_hits))
+    all_labels = np.tile(labels, copies) + num * all_frames
+    total = num * copies
+    print("{} clusters of {:.1f} pixels".format(total, len(hits) / total))
+    print("{:<24} {:>10} {:>20}".format(
+        'method', 'time (s)', 'clusters per second'))
+
+    sample = 10000
+    order = np.argsort(labels, kind='stable')
+    groups = np.split(order, np.cumsum(np.bincount(labels))[:-1])
+    start = time.perf_counter()
+    for k in range(sample):
+        group = groups[k % num]
+        _cluster_features(frames_hits[group, 0], frames_hits[group, 1])
+    elapsed = (time.perf_counter() - start) * total / sample
+    print("{:<24} {:>10.2f} {:>20.0f}".format(
+        'one cluster at a time', elapsed, total / elapsed))
+
+    for name, features in [('table without features', False),
+                           ('table with features', True)]:
+        start = time.perf_counter()
+        clusters._cluster_table(all_frames, hits, all_labels, total,
+                                features=features)
+        elapsed = time.perf_counter() - start
+        print("{:<24} {:>10.2f} {:>20.0f}".format(
+            name, elapsed, total / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# bench_clusters.py
+
+"""Compare finding the clusters of a run of frames with a flood fill of
+each dense frame against the batched neighbour lookup and union-find of
+clusters._find_clusters.
+
+Run from the repository root with `python3 -m benchmarks.bench_clusters`.
+"""
+
+import time
+
+import numpy as np
+
+from analysis import clusters
+from analysis import frame_parser as fp
+
+
+def _flood_fill_sizes(frame):
+    """Find the cluster sizes of a frame with a flood fill of its image"""
+    hit = np.zeros(fp.FRAME_SHAPE, dtype=bool)
+    hit[frame[:, 0], frame[:, 1]] = True
+    seen = np.zeros(fp.FRAME_SHAPE, dtype=bool)
+    rows, cols = fp.FRAME_SHAPE
+    sizes = []
+    for x, y in zip(*np.nonzero(hit)):
+        if seen[x, y]:
+            continue
+        seen[x, y] = True
+        pending = [(x, y)]
+        size = 0
+        while pending:
+            i, j = pending.pop()
+            size += 1
+            for ni in (i - 1, i, i + 1):
+                for nj in (j - 1, j, j + 1):
+                    if (0 <= ni < rows and 0 <= nj < cols and
+                            hit[ni, nj] and not seen[ni, nj]):
+                        seen[ni, nj] = True
+                        pending.append((ni, nj))
+        sizes.append(size)
+    return sizes
+
+
+def _gen_frame(rng, num_dots=100, num_tracks=5, track_length=40):
+    """Generate a frame of single pixel dots and random walk tracks"""
+    points = [rng.randint(0, 256, (num_dots, 2))]
+    for _ in range(num_tracks):
+        steps = rng.randint(-1, 2, (track_length, 2))
+        points.append(np.clip(
+            rng.randint(0, 256, 2) + np.cumsum(steps, axis=0), 0, 255))
+    pixels = np.unique(np.vstack(points), axis=0)
+    counts = rng.randint(1, 500, len(pixels))
+    return np.column_stack([pixels, counts]).astype(fp.FRAME_DTYPE)
+
+
+def main():
+    rng = np.random.RandomState(0)
+    frames = [_gen_frame(rng) for _ in range(1000)]
+    hits = sum(len(frame) for frame in frames)
+    print("{} frames, {:.0f} hits per frame".format(
+        len(frames), hits / len(frames)))
+    print("{:<22} {:>12} {:>18}".format(
+        'method', 'time (s)', 'frames per second'))
+    start = time.perf_counter()
+    for frame in frames[:100]:
+        _flood_fill_sizes(frame)
+    elapsed = (time.perf_counter() - start) * len(frames) / 100
+    print("{:<22} {:>12.2f} {:>18.0f}".format(
+        'flood fill per frame', elapsed, len(frames) / elapsed))
+    for batch_size in [1, 100, 1000]:
+        start = time.perf_counter()
+        for _ in clusters._iter_cluster_tables(
+                enumerate(frames), batch_size):
+            pass
+        elapsed = time.perf_counter() - start
+        print("{:<22} {:>12.2f} {:>18.0f}".format(
+            'batches of {}'.format(batch_size), elapsed,
+            len(frames) / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# bench_dsc_parser.py
+
+"""Compare the single pass DSC parser with the section based parser.
+
+Run from the repository root with `python3 -m benchmarks.bench_dsc_parser`.
+"""
+
+import os
+import shutil
+import tempfile
+import timeit
+
+from analysis import dsc_parser as dscp
+
+DSC_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "tests", "dsc_data.txt.dsc")
+
+
+def _parse_directory(directory):
+    """Parse a directory of .dsc files with DSCParser"""
+    parser = dscp.DSCParser()
+    for name in os.listdir(directory):
+        with open(os.path.join(directory, name)) as f:
+            parser._frame_from_dsc(f.read())
+
+
+def main():
+    with open(DSC_FILE) as f:
+        dsc_data = f.read()
+    number = 2000
+    old = min(timeit.repeat(
+        lambda: dscp.DSCParser()._frame_from_dsc(dsc_data),
+        number=number, repeat=3)) / number
+    parser = dscp.StreamingDSCParser()
+    new = min(timeit.repeat(
+        lambda: parser._frame_from_dsc(dsc_data),
+        number=number, repeat=3)) / number
+    print("{:<24} {:>12} {:>12} {:>8}".format(
+        'case', 'old (ms)', 'new (ms)', 'speedup'))
+    print("{:<24} {:>12.4f} {:>12.4f} {:>7.1f}x".format(
+        'single file', old * 1000, new * 1000, old / new))
+
+    directory = tempfile.mkdtemp()
+    try:
+        num_files = 2000
+        for i in range(num_files):
+            shutil.copy(DSC_FILE, os.path.join(
+                directory, "data{:05}.txt.dsc".format(i)))
+        old = min(timeit.repeat(
+            lambda: _parse_directory(directory), number=1, repeat=3))
+        new = min(timeit.repeat(
+            lambda: list(dscp._frames_from_directory(directory)),
+            number=1, repeat=3))
+        print("{:<24} {:>12.1f} {:>12.1f} {:>7.1f}x".format(
+            'directory ({} files)'.format(num_files),
+            old * 1000, new * 1000, old / new))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
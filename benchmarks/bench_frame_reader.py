@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# bench_frame_reader.py
+
+"""Compare the NumPy frame reader with the previous csv.reader path.
+
+Run from the repository root with
+`python3 -m benchmarks.bench_frame_reader`.
+"""
+
+import csv
+import timeit
+
+import numpy as np
+
+from analysis import frame_parser as fp
+
+
+def _csv_retrieve_frame(data):
+    """The csv.reader based frame reader that _retrieve_frame replaced"""
+    space_separated = type(
+        'space_sep', (),
+        {
+            'delimiter': ' ',
+            'skipinitialspace': True,
+            'quoting': csv.QUOTE_NONNUMERIC})
+    frame = data.replace('\t', ' ')
+    vals = csv.reader(frame.splitlines(), dialect=space_separated)
+    return list(vals)
+
+
+def _gen_frame_text(num_hits, seed=0):
+    """Generate Pixelman style [X,Y,C] text with num_hits hits"""
+    rng = np.random.RandomState(seed)
+    hits = np.column_stack([
+        rng.randint(0, 256, num_hits),
+        rng.randint(0, 256, num_hits),
+        rng.randint(1, 11810, num_hits)])
+    return "\n".join("{}\t{}\t{}".format(*hit) for hit in hits)
+
+
+def main():
+    cases = [('sparse', 200, 2000), ('dense', 50000, 20)]
+    print("{:<8} {:>7} {:>12} {:>12} {:>8}".format(
+        'frame', 'hits', 'csv (ms)', 'numpy (ms)', 'speedup'))
+    for name, num_hits, number in cases:
+        text = _gen_frame_text(num_hits)
+        old = min(timeit.repeat(
+            lambda: _csv_retrieve_frame(text),
+            number=number, repeat=3)) / number
+        new = min(timeit.repeat(
+            lambda: fp._retrieve_frame_array(text),
+            number=number, repeat=3)) / number
+        print("{:<8} {:>7} {:>12.3f} {:>12.3f} {:>7.1f}x".format(
+            name, num_hits, old * 1000, new * 1000, old / new))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# bench_hotpixels.py
+
+"""Compare updating the hot pixels of a growing run by counting the
+occupancy of every frame again against adding only the new frames to a
+saved hotpixels.PixelOccupancy.
+
+Run from the repository root with `python3 -m benchmarks.bench_hotpixels`.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from analysis import frame_parser as fp
+from analysis import hotpixels
+
+
+def _gen_frame(rng, num_hits=200):
+    """Generate a frame of random hits, with a few hot pixels"""
+    hits = np.vstack([rng.randint(0, 256, (num_hits, 2)),
+                      [[10, 20], [100, 200]]])
+    counts = rng.randint(1, 500, len(hits))
+    return np.column_stack([hits, counts]).astype(fp.FRAME_DTYPE)
+
+
+def _rescan(frames_path):
+    occupancy = hotpixels.PixelOccupancy()
+    for frame in fp._iter_frames_file(frames_path):
+        occupancy.add(frame)
+    return occupancy.hot_pixels
+
+
+def _update(occupancy_path, new_frames, first):
+    occupancy = hotpixels._read_occupancy(occupancy_path)
+    for k, frame in enumerate(new_frames, first):
+        occupancy.add(frame, "data{}.txt".format(k))
+    hotpixels._write_occupancy(occupancy, occupancy_path)
+    return occupancy.hot_pixels
+
+
+def _write_archive(file_name, frames):
+    with fp.FRAMES_WRITERS['archive'](file_name) as archive:
+        for k, frame in enumerate(frames):
+            archive.write(frame, k)
+
+
+def main():
+    rng = np.random.RandomState(0)
+    directory = tempfile.mkdtemp()
+    frames_path = os.path.join(directory, "frames.rla")
+    occupancy_path = os.path.join(directory, hotpixels.OCCUPANCY_NAME)
+    print("{:<8} {:>12} {:>10} {:>10}".format(
+        'frames', 'method', 'time (s)', 'hot pixels'))
+    try:
+        for num_frames in [1000, 10000]:
+            frames = [_gen_frame(rng) for _ in range(num_frames + 100)]
+            old_frames, new_frames = frames[:num_frames], frames[num_frames:]
+            _write_archive(frames_path, frames)
+            occupancy = hotpixels.PixelOccupancy()
+            for k, frame in enumerate(old_frames):
+                occupancy.add(frame, "data{}.txt".format(k))
+            hotpixels._write_occupancy(occupancy, occupancy_path)
+
+            start = time.perf_counter()
+            hot = _rescan(frames_path).sum()
+            elapsed = time.perf_counter() - start
+            print("{:<8} {:>12} {:>10.3f} {:>10}".format(
+                len(frames), 'rescan', elapsed, hot))
+            start = time.perf_counter()
+            hot = _update(occupancy_path, new_frames, num_frames).sum()
+            elapsed = time.perf_counter() - start
+            print("{:<8} {:>12} {:>10.3f} {:>10}".format(
+                len(frames), 'incremental', elapsed, hot))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# bench_json_loader.py
+
+"""Compare reading frame JSON with json.load and a parse_float callback,
+as the plotter used to, against frame_parser._read_frame_json, and
+reading a whole frames.json with json.load against FramesJSON.
+
+Run from the repository root with
+`python3 -m benchmarks.bench_json_loader`.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import timeit
+
+import numpy as np
+
+from analysis import frame_parser as fp
+
+
+def _json_load_frame(file_name):
+    """The JSON frame reader that _read_frame_json replaced"""
+    with open(file_name) as f:
+        return np.array(json.load(f, parse_float=lambda x: int(float(x))))
+
+
+def _json_load_frames(file_name):
+    with open(file_name) as f:
+        return [np.array(frame, dtype=np.float64).reshape(-1, 3).astype(
+            fp.FRAME_DTYPE) for frame in json.load(f)]
+
+
+def _frames_json(file_name):
+    with fp.FramesJSON(file_name) as frames:
+        return list(frames)
+
+
+def _gen_frame(num_hits, rng):
+    return np.column_stack([
+        rng.randint(0, 256, num_hits),
+        rng.randint(0, 256, num_hits),
+        rng.randint(1, 11810, num_hits)]).tolist()
+
+
+def _time(function, file_name, number):
+    return min(timeit.repeat(
+        lambda: function(file_name), number=number, repeat=3)) / number
+
+
+def main():
+    rng = np.random.RandomState(0)
+    directory = tempfile.mkdtemp()
+    cases = [('sparse', 200, 1, 500), ('dense', 20000, 1, 10),
+             ('frames', 200, 1000, 3)]
+    print("{:<8} {:>7} {:>7} {:>15} {:>12} {:>8}".format(
+        'file', 'hits', 'frames', 'json.load (ms)', 'numpy (ms)', 'speedup'))
+    try:
+        for name, num_hits, num_frames, number in cases:
+            file_name = os.path.join(directory, name + ".json")
+            frames = [_gen_frame(num_hits, rng) for _ in range(num_frames)]
+            if num_frames == 1:
+                old_function, new_function = (
+                    _json_load_frame, fp._read_frame_json)
+                data = frames[0]
+            else:
+                old_function, new_function = _json_load_frames, _frames_json
+                data = frames
+            with open(file_name, 'w') as f:
+                f.write(fp._gen_output_data(data))
+            old = _time(old_function, file_name, number)
+            new = _time(new_function, file_name, number)
+            print("{:<8} {:>7} {:>7} {:>15.2f} {:>12.2f} {:>7.1f}x".format(
+                name, num_hits, num_frames, old * 1000, new * 1000,
+                old / new))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
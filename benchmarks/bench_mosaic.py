@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# bench_mosaic.py
+
+"""Compare drawing many frames on one figure with an Axes per frame, as
+`rayleigh plot --single-figure` does, against tiling them into a mosaic
+with `rayleigh plot --mosaic`.
+
+Run from the repository root with `python3 -m benchmarks.bench_mosaic`.
+"""
+
+import io
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib import pyplot as plt  # noqa: E402
+import numpy as np  # noqa: E402
+
+from analysis import plotter  # noqa: E402
+from analysis import sparse  # noqa: E402
+
+
+def _time_figure(function, frames):
+    """Get the time to draw and save a figure of the frames"""
+    start = time.perf_counter()
+    fig = function(frames)[0]
+    fig.savefig(io.BytesIO())
+    plt.close(fig)
+    return time.perf_counter() - start
+
+
+def main():
+    rng = np.random.RandomState(0)
+    cases = [
+        ('subplots', plotter._gen_multi_plots),
+        ('mosaic', lambda frames: plotter._gen_mosaic(frames)),
+        ('mosaic /4',
+         lambda frames: plotter._gen_mosaic(frames, downsample=4))]
+    print("{:<10} {:>8} {:>10}".format('method', 'frames', 'time (s)'))
+    for num_frames in [16, 64]:
+        frames = [sparse.SparseFrame(
+            rng.randint(0, 256, 300), rng.randint(0, 256, 300),
+            rng.randint(1, 11810, 300)) for _ in range(num_frames)]
+        for name, function in cases:
+            print("{:<10} {:>8} {:>10.2f}".format(
+                name, num_frames, _time_figure(function, frames)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# bench_output_formats.py
+
+"""Compare the size and speed of the frame parser output formats.
+
+Run from the repository root with
+`python3 -m benchmarks.bench_output_formats`.
+"""
+
+import os
+import shutil
+import tempfile
+import timeit
+
+import numpy as np
+
+from analysis import frame_parser as fp
+from analysis import plotter
+
+
+def _gen_frame(num_hits, rng):
+    """Generate an (N, 3) frame array with num_hits hits"""
+    return np.column_stack([
+        rng.randint(0, 256, num_hits),
+        rng.randint(0, 256, num_hits),
+        rng.randint(1, 11810, num_hits)]).astype(fp.FRAME_DTYPE)
+
+
+def main():
+    rng = np.random.RandomState(0)
+    cases = [('sparse', 200, 200), ('dense', 20000, 10)]
+    directory = tempfile.mkdtemp()
+    print("{:<8} {:<6} {:>12} {:>12} {:>12}".format(
+        'frame', 'format', 'size (kB)', 'write (ms)', 'read (ms)'))
+    try:
+        for name, num_hits, number in cases:
+            frame = _gen_frame(num_hits, rng)
+            for output_format, extension in sorted(fp.OUTPUT_FORMATS.items()):
+                file_name = os.path.join(directory, "frame" + extension)
+                write = min(timeit.repeat(
+                    lambda: fp._write_frame(frame, file_name, output_format),
+                    number=number, repeat=3)) / number
+                read = min(timeit.repeat(
+                    lambda: plotter._load_frame_file(file_name),
+                    number=number, repeat=3)) / number
+                print("{:<8} {:<6} {:>12.1f} {:>12.3f} {:>12.3f}".format(
+                    name, output_format, os.path.getsize(file_name) / 1000,
+                    write * 1000, read * 1000))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
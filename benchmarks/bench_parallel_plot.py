@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# bench_parallel_plot.py
+
+"""Measure the heatmaps written per second by
+`rayleigh plot --write --no-view --jobs N` for increasing N.
+
+Run from the repository root with
+`python3 -m benchmarks.bench_parallel_plot`.
+"""
+
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np  # noqa: E402
+
+from analysis import plotter  # noqa: E402
+
+
+def main():
+    rng = np.random.RandomState(0)
+    directory = tempfile.mkdtemp()
+    num_frames = 200
+    file_names = []
+    for k in range(num_frames):
+        file_name = os.path.join(directory, "data{}.json".format(k))
+        frame = np.column_stack([
+            rng.randint(0, 256, 200),
+            rng.randint(0, 256, 200),
+            rng.randint(1, 11810, 200)])
+        with open(file_name, 'w') as f:
+            json.dump(frame.tolist(), f)
+        file_names.append(file_name)
+    cpus = os.cpu_count() or 1
+    print("{} CPU(s)".format(cpus))
+    print("{:<6} {:>8} {:>14}".format('jobs', 'frames', 'per second'))
+    try:
+        for jobs in sorted({1, 2, 4, cpus}):
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                plotter._write_heatmaps_from_files(file_names, jobs=jobs)
+            elapsed = time.perf_counter() - start
+            print("{:<6} {:>8} {:>14.1f}".format(
+                jobs, num_frames, num_frames / elapsed))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# bench_rejection.py
+
+"""Compare finding the outliers of a batch of frames one dense frame at
+a time, as the plotter did, against the vectorized batch functions of
+the rejection module.
+
+Run from the repository root with `python3 -m benchmarks.bench_rejection`.
+"""
+
+import timeit
+
+import numpy as np
+import numpy.ma as ma
+
+from analysis import rejection
+from analysis import sparse
+
+
+def _dense_loop(frames, outliers):
+    """Chauvenet's criterion applied to each dense frame in turn"""
+    filtered = []
+    for frame in frames:
+        dense = frame.to_dense()
+        d_max = np.abs(dense - dense.mean()) / dense.std()
+        filtered.append(ma.masked_array(dense, mask=d_max >= outliers))
+    return filtered
+
+
+def main():
+    rng = np.random.RandomState(0)
+    num_frames = 200
+    frames = []
+    for _ in range(num_frames):
+        pixels = rng.choice(256 * 256, 300, replace=False)
+        frames.append(sparse.SparseFrame(
+            pixels // 256, pixels % 256, rng.randint(1, 11810, 300)))
+    stack = ma.stack([frame.to_dense() for frame in frames])
+    cases = [
+        ('dense loop', lambda: _dense_loop(frames, 2)),
+        ('stack std', lambda: rejection._mask_stack_outliers(stack, 2)),
+        ('sparse std', lambda: rejection._mask_sparse_outliers(frames, 2)),
+        ('sparse mad',
+         lambda: rejection._mask_sparse_outliers(frames, 2, 'mad'))]
+    print("{:<12} {:>8} {:>16}".format('method', 'frames', 'per frame (us)'))
+    for name, function in cases:
+        elapsed = min(timeit.repeat(function, number=3, repeat=3)) / 3
+        print("{:<12} {:>8} {:>16.1f}".format(
+            name, num_frames, elapsed / num_frames * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# bench_stack.py
+
+"""Compare the peak memory of integrating a run of frames by loading
+them all with plotter._gen_multi_from_files against streaming them into
+a stack.FrameStack.
+
+Run from the repository root with `python3 -m benchmarks.bench_stack`.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from analysis import plotter
+from analysis import stack
+
+
+def _load_all(file_names):
+    return plotter._gen_multi_from_files(file_names).sum(axis=0)
+
+
+def _stream(file_names):
+    return stack._stack_frames(stack._iter_input_frames(file_names)).sum
+
+
+def _measure(function, file_names):
+    """Get the time and peak traced memory of function(file_names)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    function(file_names)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    rng = np.random.RandomState(0)
+    directory = tempfile.mkdtemp()
+    print("{:<8} {:>8} {:>10} {:>16}".format(
+        'method', 'frames', 'time (s)', 'peak memory (MB)'))
+    try:
+        file_names = []
+        for num_frames in [100, 400]:
+            while len(file_names) < num_frames:
+                file_name = os.path.join(
+                    directory, "data{}.npz".format(len(file_names)))
+                np.savez(file_name, x=rng.randint(0, 256, 200).astype('u1'),
+                         y=rng.randint(0, 256, 200).astype('u1'),
+                         c=rng.randint(1, 11810, 200).astype('<u2'))
+                file_names.append(file_name)
+            for name, function in [('load all', _load_all),
+                                   ('stream', _stream)]:
+                elapsed, peak = _measure(function, file_names)
+                print("{:<8} {:>8} {:>10.2f} {:>16.1f}".format(
+                    name, num_frames, elapsed, peak / 1e6))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# bench_startup.py
+
+"""Measure the start up time of the rayleigh command.
+
+Each case is run in a new interpreter. The 'eager' rows first import
+matplotlib.pyplot and the plotter, as rayleigh did before its commands
+imported their modules lazily.
+
+Run from the repository root with `python3 -m benchmarks.bench_startup`.
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+EAGER_IMPORTS = "import matplotlib.pyplot, analysis.plotter\n"
+RUN_RAYLEIGH = (
+    "import sys\n"
+    "from analysis import rayleigh\n"
+    "rayleigh.RayleighApp()._run(sys.argv[1:])\n")
+
+
+def _time_command(code, args, repeat=5):
+    """Get the best wall clock time of running code in a new interpreter"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.call(
+            [sys.executable, '-c', code] + args,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    with open(os.path.join(directory, "data00.txt"), 'w') as f:
+        f.write("1 2 3")
+    cases = [('rayleigh --version', ['--version']),
+             ('rayleigh frame', ['frame', directory])]
+    print("{:<20} {:>12} {:>12}".format('command', 'eager (ms)', 'lazy (ms)'))
+    try:
+        for name, args in cases:
+            eager = _time_command(EAGER_IMPORTS + RUN_RAYLEIGH, args)
+            lazy = _time_command(RUN_RAYLEIGH, args)
+            print("{:<20} {:>12.1f} {:>12.1f}".format(
+                name, eager * 1000, lazy * 1000))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# bench_thumbnails.py
+
+"""Compare writing a frame as a matplotlib heatmap against writing it as
+a PNG thumbnail with the plotter's NumPy colormap and zlib encoder.
+
+Run from the repository root with `python3 -m benchmarks.bench_thumbnails`.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import timeit
+
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib import pyplot as plt  # noqa: E402
+import numpy as np  # noqa: E402
+
+from analysis import plotter  # noqa: E402
+
+
+def _write_heatmap(file_name):
+    """Write a heatmap as `rayleigh plot --write` does for one file"""
+    plotter._write_heatmap_from_file(file_name)
+    plt.close('all')
+
+
+def main():
+    rng = np.random.RandomState(0)
+    directory = tempfile.mkdtemp()
+    number = 20
+    print("{:<8} {:>14} {:>16} {:>10}".format(
+        'hits', 'heatmap (ms)', 'thumbnail (ms)', 'speedup'))
+    try:
+        for num_hits in [200, 20000]:
+            file_name = os.path.join(directory, "frame.json")
+            frame = np.column_stack([
+                rng.randint(0, 256, num_hits),
+                rng.randint(0, 256, num_hits),
+                rng.randint(1, 11810, num_hits)])
+            with open(file_name, 'w') as f:
+                json.dump(frame.tolist(), f)
+            heatmap = min(timeit.repeat(
+                lambda: _write_heatmap(file_name),
+                number=number, repeat=3)) / number
+            thumbnail = min(timeit.repeat(
+                lambda: plotter._write_thumbnails_from_files([file_name]),
+                number=number, repeat=3)) / number
+            print("{:<8} {:>14.1f} {:>16.1f} {:>9.0f}x".format(
+                num_hits, heatmap * 1000, thumbnail * 1000,
+                heatmap / thumbnail))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
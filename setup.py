@@ -31,5 +31,6 @@ setup(
     download_url="https://github.com/GuiltyDolphin/RAYLEIGH/tarball/{}".format(
         analysis.__version__),
 
-    test_suite='nose.collector'
+    test_suite='nose.collector',
+    tests_require=['Pillow']
     )
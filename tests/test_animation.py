@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# test_animation.py
+
+import unittest
+import tempfile
+import os
+import shutil
+import json
+import io
+from unittest import mock
+
+import numpy as np
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from analysis import animation
+from analysis import plotter
+
+
+class TestAnimation(unittest.TestCase):
+
+    """Tests for writing frames as animations"""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.frames = [[[0, 0, 10], [5, 6, 20]],
+                       [[0, 0, 40], [255, 255, 30]],
+                       [[100, 100, 25]]]
+        self.file_names = []
+        for k, frame in enumerate(self.frames):
+            file_name = os.path.join(self.dir, "frame{}.json".format(k))
+            with open(file_name, 'w') as f:
+                json.dump(frame, f)
+            self.file_names.append(file_name)
+        self.palette = animation._palette()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def expected_images(self, scale=(10, 40)):
+        """Helper - The RGB image of each frame on the shared scale"""
+        return [self.palette[plotter._colormap_indices(
+            plotter._sparse_frame(frame), animation.PALETTE_COLORS, scale)]
+            for frame in self.frames]
+
+    @unittest.skipIf(Image is None, "Pillow is needed to read images")
+    def test_lzw_encode_round_trip(self):
+        """GIF frames decode to the indices they were written with"""
+        rng = np.random.RandomState(0)
+        frames = [np.full((256, 256), 255, dtype=np.uint8),
+                  # Enough distinct runs to fill and clear the code table
+                  rng.randint(0, 256, (256, 256)).astype(np.uint8),
+                  rng.randint(0, 3, (256, 256)).astype(np.uint8)]
+        file_name = os.path.join(self.dir, "out.gif")
+        with animation._GIFWriter(file_name, (256, 256), self.palette) as w:
+            for frame in frames:
+                w.write(frame)
+        with Image.open(file_name) as image:
+            self.assertEqual(3, image.n_frames)
+            for k, frame in enumerate(frames):
+                image.seek(k)
+                np.testing.assert_array_equal(
+                    self.palette[frame], np.array(image.convert('RGB')))
+
+    def test_color_scale(self):
+        """The scale covers the counts of every frame"""
+        frames = [plotter._sparse_frame(frame) for frame in self.frames]
+        self.assertEqual((10, 40), animation._color_scale(iter(frames)))
+        self.assertEqual((0, 0), animation._color_scale([]))
+
+    @unittest.skipIf(Image is None, "Pillow is needed to read images")
+    def test_write_gif(self):
+        """Every frame of a GIF is coloured with the same scale"""
+        output = os.path.join(self.dir, "run.gif")
+        scale, failures = animation._write_animation(
+            self.file_names, output, fps=20)
+        self.assertEqual((10, 40), scale)
+        self.assertEqual([], failures)
+        with Image.open(output) as image:
+            self.assertEqual(3, image.n_frames)
+            self.assertEqual(50, image.info['duration'])
+            for k, expected in enumerate(self.expected_images()):
+                image.seek(k)
+                np.testing.assert_array_equal(
+                    expected, np.array(image.convert('RGB')))
+
+    @unittest.skipIf(Image is None, "Pillow is needed to read images")
+    def test_write_png_sequence(self):
+        """Frames can be written as numbered PNG images"""
+        output = os.path.join(self.dir, "run")
+        animation._write_animation(self.file_names, output, 'png')
+        self.assertEqual(
+            ["frame_00000.png", "frame_00001.png", "frame_00002.png"],
+            sorted(os.listdir(output)))
+        with Image.open(os.path.join(output, "frame_00001.png")) as image:
+            np.testing.assert_array_equal(
+                self.expected_images()[1], np.array(image))
+
+    def test_write_raw(self):
+        """Frames can be written as raw RGB frames"""
+        output = os.path.join(self.dir, "run.raw")
+        animation._write_animation(self.file_names, output, 'raw')
+        raw = np.fromfile(output, dtype=np.uint8).reshape(3, 256, 256, 3)
+        np.testing.assert_array_equal(self.expected_images(), raw)
+
+    def test_skips_unreadable_frames(self):
+        """A file that cannot be read is reported and left out"""
+        bad_name = os.path.join(self.dir, "bad.json")
+        with open(bad_name, 'w') as f:
+            f.write("[[1, 2")
+        output = os.path.join(self.dir, "run.raw")
+        with mock.patch('sys.stdout', new_callable=io.StringIO), \
+                mock.patch('sys.stderr', new_callable=io.StringIO) as err:
+            _, failures = animation._write_animation(
+                self.file_names[:1] + [bad_name] + self.file_names[1:],
+                output, 'raw')
+        self.assertEqual([bad_name], [name for name, _ in failures])
+        self.assertEqual(1, err.getvalue().count("bad.json"))
+        raw = np.fromfile(output, dtype=np.uint8).reshape(3, 256, 256, 3)
+        np.testing.assert_array_equal(self.expected_images(), raw)
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            animation._write_animation(
+                self.file_names, self.dir + "/out.mp4", 'mp4')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# test_catalog.py
+
+import unittest
+import tempfile
+import os
+import shutil
+
+from analysis import catalog
+
+with open("tests/dsc_data.txt.dsc") as f:
+    dsc_data = f.read()
+
+
+class TestCatalog(unittest.TestCase):
+
+    """Tests for the SQLite catalog of DSC files"""
+
+    def setUp(self):
+        self.dir = os.path.realpath(tempfile.mkdtemp())
+        self.catalog = os.path.join(self.dir, "catalog.db")
+        self.run1 = os.path.join(self.dir, "run1")
+        self.run2 = os.path.join(self.dir, "run2")
+        os.mkdir(self.run1)
+        os.mkdir(self.run2)
+        self.paths = [
+            self.write_dsc(self.run1, 0, "95.000000", "1396447375.004957"),
+            self.write_dsc(self.run1, 1, "95.000000", "1396447300.0"),
+            self.write_dsc(self.run2, 0, "50.000000", "1396447400.0")]
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write_dsc(self, directory, number, bias_voltage, start_time):
+        """Helper - Write a .dsc file, returning its frame path"""
+        data = dsc_data.replace("95.000000", bias_voltage).replace(
+            "1396447375.004957", start_time)
+        path = os.path.join(directory, "data{:02}.txt".format(number))
+        with open(path + ".dsc", 'w') as f:
+            f.write(data)
+        return path
+
+    def test_indexes_directories_recursively(self):
+        """Every .dsc file below the directory is added"""
+        counts = catalog._index_directory(self.dir, self.catalog)
+        self.assertEqual(3, counts['added'])
+        self.assertEqual(
+            sorted(self.paths), sorted(catalog._query_catalog(self.catalog)))
+
+    def test_query_orders_by_start_time(self):
+        """Matching frames are listed in order of their start time"""
+        catalog._index_directory(self.dir, self.catalog)
+        self.assertEqual(
+            [self.paths[1], self.paths[0], self.paths[2]],
+            catalog._query_catalog(self.catalog))
+
+    def test_query_by_criteria(self):
+        """Frames can be selected by equality and by ranges"""
+        catalog._index_directory(self.dir, self.catalog)
+        self.assertEqual(
+            [self.paths[1], self.paths[0]],
+            catalog._query_catalog(
+                self.catalog, bias_voltage=95, min_acquisition_time=60))
+        self.assertEqual(
+            [self.paths[2]],
+            catalog._query_catalog(self.catalog, max_bias_voltage=60))
+        self.assertEqual(
+            [], catalog._query_catalog(
+                self.catalog, min_acquisition_time=61, chipboard_id=None))
+        self.assertEqual(
+            [self.paths[0], self.paths[2]],
+            catalog._query_catalog(
+                self.catalog, min_start_time=1396447375,
+                chipboard_id="B06-W0212"))
+
+    def test_query_rejects_unknown_columns(self):
+        catalog._index_directory(self.dir, self.catalog)
+        with self.assertRaises(ValueError):
+            catalog._query_catalog(self.catalog, min_colour=1)
+
+    def test_query_missing_catalog(self):
+        with self.assertRaises(FileNotFoundError):
+            catalog._query_catalog(self.catalog)
+
+    def test_index_is_incremental(self):
+        """Only new, changed and removed files change the catalog"""
+        catalog._index_directory(self.dir, self.catalog)
+        self.assertEqual(
+            3, catalog._index_directory(self.dir, self.catalog)['unchanged'])
+        self.write_dsc(self.run2, 0, "10.000000", "1396447400.0")
+        new_path = self.write_dsc(self.run2, 1, "95.000000", "1.0")
+        os.remove(self.paths[1] + ".dsc")
+        counts = catalog._index_directory(self.dir, self.catalog, jobs=2)
+        self.assertEqual(
+            {'added': 1, 'updated': 1, 'removed': 1, 'unchanged': 1,
+             'failed': 0}, counts)
+        self.assertEqual(
+            [self.paths[2]],
+            catalog._query_catalog(self.catalog, bias_voltage=10))
+        self.assertEqual(
+            [new_path, self.paths[0]],
+            catalog._query_catalog(self.catalog, bias_voltage=95))
+
+    def test_index_only_touches_indexed_directory(self):
+        """Indexing one directory leaves the others in the catalog"""
+        catalog._index_directory(self.dir, self.catalog)
+        catalog._index_directory(self.run2, self.catalog)
+        self.assertEqual(3, len(catalog._query_catalog(self.catalog)))
+
+    def test_index_matches_directory_case(self):
+        """Directories whose names only differ in case are kept apart"""
+        lower = os.path.join(self.dir, "run")
+        upper = os.path.join(self.dir, "Run")
+        os.mkdir(lower)
+        try:
+            os.mkdir(upper)
+        except FileExistsError:
+            self.skipTest("case insensitive file system")
+        self.write_dsc(upper, 0, "95.000000", "1396447375.004957")
+        self.write_dsc(lower, 0, "95.000000", "1396447375.004957")
+        catalog._index_directory(upper, self.catalog)
+        counts = catalog._index_directory(lower, self.catalog)
+        self.assertEqual(1, counts['added'])
+        self.assertEqual(0, counts['removed'])
+        self.assertEqual(2, len(catalog._query_catalog(self.catalog)))
+
+    def test_index_reports_failed_files(self):
+        """Files that cannot be parsed are counted and skipped"""
+        with open(os.path.join(self.run1, "data05.txt.dsc"), 'w') as f:
+            f.write("A000000001\n")
+        counts = catalog._index_directory(self.dir, self.catalog)
+        self.assertEqual(1, counts['failed'])
+        self.assertEqual(3, counts['added'])
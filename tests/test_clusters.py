@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# test_clusters.py
+
+import unittest
+import tempfile
+import os
+import shutil
+
+import numpy as np
+
+from analysis import clusters
+
+
+class TestClusters(unittest.TestCase):
+
+    """Tests for finding the clusters of adjacent hits"""
+
+    def setUp(self):
+        self.frames = [
+            # A diagonal pair, a lone hit and a pair on the far edge
+            [[0, 0, 5], [1, 1, 5], [3, 3, 1], [255, 255, 2], [255, 254, 2]],
+            # Pixels on opposite edges do not touch
+            [[0, 255, 3], [1, 0, 4]],
+            []]
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_labels_adjacent_hits(self):
+        """Hits touching at an edge or corner are in the same cluster"""
+        xs = np.array([5, 6, 7, 9, 5])
+        ys = np.array([5, 6, 5, 9, 5])
+        labels, num = clusters._label_clusters([0, 0, 0, 0, 1], xs, ys)
+        self.assertEqual(3, num)
+        self.assertEqual([0, 0, 0, 1, 2], labels.tolist())
+
+    def test_joins_long_chains(self):
+        """A chain joined from both ends becomes one cluster"""
+        xs = np.arange(200)
+        ys = np.where(np.arange(200) % 2, 10, 11)
+        order = np.random.RandomState(0).permutation(200)
+        labels, num = clusters._label_clusters(
+            np.zeros(200), xs[order], ys[order])
+        self.assertEqual(1, num)
+        self.assertEqual(0, labels.max())
+
+    def test_cluster_table(self):
+        """Each cluster's size, charge, centroid and bounding box"""
+        table = clusters._find_clusters(self.frames, numbers=[7, 8, 9])
+        self.assertEqual(clusters.CLUSTER_COLUMNS, list(table))
+        self.assertEqual([7, 7, 7, 8, 8], table['frame'].tolist())
+        self.assertEqual([2, 1, 2, 1, 1], table['size'].tolist())
+        self.assertEqual([10, 1, 4, 3, 4], table['charge'].tolist())
+        self.assertEqual([0.5, 3, 255, 0, 1], table['x'].tolist())
+        self.assertEqual([0.5, 3, 254.5, 255, 0], table['y'].tolist())
+        self.assertEqual([0, 3, 255, 0, 1], table['x_min'].tolist())
+        self.assertEqual([1, 3, 255, 0, 1], table['x_max'].tolist())
+        self.assertEqual([0, 3, 254, 255, 0], table['y_min'].tolist())
+        self.assertEqual([1, 3, 255, 255, 0], table['y_max'].tolist())
+
+    def test_centroid_is_weighted_by_count(self):
+        table = clusters._find_clusters([[[0, 0, 1], [0, 1, 3]]])
+        self.assertEqual([0.75], table['y'].tolist())
+
+    def test_ignores_empty_hits(self):
+        """Hits with a count of 0 do not join clusters"""
+        table = clusters._find_clusters([[[0, 0, 1], [0, 1, 0], [0, 2, 1]]])
+        self.assertEqual([1, 1], table['size'].tolist())
+
+    def test_no_clusters(self):
+        for frames in [[], [[]]]:
+            table = clusters._find_clusters(frames)
+            self.assertEqual(
+                [0] * len(clusters.CLUSTER_COLUMNS),
+                [len(column) for column in table.values()])
+
+    def test_batches_match_single_pass(self):
+        """Finding clusters in batches gives the same table"""
+        whole = clusters._find_clusters(self.frames)
+        batches = list(clusters._iter_cluster_tables(
+            enumerate(self.frames), batch_size=2))
+        self.assertEqual(2, len(batches))
+        for name in clusters.CLUSTER_COLUMNS:
+            np.testing.assert_array_equal(
+                whole[name],
+                np.concatenate([batch[name] for batch in batches]))
+
+    def test_write_run_clusters(self):
+        """The clusters of a directory are written as CSV"""
+        for number, frame in enumerate(self.frames):
+            with open(os.path.join(
+                    self.dir, "data{}.txt".format(number)), 'w') as f:
+                f.write("\n".join(" ".join(map(str, hit)) for hit in frame))
+        output = os.path.join(self.dir, "clusters.csv")
+        self.assertEqual(
+            (2, 2), clusters._write_run_clusters(
+                [self.dir], output, numbers=range(1, 3)))
+        with open(output) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(",".join(clusters.CLUSTER_COLUMNS), lines[0])
+        self.assertEqual("1,1,3,0.000,255.000,0,0,255,255", lines[1])
+        self.assertEqual(3, len(lines))
+
+    def test_empty_run_writes_header(self):
+        output = os.path.join(self.dir, "clusters.csv")
+        self.assertEqual(
+            (0, 0), clusters._write_run_clusters([self.dir], output))
+        with open(output) as f:
+            self.assertEqual(
+                ",".join(clusters.CLUSTER_COLUMNS), f.read().strip())
+
+    def test_other_extensions_write_csv(self):
+        """Tables are CSV unless named .npz, in any case"""
+        frames_dir = os.path.join(self.dir, "frames")
+        os.mkdir(frames_dir)
+        for name in ["clusters.txt", "out", "CLUSTERS.CSV"]:
+            with self.subTest(name=name):
+                output = os.path.join(self.dir, name)
+                clusters._write_run_clusters([frames_dir], output)
+                with open(output) as f:
+                    self.assertEqual(
+                        ",".join(clusters.CLUSTER_COLUMNS), f.read().strip())
+        output = os.path.join(self.dir, "CLUSTERS.NPZ")
+        clusters._write_run_clusters([frames_dir], output)
+        with np.load(output) as data:
+            self.assertEqual(0, len(data['size']))
+
+
+class TestClusterFeatures(unittest.TestCase):
+
+    """Tests for the shape features and classes of clusters"""
+
+    def setUp(self):
+        angles = np.linspace(0, 1.5 * np.pi, 200)
+        arc = np.unique(np.column_stack([
+            100 + np.round(8 * np.cos(angles)),
+            100 + np.round(8 * np.sin(angles))]).astype(int), axis=0)
+        self.frame = np.vstack([
+            [[5, 5, 1]],
+            [[10, 10, 1], [10, 11, 1], [11, 10, 1]],
+            [[20, y, 5] for y in range(20)],
+            [[x, y, 50] for x in range(30, 40) for y in range(40, 45)],
+            np.column_stack([arc, np.full(len(arc), 3)])])
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_features(self):
+        """Length and width are measured along the principal axis"""
+        table = clusters._find_clusters([self.frame], features=True)
+        self.assertEqual(clusters.CLUSTER_COLUMNS + clusters.FEATURE_COLUMNS,
+                         list(table))
+        np.testing.assert_allclose([1, 20, 10], table['length'][[0, 2, 3]])
+        np.testing.assert_allclose([1, 1, 5], table['width'][[0, 2, 3]])
+        np.testing.assert_allclose([0, 1], table['linearity'][[0, 2]])
+        np.testing.assert_allclose([1, 1], table['density'][[2, 3]])
+        np.testing.assert_allclose(
+            [1, 5, 50], table['mean_charge'][[0, 2, 3]])
+
+    def test_diagonal_track_is_thin(self):
+        table = clusters._find_clusters(
+            [[[k, k, 1] for k in range(10)]], features=True)
+        np.testing.assert_allclose(1, table['width'])
+        np.testing.assert_allclose(np.sqrt(199), table['length'])
+
+    def test_rotated_clusters_keep_their_class(self):
+        """Tracks drawn at any angle are classified as when upright"""
+        grid = np.stack(np.meshgrid(np.arange(-15, 16), np.arange(-15, 16)),
+                        axis=-1).reshape(-1, 2)
+        for length, width, name in [(20, 1, 'straight_track'),
+                                    (20, 3, 'heavy_track'),
+                                    (10, 5, 'heavy_track'),
+                                    (3, 2, 'small_blob')]:
+            for degrees in range(0, 181, 15):
+                angle = np.radians(degrees)
+                centred = grid - [0.3, 0.1]
+                along = centred @ [np.cos(angle), np.sin(angle)]
+                across = centred @ [-np.sin(angle), np.cos(angle)]
+                pixels = grid[(np.abs(along) <= length / 2) &
+                              (np.abs(across) <= width / 2)] + 100
+                frame = np.column_stack([pixels, np.ones(len(pixels))])
+                table = clusters._find_clusters([frame], features=True)
+                with self.subTest(name=name, degrees=degrees):
+                    self.assertEqual(
+                        [name],
+                        [clusters.CLUSTER_CLASSES[k] for k in table['class']])
+
+    def test_classes(self):
+        table = clusters._find_clusters([self.frame], features=True)
+        self.assertEqual(
+            ['dot', 'small_blob', 'straight_track', 'heavy_track',
+             'curly_track'],
+            [clusters.CLUSTER_CLASSES[k] for k in table['class']])
+
+    def test_batch_features_match_single_frames(self):
+        """Features do not depend on the other frames of the batch"""
+        frames = [self.frame, self.frame[::-1], self.frame[:4]]
+        whole = clusters._find_clusters(frames, features=True)
+        for name in clusters.FEATURE_COLUMNS:
+            np.testing.assert_allclose(
+                whole[name], np.concatenate([
+                    clusters._find_clusters([frame], features=True)[name]
+                    for frame in frames]))
+
+    def test_write_npz(self):
+        """The columns are written to an .npz file with the class names"""
+        table = clusters._find_clusters([self.frame], features=True)
+        output = os.path.join(self.dir, "clusters.npz")
+        self.assertEqual(5, clusters._write_clusters_npz(
+            [table, clusters._find_clusters([], features=True)], output))
+        with np.load(output) as data:
+            self.assertEqual(clusters.CLUSTER_CLASSES,
+                             data['classes'].tolist())
+            for name in table:
+                np.testing.assert_array_equal(table[name], data[name])
+
+    def test_write_csv_class_names(self):
+        table = clusters._find_clusters([self.frame], features=True)
+        output = os.path.join(self.dir, "clusters.csv")
+        clusters._write_clusters_csv([table], output)
+        with open(output) as f:
+            lines = f.read().splitlines()
+        self.assertTrue(lines[0].endswith(",mean_charge,class"))
+        self.assertTrue(lines[1].endswith(",dot"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -9,6 +9,7 @@ import json
 import copy
 import pickle as pk
 import re
+import shutil
 
 from analysis import dsc_parser as dscp
 
@@ -53,6 +54,63 @@ class TestFrame(unittest.TestCase):
     def test_has_frame_class(self):
         self.assertIsInstance(data_frame, dscp.Frame)
 
+    def test_frame_has_no_instance_dict(self):
+        """Frames only hold their slots"""
+        self.assertFalse(hasattr(self.frame, '__dict__'))
+        with self.assertRaises(AttributeError):
+            self.frame.bias_voltage = 10.0
+
+    def test_frame_fields_are_attributes(self):
+        """Every field can be read as an attribute"""
+        self.assertEqual(95.0, self.frame._bias_voltage)
+        self.assertEqual("A000000001", self.frame._frame['name'])
+        self.assertEqual(
+            1396447375.004957, self.frame._acquisition_start_time)
+        with self.assertRaises(AttributeError):
+            self.frame._no_such_field
+
+    def test_frames_share_metadata(self):
+        """Frames from the same acquisition share one metadata block"""
+        other = copy.deepcopy(data_frame)
+        self.assertEqual(self.frame, other)
+        self.assertIs(self.frame._metadata, other._metadata)
+        self.assertIsInstance(self.frame._dacs, tuple)
+
+    def test_frames_with_different_metadata(self):
+        """Frames with different settings do not share metadata"""
+        fields = self.frame._asdict()
+        kwargs = {name[1:]: value for name, value in fields.items()}
+        kwargs['bias_voltage'] = 10.0
+        other = dscp.Frame(**kwargs)
+        self.assertNotEqual(self.frame, other)
+        self.assertEqual(10.0, other._bias_voltage)
+
+    def test_frames_are_not_hashable(self):
+        """Frames compare by value, so they cannot be hashed"""
+        with self.assertRaises(TypeError):
+            hash(self.frame)
+
+    def test_interned_metadata_is_bounded(self):
+        """Only the most recent metadata blocks are kept"""
+        fields = self.frame._asdict()
+        kwargs = {name[1:]: value for name, value in fields.items()}
+        for voltage in range(2 * dscp.MAX_INTERNED_METADATA):
+            kwargs['bias_voltage'] = float(voltage)
+            dscp.Frame(**kwargs)
+        self.assertEqual(dscp.MAX_INTERNED_METADATA,
+                         len(dscp._interned_metadata))
+        frames = [copy.deepcopy(data_frame) for _ in range(2)]
+        self.assertIs(frames[0]._metadata, frames[1]._metadata)
+
+    def test_pickled_frames_share_metadata(self):
+        """Pickling many frames stores their shared metadata once"""
+        frames = [copy.deepcopy(data_frame) for _ in range(100)]
+        single = len(pk.dumps(frames[0], pk_protocol))
+        self.assertLess(len(pk.dumps(frames, pk_protocol)), 25 * single)
+        loaded = pk.loads(pk.dumps(frames, pk_protocol))
+        self.assertEqual(frames, loaded)
+        self.assertIs(self.frame._metadata, loaded[-1]._metadata)
+
 
 class TestDSCParser(unittest.TestCase):
 
@@ -141,8 +199,78 @@ class TestDSCParser(unittest.TestCase):
 
     def test_creates_correct_frame_from_dsc(self):
         other = self.parser._frame_from_dsc(self.dsc_data)
-        self.assertDictEqual(self.frame.__dict__, other.__dict__)
+        self.assertDictEqual(self.frame._asdict(), other._asdict())
 
     def test_creates_correct_frame_from_pickle(self):
         other = pk.loads(self.parser._pickle_from_dsc(self.dsc_data))
-        self.assertDictEqual(self.frame.__dict__, other.__dict__)
+        self.assertDictEqual(self.frame._asdict(), other._asdict())
+
+
+class TestStreamingDSCParser(unittest.TestCase):
+
+    """Tests for the single pass DSC parser"""
+
+    def setUp(self):
+        self.frame = copy.deepcopy(data_frame)
+        self.parser = dscp.StreamingDSCParser()
+        self.in_file = "tests/dsc_data.txt.dsc"
+        with open(self.in_file) as f:
+            self.dsc_data = f.read()
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write_dsc_files(self, names):
+        """Helper - Copy the test data to files named names"""
+        paths = [os.path.join(self.dir, name) for name in names]
+        for path in paths:
+            shutil.copy(self.in_file, path)
+        return paths
+
+    def test_creates_correct_frame_from_dsc(self):
+        other = self.parser._frame_from_dsc(self.dsc_data)
+        self.assertDictEqual(self.frame._asdict(), other._asdict())
+
+    def test_matches_dsc_parser(self):
+        """Produces the same frame as the section based parser"""
+        expected = dscp.DSCParser()._frame_from_dsc(self.dsc_data)
+        actual = self.parser._frame_from_dsc(self.dsc_data)
+        self.assertDictEqual(expected._asdict(), actual._asdict())
+
+    def test_creates_correct_frame_from_file(self):
+        other = self.parser._frame_from_file(self.in_file)
+        self.assertDictEqual(self.frame._asdict(), other._asdict())
+
+    def test_creates_correct_frame_from_pickle(self):
+        other = pk.loads(self.parser._pickle_from_dsc(self.dsc_data))
+        self.assertDictEqual(self.frame._asdict(), other._asdict())
+
+    def test_caches_section_keys(self):
+        """The key of a section title is only worked out once"""
+        title = '"HV" ("Bias voltage [V]"):'
+        self.assertEqual(('bias_voltage', None),
+                         self.parser._section_key(title))
+        self.assertIn(title, self.parser._section_keys)
+
+    def test_parses_directory_in_frame_order(self):
+        """Every file in a directory is parsed, in frame number order"""
+        paths = self.write_dsc_files(
+            ["data10.txt.dsc", "data2.txt.dsc", "data03.txt.dsc"])
+        for jobs in [1, 2]:
+            results = list(dscp._frames_from_directory(self.dir, jobs=jobs))
+            self.assertEqual([paths[1], paths[2], paths[0]],
+                             [path for path, _, _ in results])
+            for _, frame, err in results:
+                self.assertIsNone(err)
+                self.assertDictEqual(self.frame._asdict(), frame._asdict())
+
+    def test_reports_files_that_fail_to_parse(self):
+        """Files that cannot be parsed are given with their error"""
+        path, = self.write_dsc_files(["data00.txt.dsc"])
+        with open(os.path.join(self.dir, "data01.txt.dsc"), 'w') as f:
+            f.write("A000000001\n")
+        results = list(dscp._frames_from_directory(self.dir))
+        self.assertEqual(path, results[0][0])
+        self.assertIsNone(results[1][1])
+        self.assertIsNotNone(results[1][2])
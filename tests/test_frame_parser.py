@@ -1,11 +1,15 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import io
 import unittest
 import tempfile
 import os
 import json
 import shutil
+from unittest import mock
+
+import numpy as np
 
 import analysis.frame_parser as fp
 
@@ -60,6 +64,190 @@ class TestFrameParser(unittest.TestCase):
         actual_json_data = json.loads(fp._gen_output_data(data))
         self.assertEqual(expected_json_data, actual_json_data)
 
+    def test_frame_json_holds_integers(self):
+        """Converted frames are written as integers, not as floats"""
+        frame = fp._retrieve_frame("77 56  28\n7 57 61")
+        self.assertEqual([[77, 56, 28], [7, 57, 61]], frame)
+        self.assertTrue(all(type(value) is int
+                            for hit in frame for value in hit))
+        fp._detect_input_and_write(
+            self.in_file_frame.name, self.out_file.name)
+        with open(self.out_file.name) as f:
+            data = f.read()
+        self.assertTrue(data.startswith("[\n  [\n    77,\n    56,\n"))
+        self.assertNotIn(".0", data)
+
+    def test_retrieves_frame_as_integer_array(self):
+        """Frame data is read into a compact (N, 3) integer array"""
+        frame = fp._retrieve_frame_array(self.frame_data)
+        self.assertEqual((8, 3), frame.shape)
+        self.assertEqual(fp.FRAME_DTYPE, frame.dtype)
+        np.testing.assert_array_equal([77, 56, 28], frame[0])
+        np.testing.assert_array_equal([21, 86, 41], frame[-1])
+
+    def test_keeps_large_counts(self):
+        """Counts beyond 16 bits are kept, not wrapped"""
+        self.assertEqual([[1, 2, 40000]],
+                         fp._retrieve_frame_array("1 2 40000").tolist())
+
+    def test_rejects_values_that_do_not_fit(self):
+        """Values are never truncated or wrapped"""
+        for data in ["1.5 2 3", "1 2 nan", "1 2 3000000000"]:
+            with self.subTest(data=data):
+                with self.assertRaises(ValueError):
+                    fp._retrieve_frame_array(data)
+        self.assertEqual([[1, 2, 3]],
+                         fp._retrieve_frame_array("1.0 2 3").tolist())
+
+    def test_retrieves_tab_separated_frame(self):
+        """Tabs and spaces are both accepted as separators"""
+        frame = fp._retrieve_frame_array("1\t2\t3\n4 5\t6\n")
+        np.testing.assert_array_equal([[1, 2, 3], [4, 5, 6]], frame)
+
+    def test_retrieves_empty_frame(self):
+        """A frame with no hits gives an empty array"""
+        frame = fp._retrieve_frame_array("  \n")
+        self.assertEqual((0, 3), frame.shape)
+
+    def test_rejects_incomplete_hits(self):
+        """Data that is not made of [X,Y,C] triples is rejected"""
+        with self.assertRaises(ValueError):
+            fp._retrieve_frame_array("1 2 3\n4 5")
+
+    def test_binary_formats_round_trip(self):
+        """Frames read back from every output format are unchanged"""
+        frame = fp._retrieve_frame_array(self.frame_data + "\n1 2 65535")
+        for output_format, extension in fp.OUTPUT_FORMATS.items():
+            out_name = self.out_file.name + extension
+            fp._write_frame(frame, out_name, output_format)
+            actual = fp._read_frame_file(out_name)
+            os.remove(out_name)
+            self.assertEqual(fp.FRAME_DTYPE, actual.dtype)
+            np.testing.assert_array_equal(frame, actual)
+
+    def test_npz_frame_is_written_to_the_name_given(self):
+        """No .npz extension is added to the name of an npz frame"""
+        frame = fp._retrieve_frame_array(self.frame_data)
+        fp._write_frame(frame, self.out_file.name, 'npz')
+        self.assertFalse(os.path.exists(self.out_file.name + ".npz"))
+        with np.load(self.out_file.name) as data:
+            self.assertEqual(frame[:, 0].tolist(), data['x'].tolist())
+
+    def test_binary_format_uses_typed_columns(self):
+        """The raw binary format is the uint8/uint8/uint16 columns"""
+        frame = fp._retrieve_frame_array(self.frame_data)
+        out_name = self.out_file.name + ".bin"
+        fp._write_frame(frame, out_name, 'bin')
+        self.assertEqual(8 * (1 + 1 + 2), os.path.getsize(out_name))
+        os.remove(out_name)
+        x, y, c = fp._frame_columns(frame)
+        self.assertEqual(np.uint8, x.dtype)
+        self.assertEqual(np.uint8, y.dtype)
+        self.assertEqual(np.uint16, c.dtype)
+
+    def test_binary_formats_reject_out_of_range_hits(self):
+        """Hits that do not fit in the binary columns are rejected"""
+        for frame in [[[256, 1, 1]], [[1, 1, -1]]]:
+            with self.assertRaises(ValueError):
+                fp._frame_columns(np.array(frame))
+
+    def write_archive(self, frames, **kwargs):
+        """Helper - Write frames to a frame archive"""
+        with fp._ArchiveFramesWriter(self.out_file.name, **kwargs) as writer:
+            for number, frame in frames:
+                writer.write(np.array(frame), number)
+
+    def test_archive_gives_random_access_to_frames(self):
+        """Any frame can be read from an archive by its position"""
+        frames = [(3, [[1, 2, 3]]), (4, []), (7, [[4, 5, 6], [7, 8, 9]])]
+        self.write_archive(frames)
+        with fp.FrameArchive(self.out_file.name) as archive:
+            self.assertEqual(3, len(archive))
+            self.assertEqual([3, 4, 7], archive.numbers.tolist())
+            self.assertEqual([1, 0, 2], archive.counts.tolist())
+            self.assertEqual([[4, 5, 6], [7, 8, 9]], archive[2].tolist())
+            self.assertEqual([[1, 2, 3]], archive[-3].tolist())
+            self.assertEqual([], archive[1].tolist())
+            self.assertEqual(fp.FRAME_DTYPE, archive[0].dtype)
+            with self.assertRaises(IndexError):
+                archive[3]
+
+    def test_archive_can_be_appended_to(self):
+        """Frames can be added to the end of an existing archive"""
+        self.write_archive([(0, [[1, 2, 3]])])
+        self.write_archive([(1, [[4, 5, 6]]), (2, [])], append=True)
+        with fp.FrameArchive(self.out_file.name) as archive:
+            self.assertEqual([0, 1, 2], archive.numbers.tolist())
+            self.assertEqual(
+                [[[1, 2, 3]], [[4, 5, 6]], []],
+                [frame.tolist() for frame in archive])
+
+    def test_archive_columns_outlive_archive(self):
+        """Columns and frame numbers can be kept after closing"""
+        self.write_archive([(5, [[1, 2, 3]])])
+        with fp.FrameArchive(self.out_file.name) as archive:
+            columns = archive.columns(0)
+            numbers = archive.numbers
+            counts = archive.counts
+        self.assertEqual([[1], [2], [3]],
+                         [column.tolist() for column in columns])
+        self.assertEqual([5], numbers.tolist())
+        self.assertEqual([1], counts.tolist())
+
+    def test_rejects_non_archive(self):
+        """Opening a file that is not an archive is an error"""
+        with self.assertRaises(ValueError):
+            fp.FrameArchive(self.in_file_frame.name)
+
+    def test_list_frame_matches_array_frame(self):
+        """The list-of-lists frame is the array frame as lists"""
+        self.assertEqual(
+            fp._retrieve_frame_array(self.frame_data).tolist(),
+            fp._retrieve_frame(self.frame_data))
+
+    def test_parses_frame_json(self):
+        """Frame JSON is parsed to the hits json.load reads"""
+        for frame in [[], [[1, 2, 3]], [[4, 5, 6], [255, 0, -1]]]:
+            data = fp._gen_output_data(frame).encode()
+            actual = fp._parse_frame_json(data)
+            self.assertEqual(frame, actual.tolist())
+            self.assertEqual(fp.FRAME_DTYPE, actual.dtype)
+        self.assertEqual(
+            [[1, 2, 3]], fp._parse_frame_json(b'[[1.0, 2.5, 3.9]]').tolist())
+
+    def test_rejects_malformed_frame_json(self):
+        """Frame JSON that is not a list of [x, y, c] hits is an error"""
+        for data in [b'', b'[1, 2, 3]', b'[[1, 2]]', b'[[1, 2, 3, 4, 5, 6]]',
+                     b'{"x": 1}', b'[[1, 2, 3, 4], [5, 6]]',
+                     b'[[1, 2], [3, 4, 5, 6]]', b'[[1, 2, 3]][[4, 5, 6]',
+                     b'[1, 2, 3], [[4, 5, 6]]']:
+            with self.assertRaises(ValueError):
+                fp._parse_frame_json(data)
+
+    def test_frames_json_gives_random_access_to_frames(self):
+        """Any frame of a frames JSON file can be read by its position"""
+        frames = [[[1, 2, 3]], [], [[4, 5, 6], [7, 8, 9]]]
+        with fp._FramesWriter(self.out_file.name) as writer:
+            for frame in frames:
+                writer.write(fp._gen_output_data(frame))
+        with fp.FramesJSON(self.out_file.name) as frames_json:
+            self.assertEqual(3, len(frames_json))
+            self.assertEqual([[4, 5, 6], [7, 8, 9]], frames_json[2].tolist())
+            self.assertEqual([[1, 2, 3]], frames_json[-3].tolist())
+            self.assertEqual(frames, [frame.tolist()
+                                      for frame in frames_json])
+            with self.assertRaises(IndexError):
+                frames_json[3]
+
+    def test_frames_json_spans_chunks(self):
+        """Frames are found when they cross the scanned chunks"""
+        frames = [[[k, k + 1, k + 2]] * (k % 3) for k in range(20)]
+        data = fp._gen_output_data(frames).encode()
+        starts, ends = fp._json_array_spans(data, chunk_size=7)
+        self.assertEqual(
+            frames, [json.loads(data[start:end].decode())
+                     for start, end in zip(starts, ends)])
+
 
 class TestDirectoryParsing(unittest.TestCase):
     """Tests regarding multiple files for the FrameParser"""
@@ -156,6 +344,304 @@ class TestDirectoryParsing(unittest.TestCase):
         with open(self.dir + "/output/frames.json") as f:
             self.assertEqual(expected, json.loads(f.read()))
 
+    def test_binary_output_formats(self):
+        """Directories can be converted to each binary format"""
+        expected = self.get_expected_data()
+        for output_format in ['npz', 'bin']:
+            extension = fp.OUTPUT_FORMATS[output_format]
+            fp._write_output_directory(
+                self.dir, output_format=output_format)
+            frames_name = self.dir + "/output/frames" + extension
+            self.assertEqual(
+                expected, [frame.tolist()
+                           for frame in fp._iter_frames_file(frames_name)])
+            actual = fp._read_frame_file(
+                fp._gen_output_path(self.in_file2.name, extension))
+            self.assertEqual(expected[1], actual.tolist())
+
+    def test_frames_files_with_empty_frames(self):
+        """The binary frames files keep frames without any hits"""
+        frames = [np.empty((0, 3)), np.array([[1, 2, 3]]), np.empty((0, 3))]
+        for output_format, writer in fp.FRAMES_WRITERS.items():
+            out_name = os.path.join(
+                self.dir, "frames" + fp.OUTPUT_FORMATS[output_format])
+            with writer(out_name) as frames_file:
+                for frame in frames:
+                    if output_format == 'json':
+                        frame = fp._gen_output_data(frame.tolist())
+                    frames_file.write(frame)
+            self.assertEqual(
+                [[], [[1, 2, 3]], []],
+                [frame.tolist() for frame in fp._iter_frames_file(out_name)])
+
+    def test_frame_files_can_be_turned_off(self):
+        """Only the frames file is written without frame files"""
+        expected = self.get_expected_data()
+        for output_format in ['json', 'bin']:
+            shutil.rmtree(self.dir + "/output", ignore_errors=True)
+            fp._write_output_directory(
+                self.dir, output_format=output_format, frame_files=False)
+            frames_name = "frames" + fp.OUTPUT_FORMATS[output_format]
+            self.assertEqual([frames_name], os.listdir(self.dir + "/output"))
+            self.assertEqual(
+                expected, [frame.tolist() for frame in fp._iter_frames_file(
+                    self.dir + "/output/" + frames_name)])
+
+    def test_is_frames_file(self):
+        """Archives and 'frames' files are told from frame files"""
+        for name in ["frames.json", "frames.npz", "run.rla", "frames.rla"]:
+            self.assertTrue(fp._is_frames_file("/data/output/" + name))
+        for name in ["data1.json", "frames.txt", "frames"]:
+            self.assertFalse(fp._is_frames_file("/data/output/" + name))
+
+    def test_total_frame_output_is_formatted_as_before(self):
+        """The streamed frames file matches serialising every frame"""
+        fp._write_output_directory(self.dir)
+        with open(self.dir + "/output/frames.json") as f:
+            self.assertEqual(
+                fp._gen_output_data(self.get_expected_data()), f.read())
+
+    def test_frames_writer_streams_frames(self):
+        """The frames writer output matches serialising the whole list"""
+        out_name = os.path.join(self.dir, "frames.json")
+        for frames in [[], [[]], self.get_expected_data()]:
+            with fp._FramesWriter(out_name) as writer:
+                for frame in frames:
+                    writer.write(fp._gen_output_data(frame))
+            with open(out_name) as f:
+                self.assertEqual(fp._gen_output_data(frames), f.read())
+
+    def test_parallel_conversion_matches_serial(self):
+        """Converting with several jobs gives the same output"""
+        expected = self.get_expected_data()
+        fp._write_output_directory(self.dir, jobs=2)
+        with open(self.dir + "/output/frames.json") as f:
+            self.assertEqual(expected, json.loads(f.read()))
+        with open(self.out_name2) as f:
+            self.assertEqual(expected[1], json.loads(f.read()))
+
+    def test_total_frames_in_frame_number_order(self):
+        """Frames are ordered by their number, not by name"""
+        path = os.path.join(self.dir, "data10.txt")
+        with open(path, 'w') as f:
+            f.write("20 21 22")
+        os.rename(self.in_file1.name, os.path.join(self.dir, "data2.txt"))
+        fp._write_output_directory(self.dir)
+        os.rename(os.path.join(self.dir, "data2.txt"), self.in_file1.name)
+        with open(self.dir + "/output/frames.json") as f:
+            frames = json.loads(f.read())
+        self.assertEqual([[[1, 2, 3], [4, 5, 6], [7, 8, 9]], [[20, 21, 22]]],
+                         frames[1:])
+
+    def test_failed_file_does_not_stop_conversion(self):
+        """A file that cannot be parsed is reported and skipped"""
+        bad_file = os.path.join(self.dir, "data05.txt")
+        with open(bad_file, 'w') as f:
+            f.write("1 2 three")
+        for jobs in [1, 2]:
+            failures = fp._write_output_directory(self.dir, jobs=jobs)
+            self.assertEqual([bad_file], [file for file, _ in failures])
+            self.assertIsInstance(failures[0][1], ValueError)
+            with open(self.dir + "/output/frames.json") as f:
+                self.assertEqual(
+                    self.get_expected_data(), json.loads(f.read()))
+
+    def convert_incrementally(self, **kwargs):
+        """Helper - Incrementally convert, returning the converted files"""
+        with mock.patch.object(
+                fp, '_convert_file', wraps=fp._convert_file) as convert:
+            fp._write_output_directory(self.dir, incremental=True, **kwargs)
+        return [args[0] for args, _ in convert.call_args_list]
+
+    def read_total_frames(self):
+        """Helper - Read the frames file"""
+        with open(self.dir + "/output/frames.json") as f:
+            return json.loads(f.read())
+
+    def test_incremental_conversion_writes_manifest(self):
+        """Incremental conversion records each converted file"""
+        self.convert_incrementally()
+        with open(self.dir + "/output/" + fp.MANIFEST_NAME) as f:
+            manifest = json.loads(f.read())
+        name1, name2 = get_base_names([self.in_file1, self.in_file2])
+        self.assertCountEqual([name1, name2], manifest['files'])
+        entry = manifest['files'][name1]
+        self.assertEqual(os.path.getsize(self.in_file1.name), entry['size'])
+        self.assertEqual(
+            fp._file_signature(self.in_file1.name)['sha1'], entry['sha1'])
+
+    def test_incremental_conversion_skips_unchanged_files(self):
+        """Only new or changed files are converted again"""
+        self.convert_incrementally()
+        with open(self.in_file2.name, 'w') as f:
+            f.write("10 11 12")
+        new_file = os.path.join(self.dir, "data07.txt")
+        with open(new_file, 'w') as f:
+            f.write("1 1 1")
+        converted = self.convert_incrementally()
+        self.assertCountEqual([self.in_file2.name, new_file], converted)
+        expect1, _ = self.get_expected_data()
+        self.assertEqual(
+            [expect1, [[10, 11, 12]], [[1, 1, 1]]], self.read_total_frames())
+
+    def test_incremental_conversion_after_no_frame_files(self):
+        """Frames converted without frame files leave none out of date"""
+        self.convert_incrementally()
+        with open(self.in_file2.name, 'w') as f:
+            f.write("9 9 9")
+        self.convert_incrementally(frame_files=False)
+        self.assertFalse(os.path.exists(self.out_name2))
+        self.assertEqual([[9, 9, 9]], self.read_total_frames()[1])
+        converted = self.convert_incrementally()
+        self.assertIn(self.in_file2.name, converted)
+        self.assertEqual([[9, 9, 9]], self.read_total_frames()[1])
+
+    def test_incremental_conversion_hashes_touched_files(self):
+        """A file whose time changed but contents did not is skipped"""
+        self.convert_incrementally()
+        stat = os.stat(self.in_file1.name)
+        os.utime(self.in_file1.name, ns=(stat.st_atime_ns,
+                                         stat.st_mtime_ns + 10 ** 9))
+        self.assertEqual([], self.convert_incrementally())
+        self.assertEqual(self.get_expected_data(), self.read_total_frames())
+
+    def test_incremental_conversion_per_format(self):
+        """Changing the output format converts every file again"""
+        self.convert_incrementally()
+        converted = self.convert_incrementally(output_format='npz')
+        self.assertCountEqual(
+            [self.in_file1.name, self.in_file2.name], converted)
+        self.assertEqual([], self.convert_incrementally(output_format='npz'))
+        frames_name = self.dir + "/output/frames.npz"
+        self.assertEqual(
+            self.get_expected_data(),
+            [frame.tolist() for frame in fp._iter_frames_file(frames_name)])
+
+    def test_archive_output_format(self):
+        """Directories can be converted to a single frame archive"""
+        fp._write_output_directory(self.dir, output_format='archive')
+        self.assertEqual(["frames.rla"], os.listdir(self.dir + "/output"))
+        with fp.FrameArchive(self.dir + "/output/frames.rla") as archive:
+            self.assertEqual([0, 1], archive.numbers.tolist())
+            self.assertEqual(
+                self.get_expected_data(),
+                [frame.tolist() for frame in archive])
+
+    def test_incremental_archive_conversion(self):
+        """New frames are appended to the archive, changes rewrite it"""
+        self.convert_incrementally(output_format='archive')
+        new_file = os.path.join(self.dir, "data07.txt")
+        with open(new_file, 'w') as f:
+            f.write("1 1 1")
+        size = os.path.getsize(self.dir + "/output/frames.rla")
+        writer = mock.Mock(wraps=fp._ArchiveFramesWriter)
+        with mock.patch.dict(fp.FRAMES_WRITERS, {'archive': writer}):
+            converted = self.convert_incrementally(output_format='archive')
+        self.assertEqual([new_file], converted)
+        self.assertEqual({'append': True}, writer.call_args[1])
+        self.assertGreater(os.path.getsize(self.dir + "/output/frames.rla"),
+                           size)
+        with open(self.in_file1.name, 'w') as f:
+            f.write("2 2 2")
+        converted = self.convert_incrementally(output_format='archive')
+        self.assertEqual([self.in_file1.name], converted)
+        _, expect2 = self.get_expected_data()
+        frames_name = self.dir + "/output/frames.rla"
+        self.assertEqual(
+            [[[2, 2, 2]], expect2, [[1, 1, 1]]],
+            [frame.tolist() for frame in fp._iter_frames_file(frames_name)])
+        self.assertEqual(
+            ["frames.rla", fp.MANIFEST_NAME],
+            sorted(os.listdir(self.dir + "/output")))
+
+    def test_can_append_to_frames_files(self):
+        """Frames can be appended to existing frames files"""
+        frame = np.array([[1, 1, 1]])
+        for output_format in ['json', 'bin', 'archive']:
+            fp._write_output_directory(self.dir, output_format=output_format)
+            frames_name = (self.dir + "/output/frames" +
+                           fp.OUTPUT_FORMATS[output_format])
+            data = frame
+            if output_format == 'json':
+                data = fp._gen_output_data(frame.tolist())
+            fp._append_frame(frames_name, data, 5, output_format)
+            self.assertEqual(
+                self.get_expected_data() + [[[1, 1, 1]]],
+                [f.tolist() for f in fp._iter_frames_file(frames_name)])
+        fp._write_output_directory(self.dir, output_format='npz')
+        with self.assertRaises(ValueError):
+            fp._append_frame(self.dir + "/output/frames.npz", frame, 5, 'npz')
+
+    def test_can_append_to_empty_frames_json(self):
+        """A frame can be appended to a frames.json with no frames"""
+        frames_name = self.dir + "/frames.json"
+        fp._FramesWriter(frames_name).close()
+        fp._append_frames_json(frames_name, fp._gen_output_data([[1, 2, 3]]))
+        with open(frames_name) as f:
+            self.assertEqual(fp._gen_output_data([[[1, 2, 3]]]), f.read())
+
+    def watch(self, writes, polls, **kwargs):
+        """Helper - Watch the directory, performing writes between polls
+
+        writes maps the number of the sleep between polls to the
+        (file name, text) to append before the next poll.
+        """
+        sleeps = []
+
+        def sleep(interval):
+            sleeps.append(interval)
+            if len(sleeps) in writes:
+                name, text = writes[len(sleeps)]
+                with open(os.path.join(self.dir, name), 'a') as f:
+                    f.write(text)
+        with mock.patch.object(fp.time, 'sleep', side_effect=sleep):
+            return fp._watch_directory(self.dir, polls=polls, **kwargs)
+
+    def test_watch_converts_new_stable_files(self):
+        """New files are converted once their size stops changing"""
+        writes = {1: ("data05.txt", "1 1 1\n"), 2: ("data05.txt", "2 2 2")}
+        latencies = self.watch(writes, polls=4)
+        self.assertEqual(
+            [os.path.join(self.dir, "data05.txt")],
+            [file for file, _ in latencies])
+        self.assertEqual(
+            self.get_expected_data() + [[[1, 1, 1], [2, 2, 2]]],
+            self.read_total_frames())
+
+    def test_watch_waits_for_files_to_stop_growing(self):
+        """Files that are still being written are not converted"""
+        writes = {1: ("data05.txt", "1 1 1\n"), 2: ("data05.txt", "2 2 2")}
+        self.assertEqual([], self.watch(writes, polls=3))
+        self.assertEqual(self.get_expected_data(), self.read_total_frames())
+
+    def test_watch_reports_failures_once(self):
+        """A file that fails is only tried again once it changes"""
+        writes = {1: ("data05.txt", "1 1\n"), 4: ("data05.txt", "1 1")}
+        with mock.patch('sys.stderr', new_callable=io.StringIO) as err:
+            self.assertEqual([], self.watch(writes, polls=7))
+        self.assertEqual(2, err.getvalue().count("data05.txt"))
+
+    def test_watch_appends_to_archive(self):
+        """Watching with the archive format appends to the archive"""
+        self.watch({1: ("data05.txt", "1 1 1")}, polls=3,
+                   output_format='archive')
+        with fp.FrameArchive(self.dir + "/output/frames.rla") as archive:
+            self.assertEqual([0, 1, 5], archive.numbers.tolist())
+
+    def test_incremental_conversion_can_be_forced(self):
+        """Forcing an incremental conversion converts every file"""
+        self.convert_incrementally()
+        converted = self.convert_incrementally(force=True)
+        self.assertCountEqual(
+            [self.in_file1.name, self.in_file2.name], converted)
+
+    def test_incremental_conversion_replaces_missing_output(self):
+        """A file whose output has been removed is converted again"""
+        self.convert_incrementally()
+        os.remove(self.out_name1)
+        self.assertEqual([self.in_file1.name], self.convert_incrementally())
+        self.assertEqual(self.get_expected_data(), self.read_total_frames())
+
     def test_can_detect_and_write_to_output_dir(self):
         """Can detect and write to directories"""
         exp1, exp2 = get_expected_names([self.in_file1, self.in_file2])
@@ -163,6 +649,17 @@ class TestDirectoryParsing(unittest.TestCase):
         self.assertCountEqual(
             [exp1, exp2, "frames.json"], os.listdir(self.dir + "/output"))
 
+    def test_skips_files_without_frame_number(self):
+        """Files with no frame number are reported and left out"""
+        with open(os.path.join(self.dir, "notes.txt"), 'w') as f:
+            f.write("Not a frame\n")
+        with mock.patch('sys.stderr', new_callable=io.StringIO) as err:
+            fp._detect_input_and_write(self.dir)
+        self.assertIn("notes.txt", err.getvalue())
+        self.assertEqual(self.get_expected_data(), self.read_total_frames())
+        with self.assertRaises(ValueError):
+            fp._get_frame_file_number("notes.txt")
+
     def test_can_write_individual_files(self):
         exp1 = get_expected_names([self.in_file1])[0]
         fp._detect_input_and_write(self.in_file1.name)
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# test_hotpixels.py
+
+import io
+import unittest
+import tempfile
+import os
+import shutil
+from unittest import mock
+
+import numpy as np
+
+from analysis import frame_parser as fp
+from analysis import hotpixels
+from analysis import plotter
+from analysis import sparse
+
+
+class TestPixelOccupancy(unittest.TestCase):
+
+    """Tests for counting how often each pixel is hit"""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_counts_frames_each_pixel_is_hit_in(self):
+        """A pixel is counted once per frame, and zero counts are not"""
+        occupancy = hotpixels.PixelOccupancy()
+        occupancy.add([[0, 0, 5], [1, 2, 3], [3, 3, 0]])
+        occupancy.add('[\n  [0, 0, 7]\n]')
+        occupancy.add(sparse.SparseFrame.from_hits([[0, 0, 1], [1, 2, 1]])
+                      .masked(np.array([False, True])))
+        self.assertEqual(3, occupancy.frames)
+        self.assertEqual(3, occupancy.hits[0, 0])
+        self.assertEqual(1, occupancy.hits[1, 2])
+        self.assertEqual(0, occupancy.hits[3, 3])
+        self.assertEqual(1.0, occupancy.occupancy[0, 0])
+
+    def test_named_frames_are_counted_once(self):
+        occupancy = hotpixels.PixelOccupancy()
+        self.assertTrue(occupancy.add([[0, 0, 1]], "data0.txt"))
+        self.assertFalse(occupancy.add([[0, 0, 1]], "data0.txt"))
+        self.assertEqual(1, occupancy.frames)
+
+    def test_hot_pixels_need_enough_frames(self):
+        """No pixel is hot until min_frames frames have been counted"""
+        occupancy = hotpixels.PixelOccupancy(threshold=0.5, min_frames=4)
+        for k in range(3):
+            occupancy.add([[0, 0, 1], [k, 9, 1]])
+        self.assertFalse(occupancy.hot_pixels.any())
+        occupancy.add([[0, 0, 1]])
+        self.assertEqual([[0, 0]], np.argwhere(occupancy.hot_pixels).tolist())
+
+    def test_occupancy_file_round_trip(self):
+        occupancy = hotpixels.PixelOccupancy(threshold=0.5, min_frames=1)
+        occupancy.add([[4, 5, 1]], "data0.txt")
+        file_name = os.path.join(self.dir, hotpixels.OCCUPANCY_NAME)
+        hotpixels._write_occupancy(occupancy, file_name)
+        result = hotpixels._read_occupancy(file_name)
+        self.assertEqual(1, result.frames)
+        self.assertEqual({"data0.txt"}, result.names)
+        self.assertEqual(0.5, result.threshold)
+        np.testing.assert_array_equal(occupancy.hits, result.hits)
+        with np.load(file_name) as data:
+            self.assertTrue(data['hot_pixels'][4, 5])
+        self.assertFalse(
+            hotpixels._read_hot_pixels(file_name, threshold=2.0).any())
+
+    def test_rejects_other_npz_files(self):
+        file_name = os.path.join(self.dir, "other.npz")
+        np.savez(file_name, frames=1)
+        with self.assertRaises(ValueError):
+            hotpixels._read_occupancy(file_name)
+
+
+class TestConversionOccupancy(unittest.TestCase):
+
+    """Tests for learning the hot pixels of a directory as it is converted"""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.occupancy_path = os.path.join(
+            self.dir, "output", hotpixels.OCCUPANCY_NAME)
+        for k in range(3):
+            self._write_frame(k)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _write_frame(self, k):
+        with open(os.path.join(self.dir, "data{}.txt".format(k)), 'w') as f:
+            f.write("1 2 3\n{} 9 1\n".format(k))
+
+    def _convert(self, **kwargs):
+        with mock.patch('sys.stdout', new_callable=io.StringIO):
+            fp._write_output_directory(self.dir, occupancy=True, **kwargs)
+        return hotpixels._read_occupancy(self.occupancy_path)
+
+    def test_counts_converted_frames(self):
+        occupancy = self._convert()
+        self.assertEqual(3, occupancy.frames)
+        self.assertEqual(3, occupancy.hits[1, 2])
+        self.assertEqual(1, occupancy.hits[2, 9])
+
+    def test_no_occupancy_by_default(self):
+        with mock.patch('sys.stdout', new_callable=io.StringIO):
+            fp._write_output_directory(self.dir)
+        self.assertFalse(os.path.exists(self.occupancy_path))
+
+    def test_incremental_conversion_only_adds_new_frames(self):
+        """New frames are added without the old ones being read again"""
+        for output_format in ['json', 'archive']:
+            with self.subTest(output_format=output_format):
+                shutil.rmtree(os.path.join(self.dir, "output"),
+                              ignore_errors=True)
+                self._convert(incremental=True, output_format=output_format)
+                self._write_frame(3)
+                with mock.patch.object(
+                        fp, '_parse_frame_json',
+                        wraps=fp._parse_frame_json) as parse:
+                    occupancy = self._convert(
+                        incremental=True, output_format=output_format)
+                self.assertLessEqual(parse.call_count, 1)
+                self.assertEqual(4, occupancy.frames)
+                self.assertEqual(4, occupancy.hits[1, 2])
+                os.remove(os.path.join(self.dir, "data3.txt"))
+
+    def test_counts_frames_converted_before_occupancy(self):
+        """Frames converted without the occupancy are counted once"""
+        with mock.patch('sys.stdout', new_callable=io.StringIO):
+            fp._write_output_directory(self.dir, incremental=True)
+        self.assertEqual(3, self._convert(incremental=True).frames)
+        self.assertEqual(3, self._convert(incremental=True).frames)
+
+    def test_full_conversion_starts_again(self):
+        self._convert()
+        self.assertEqual(3, self._convert().frames)
+
+    def test_watch_adds_new_frames(self):
+        with mock.patch('sys.stdout', new_callable=io.StringIO):
+            fp._watch_directory(self.dir, polls=1, occupancy=True)
+            self._write_frame(3)
+            fp._watch_directory(self.dir, interval=0, polls=2,
+                                occupancy=True)
+        occupancy = hotpixels._read_occupancy(self.occupancy_path)
+        self.assertEqual(4, occupancy.frames)
+        self.assertEqual({"data{}.txt".format(k) for k in range(4)},
+                         occupancy.names)
+
+
+class TestHotPixelMasking(unittest.TestCase):
+
+    """Tests for leaving out the hits of hot pixels when loading frames"""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.hot_pixels = np.zeros(fp.FRAME_SHAPE, dtype=bool)
+        self.hot_pixels[1, 2] = True
+        self.frame = np.array([[1, 2, 900], [3, 4, 5], [5, 6, 7]],
+                              dtype=fp.FRAME_DTYPE)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_frame_parser_drops_hot_pixels(self):
+        file_name = os.path.join(self.dir, "frame.npz")
+        fp._write_frame(self.frame, file_name, 'npz')
+        expected = [[3, 4, 5], [5, 6, 7]]
+        self.assertEqual(
+            expected,
+            fp._read_frame_file(file_name, self.hot_pixels).tolist())
+        frames_name = os.path.join(self.dir, "frames.bin")
+        with fp.FRAMES_WRITERS['bin'](frames_name) as frames:
+            frames.write(self.frame)
+            frames.write(self.frame)
+        self.assertEqual(
+            [expected, expected],
+            [frame.tolist() for frame in fp._iter_frames_file(
+                frames_name, self.hot_pixels)])
+
+    def test_plotter_masks_hot_pixels_before_outliers(self):
+        """A hot pixel does not hide the outliers of a frame"""
+        frame = [[1, 2, 900], [9, 9, 50]] + [[k, 0, 5] for k in range(8)]
+        data = plotter._generate_with_coordinates(frame, outliers=2)
+        self.assertFalse(data.mask[9, 9])
+        data = plotter._generate_with_coordinates(
+            frame, outliers=2, hot_pixels=self.hot_pixels)
+        self.assertTrue(data.mask[1, 2])
+        self.assertTrue(data.mask[9, 9])
+        self.assertFalse(data.mask[0, 0])
+        sparse_frame = plotter._sparse_frame(
+            self.frame, hot_pixels=self.hot_pixels)
+        self.assertEqual([True, False, False], sparse_frame.mask.tolist())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# test_loader.py
+
+import unittest
+import tempfile
+import os
+import pickle
+import shutil
+from unittest import mock
+
+import numpy as np
+
+from analysis import dsc_parser as dscp
+from analysis import frame_parser as fp
+from analysis import loader
+
+with open("tests/dsc_data.txt.dsc") as f:
+    dsc_data = f.read()
+
+
+class TestLoader(unittest.TestCase):
+
+    """Tests for loading frame files along with their metadata"""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        for number in [2, 0, 10, 1]:
+            path = os.path.join(self.dir, "data{}.txt".format(number))
+            with open(path, 'w') as f:
+                f.write("{} 1 5\n3 4 6\n".format(number))
+            if number != 1:
+                with open(path + ".dsc", 'w') as f:
+                    f.write(dsc_data)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_load_frame(self):
+        """Test that the hits and metadata of a frame are paired"""
+        path = os.path.join(self.dir, "data2.txt")
+        frame = loader._load_frame(path)
+        self.assertEqual(path, frame.path)
+        self.assertEqual(2, frame.number)
+        self.assertEqual(path + ".dsc", frame.dsc_path)
+        np.testing.assert_array_equal([[2, 1, 5], [3, 4, 6]], frame.hits)
+        self.assertEqual(95.0, frame._bias_voltage)
+        self.assertIsInstance(frame.metadata, dscp.Frame)
+
+    def test_sparse(self):
+        """The hits are available as a SparseFrame"""
+        frame = loader._load_frame(os.path.join(self.dir, "data2.txt"))
+        np.testing.assert_array_equal([2, 3], frame.sparse.x)
+        np.testing.assert_array_equal([5, 6], frame.sparse.c)
+
+    def test_metadata_is_lazy(self):
+        """Test that the .dsc file is only parsed when needed, once"""
+        path = os.path.join(self.dir, "data0.txt")
+        parse = dscp._streaming_parser._frame_from_file
+        with mock.patch.object(dscp._streaming_parser, '_frame_from_file',
+                               side_effect=parse) as mocked:
+            frame = loader._load_frame(path)
+            frame.hits
+            self.assertFalse(mocked.called)
+            self.assertEqual(95.0, frame._bias_voltage)
+            frame._acquisition_time
+            mocked.assert_called_once_with(path + ".dsc")
+
+    def test_missing_dsc(self):
+        """Test a frame without a .dsc file"""
+        frame = loader._load_frame(os.path.join(self.dir, "data1.txt"))
+        self.assertIsNone(frame.dsc_path)
+        self.assertIsNone(frame.metadata)
+        with self.assertRaises(AttributeError):
+            frame._bias_voltage
+
+    def test_unknown_attribute(self):
+        """Test that unknown attributes are not looked up in the .dsc"""
+        frame = loader._load_frame(os.path.join(self.dir, "data0.txt"))
+        with self.assertRaises(AttributeError):
+            frame._not_a_field
+        with self.assertRaises(AttributeError):
+            frame.bias_voltage
+
+    def test_iter_directory(self):
+        """Test that a directory is loaded in frame number order"""
+        frames = list(loader._iter_directory(self.dir))
+        self.assertEqual([0, 1, 2, 10], [f.number for f in frames])
+        np.testing.assert_array_equal([[10, 1, 5], [3, 4, 6]],
+                                      frames[-1].hits)
+
+    def test_iter_directory_numbers(self):
+        """Test that only the selected frames are read"""
+        with mock.patch('analysis.frame_parser._get_frame_array_from_file',
+                        return_value=np.empty((0, 3))) as mocked:
+            frames = list(
+                loader._iter_directory(self.dir, numbers=range(1, 3)))
+        self.assertEqual([1, 2], [f.number for f in frames])
+        self.assertEqual(2, mocked.call_count)
+
+    def test_iter_directory_is_lazy(self):
+        """Test that frames past the ones taken are not read"""
+        with mock.patch('analysis.frame_parser._get_frame_array_from_file',
+                        return_value=np.empty((0, 3))) as mocked:
+            frames = loader._iter_directory(self.dir)
+            next(frames)
+        self.assertEqual(1, mocked.call_count)
+
+    def write_frames_files(self):
+        """Write the frames of the directory as frames.json and .rla"""
+        output = os.path.join(self.dir, "output")
+        os.mkdir(output)
+        frames = [(number, [[number, 1, 5], [3, 4, 6]])
+                  for number in [0, 1, 2, 10]]
+        with fp._FramesWriter(os.path.join(output, "frames.json")) as f:
+            for _, frame in frames:
+                f.write(fp._gen_output_data(frame))
+        with fp._ArchiveFramesWriter(
+                os.path.join(output, "frames.rla")) as f:
+            for number, frame in frames:
+                f.write(np.array(frame), number)
+        return output
+
+    def test_frame_refs_of_directory(self):
+        """The frame files of a directory are found without reading them"""
+        with mock.patch('analysis.frame_parser._get_frame_array_from_file',
+                        return_value=np.empty((0, 3))) as mocked:
+            refs = loader._frame_refs([self.dir], numbers=range(1, 3))
+        self.assertFalse(mocked.called)
+        self.assertEqual([1, 2], [ref.number for ref in refs])
+        self.assertEqual(os.path.join(self.dir, "data2.txt"),
+                         str(refs[1]))
+        np.testing.assert_array_equal([[2, 1, 5], [3, 4, 6]],
+                                      refs[1].load())
+
+    def test_frame_refs_of_frames_files(self):
+        """Archives select frame numbers, frames.json frame positions"""
+        output = self.write_frames_files()
+        json_path = os.path.join(output, "frames.json")
+        archive_path = os.path.join(output, "frames.rla")
+        refs = loader._frame_refs([json_path, archive_path],
+                                  numbers=range(2, 11))
+        self.assertEqual(
+            [os.path.join(output, name) for name in
+             ["frames_2", "frames_3", "frames_2", "frames_10"]],
+            [str(ref) for ref in refs])
+        self.assertEqual([[10, 1, 5], [3, 4, 6]], refs[1].load().tolist())
+        self.assertEqual([[10, 1, 5], [3, 4, 6]], refs[3].load().tolist())
+
+    def test_frame_refs_keep_frame_files(self):
+        """Converted frame files are given as they are"""
+        path = os.path.join(self.dir, "data0.txt.dsc")
+        self.assertEqual([path], loader._frame_refs([path], range(5, 6)))
+
+    def test_open_frames_files_are_closed(self):
+        """Frames files are closed once they are not among the last few"""
+        output = self.write_frames_files()
+        self.addCleanup(loader._close_frames_files)
+        archive_path = os.path.join(output, "frames.rla")
+        archives = []
+        for k in range(loader.MAX_OPEN_FRAMES_FILES + 1):
+            path = os.path.join(output, "copy{}.rla".format(k))
+            shutil.copy(archive_path, path)
+            archives.append(loader._open_frames_file(path))
+        self.assertIs(archives[-1], loader._open_frames_file(path))
+        self.assertTrue(archives[0]._map.closed)
+        self.assertEqual([[0, 1, 5], [3, 4, 6]], archives[1][0].tolist())
+        loader._close_frames_files()
+        self.assertTrue(archives[1]._map.closed)
+
+    def test_frame_ref_can_be_pickled(self):
+        """Frame references can be sent to worker processes"""
+        ref = loader.FrameRef("frames.json", 3, 7)
+        loaded = pickle.loads(pickle.dumps(ref))
+        self.assertEqual(ref, loaded)
+        self.assertEqual((3, 7), (loaded.index, loaded.number))
+        self.assertEqual("frames_7", loaded)
+
+    def test_frame_refs_are_paths(self):
+        """The os.path functions take frame references on any Python"""
+        ref = loader.FrameRef(os.path.join("run", "frames.rla"), 3, 7)
+        self.assertEqual("frames_7", os.path.basename(ref))
+        self.assertEqual("run", os.path.dirname(ref))
+
+
+if __name__ == '__main__':
+    unittest.main()
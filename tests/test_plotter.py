@@ -6,11 +6,15 @@ import tempfile
 import os
 import shutil
 import json
+import io
+from unittest import mock
 
 import numpy as np
 import numpy.ma as ma
 
+from analysis import frame_parser
 from analysis import plotter
+from analysis import sparse
 
 
 class TestFrameGraphing(unittest.TestCase):
@@ -95,6 +99,17 @@ class TestFrameGraphing(unittest.TestCase):
         np.testing.assert_array_equal(
             new_frame.compressed().sort(), arr.compressed().sort())
 
+    def test_can_read_binary_frame_files(self):
+        """Frames in the binary output formats are read natively"""
+        for output_format in ['npz', 'bin', 'archive']:
+            file_name = self.in_file_frame.name + (
+                frame_parser.OUTPUT_FORMATS[output_format])
+            frame_parser._write_frame(self.xyz, file_name, output_format)
+            data = plotter._gen_multi_from_files(
+                [self.in_file_frame.name, file_name])
+            os.remove(file_name)
+            np.testing.assert_array_equal(data[0], data[1])
+
     def test_basic_figure_correct_number_axes(self):
         fig, axes = plotter._generate_basic_figure(5)
         self.assertEqual((2, 3), axes.shape)
@@ -109,3 +124,160 @@ class TestFrameGraphing(unittest.TestCase):
         exp_data = np.array([self.heatmap_data, self.heatmap_data])
         data = plotter._gen_multi_from_files(file_names)
         np.testing.assert_array_equal(exp_data, data)
+
+    def test_write_heatmaps_from_files(self):
+        """A heatmap is written for each file, reusing one figure"""
+        from matplotlib import pyplot as plt
+        figures = plt.get_fignums()
+        plotter._write_heatmaps_from_files(
+            [self.in_file_frame.name, self.in_file_frame2.name])
+        self.assertCountEqual(
+            [os.path.basename(self.out_name),
+             os.path.basename(self.out_name2)],
+            os.listdir(self.dir + "/plots"))
+        self.assertEqual(figures, plt.get_fignums())
+
+    def test_renderer_matches_new_heatmap(self):
+        """Reusing the renderer writes the same image as a new heatmap"""
+        from matplotlib import pyplot as plt
+        other = plotter._generate_with_coordinates(
+            [[1, 2, 300], [100, 200, 5]])
+        os.mkdir(self.dir + "/plots")
+        with plotter._HeatmapRenderer() as renderer:
+            for data in [other, self.heatmap_data]:
+                renderer.render(data, self.out_name)
+        fig, ax, heatmap = plotter._gen_heatmap(self.heatmap_data)
+        fig.savefig(self.out_name2)
+        plt.close(fig)
+        with open(self.out_name, 'rb') as f1, open(self.out_name2, 'rb') as f2:
+            self.assertEqual(f2.read(), f1.read())
+
+    def test_colormap_table_matches_matplotlib(self):
+        """The thumbnail colours are those of matplotlib's Reds colormap"""
+        from matplotlib import colormaps
+        expected = colormaps['Reds'](np.arange(256), bytes=True)[:, :3]
+        table = plotter._colormap_table()
+        self.assertEqual((256, 3), table.shape)
+        self.assertLessEqual(
+            np.abs(table.astype(int) - expected).max(), 1)
+
+    def test_apply_colormap(self):
+        """Values are scaled to the table and masked values are white"""
+        table = plotter._colormap_table()
+        data = plotter._generate_with_coordinates(
+            [[0, 0, 10], [0, 1, 20], [255, 255, 30]])
+        rgb = plotter._apply_colormap(data, table)
+        self.assertEqual((256, 256, 3), rgb.shape)
+        # The first row of data is the last row of the image
+        np.testing.assert_array_equal(table[0], rgb[-1, 0])
+        np.testing.assert_array_equal(table[128], rgb[-1, 1])
+        np.testing.assert_array_equal(table[-1], rgb[0, -1])
+        np.testing.assert_array_equal([255, 255, 255], rgb[100, 100])
+
+    def test_write_thumbnails_from_files(self):
+        """A PNG thumbnail is written for each file"""
+        from matplotlib import image
+        plotter._write_thumbnails_from_files(
+            [self.in_file_frame.name, self.in_file_frame2.name])
+        thumbnails = self.dir + "/thumbnails/"
+        names = [os.path.basename(self.in_file_frame.name) + ".png",
+                 os.path.basename(self.in_file_frame2.name) + ".png"]
+        self.assertCountEqual(names, os.listdir(thumbnails))
+        read = image.imread(thumbnails + names[0])
+        expected = plotter._apply_colormap(
+            self.heatmap_data, plotter._colormap_table())
+        np.testing.assert_array_equal(
+            expected, np.round(read * 255).astype(np.uint8))
+
+    def test_thumbnails_skip_unreadable_files(self):
+        """A file that cannot be read does not stop the other thumbnails"""
+        bad_name = os.path.join(self.dir, "bad.json")
+        with open(bad_name, 'w') as f:
+            f.write("[[1, 2")
+        with mock.patch('sys.stdout', new_callable=io.StringIO), \
+                mock.patch('sys.stderr', new_callable=io.StringIO) as err:
+            failures = plotter._write_thumbnails_from_files(
+                [bad_name, self.in_file_frame.name])
+        self.assertEqual([bad_name], [name for name, _ in failures])
+        self.assertIn("bad.json", err.getvalue())
+        self.assertEqual(
+            [os.path.basename(self.in_file_frame.name) + ".png"],
+            os.listdir(self.dir + "/thumbnails"))
+
+    def test_load_frame_file_reads_json(self):
+        """Frame JSON files load as the hits, with counts truncated"""
+        np.testing.assert_array_equal(
+            self.xyz, plotter._load_frame_file(self.in_file_frame.name))
+        with open(self.in_file_frame2.name, 'w') as f:
+            f.write("[[1, 2, 3.75], [4, 5, 6.0]]")
+        self.assertEqual(
+            [[1, 2, 3], [4, 5, 6]],
+            plotter._load_frame_file(self.in_file_frame2.name).tolist())
+
+    def test_write_heatmaps_from_files_in_workers(self):
+        """Worker processes write the heatmaps and report failures"""
+        bad_file = self.dir + "/bad.json"
+        with open(bad_file, 'w') as f:
+            f.write("not json")
+        failures = plotter._write_heatmaps_from_files(
+            [self.in_file_frame.name, bad_file, self.in_file_frame2.name],
+            jobs=2)
+        self.assertEqual([bad_file], [name for name, _ in failures])
+        self.assertCountEqual(
+            [os.path.basename(self.out_name),
+             os.path.basename(self.out_name2)],
+            os.listdir(self.dir + "/plots"))
+
+    def test_sparse_frames_are_densified_to_render(self):
+        """Sparse frames render as their dense arrays do"""
+        frame = plotter._load_sparse_frame(self.in_file_frame.name)
+        self.assertIsInstance(frame, sparse.SparseFrame)
+        table = plotter._colormap_table()
+        np.testing.assert_array_equal(
+            plotter._apply_colormap(self.heatmap_data, table),
+            plotter._apply_colormap(frame, table))
+
+    def test_multiple_files_keep_masks(self):
+        """The frames read from multiple files keep their masks"""
+        data = plotter._gen_multi_from_files(
+            [self.in_file_frame.name, self.in_file_frame2.name],
+            outliers=1, outlier_method='mad')
+        self.assertIsInstance(data, ma.MaskedArray)
+        self.assertEqual((2, 256, 256), data.shape)
+        expected = plotter._generate_with_coordinates(
+            self.xyz, outliers=1, outlier_method='mad')
+        np.testing.assert_array_equal(expected.mask, data.mask[0])
+
+    def test_build_mosaic(self):
+        """Frames are tiled in rows, each oriented as in its heatmap"""
+        frames = [[[0, 0, 1]], [[255, 0, 2]], [[0, 255, 3]]]
+        mosaic = plotter._build_mosaic(frames, gap=2)
+        self.assertEqual((514, 514), mosaic.shape)
+        self.assertEqual(3, mosaic.count())
+        self.assertEqual(1, mosaic[255, 0])
+        self.assertEqual(2, mosaic[0, 258])
+        self.assertEqual(3, mosaic[513, 255])
+        single = plotter._build_mosaic([self.xyz])
+        np.testing.assert_array_equal(
+            self.heatmap_data[::-1].mask, single.mask)
+
+    def test_build_mosaic_downsample(self):
+        """Downsampled tiles keep the largest count of each block"""
+        frames = [[[0, 0, 1], [1, 1, 5], [4, 4, 2]]]
+        mosaic = plotter._build_mosaic(frames, downsample=4)
+        self.assertEqual((64, 64), mosaic.shape)
+        self.assertEqual(5, mosaic[63, 0])
+        self.assertEqual(2, mosaic[62, 1])
+        self.assertEqual(2, mosaic.count())
+
+    def test_gen_mosaic(self):
+        """A mosaic is a single image with a label for each frame"""
+        from matplotlib import pyplot as plt
+        frames = [self.xyz] * 5
+        fig, ax, image = plotter._gen_mosaic(
+            frames, labels=list("abcde"), columns=2)
+        self.assertEqual(1, len(fig.axes))
+        self.assertEqual((3 * 258 - 2, 2 * 258 - 2),
+                         image.get_array().shape)
+        self.assertEqual(list("abcde"), [t.get_text() for t in ax.texts])
+        plt.close(fig)
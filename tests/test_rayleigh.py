@@ -2,14 +2,25 @@
 # -*- coding: utf-8 -*-
 # test_rayleigh.py
 
+import argparse
+import io
 import unittest
 import tempfile
 import json
 import os
 import shutil
+import subprocess
+import sys
+from unittest import mock
 
+import numpy as np
+
+from analysis import catalog
+from analysis import hotpixels
 from analysis import plotter
 from analysis import rayleigh
+from analysis import rejection
+from analysis import stack
 from analysis import frame_parser
 
 
@@ -77,6 +88,14 @@ class TestInterfacePlotter(unittest.TestCase):
         """By default there is no outlier boundary"""
         self.assertEqual(None, self.plotparser.get_default('outliers'))
 
+    def test_default_outlier_method(self):
+        """By default outliers are found with the standard deviation"""
+        self.assertEqual('std', self.plotparser.get_default('outlier_method'))
+
+    def test_outlier_methods_match_rejection(self):
+        self.assertCountEqual(
+            rejection.OUTLIER_METHODS, rayleigh.OUTLIER_METHODS)
+
     def test_default_multi_plot_option(self):
         """By default will not plot on single figure"""
         self.assertEqual(False, self.plotparser.get_default('single_figure'))
@@ -95,12 +114,64 @@ class TestInterfacePlotter(unittest.TestCase):
             self.interface._run(
                 ['plot'] + self.test_args + [self.dir + "/invalid-file"])
 
-    def test_does_not_accept_individual_directory(self):
-        """Will not accept a single directory as an argument."""
+    def test_exits_for_directory_without_frames(self):
+        """Exits if a directory has no frame files to plot."""
         with self.assertRaises(SystemExit):
             self.interface._run(
                 ['plot'] + self.test_args + [self.dir])
 
+    def test_plots_directory(self):
+        """Plotting the unconverted frame files of a directory."""
+        frames_dir = os.path.join(self.dir, "run")
+        os.mkdir(frames_dir)
+        for number in range(3):
+            with open(os.path.join(
+                    frames_dir, "data{}.txt".format(number)), 'w') as f:
+                f.write("1 2 3\n4 5 6\n")
+        self.interface._run(
+            ['plot'] + self.test_args +
+            [frames_dir, '-w', '--frames', '1:'])
+        self.assertCountEqual(
+            ["data1.txt.png", "data2.txt.png"],
+            os.listdir(frames_dir + "/plots"))
+
+    def test_plots_frames_file_range(self):
+        """Plotting a range of the frames of a frames file."""
+        frames_name = os.path.join(self.dir, "frames.json")
+        with frame_parser._FramesWriter(frames_name) as frames:
+            for _ in range(4):
+                frames.write(frame_parser._gen_output_data(self.xyz))
+        self.interface._run(
+            ['plot'] + self.test_args +
+            [frames_name, '-w', '--frames', '1:3'])
+        self.assertCountEqual(
+            ["frames_1.png", "frames_2.png"],
+            os.listdir(self.dir + "/plots"))
+
+    def test_frame_range(self):
+        """Frame ranges start at the first number and stop before the
+        second"""
+        self.assertEqual(range(100, 200), rayleigh._frame_range("100:200"))
+        self.assertEqual(range(150, 151), rayleigh._frame_range("150"))
+        self.assertEqual(range(0, 5), rayleigh._frame_range(":5"))
+        self.assertIn(10 ** 9, rayleigh._frame_range("5:"))
+        for text in ["a:b", "1:2:3", ""]:
+            with self.assertRaises(argparse.ArgumentTypeError):
+                rayleigh._frame_range(text)
+
+    def test_mosaic_sizes_must_be_positive(self):
+        """--downsample and --columns take whole numbers of at least 1"""
+        self.assertEqual(2, rayleigh._positive_int("2"))
+        for text in ["0", "-2", "1.5", "x"]:
+            with self.assertRaises(argparse.ArgumentTypeError):
+                rayleigh._positive_int(text)
+        for option in ['--downsample', '--columns']:
+            with mock.patch('sys.stderr', new_callable=io.StringIO):
+                with self.assertRaises(SystemExit):
+                    self.interface._run(
+                        ['plot'] + self.test_args +
+                        [self.in_file_frame.name, '--mosaic', option, '0'])
+
     def test_multiple_files_single_figure(self):
         """Plotting multiple files on a single figure."""
         self.interface._run(
@@ -111,11 +182,218 @@ class TestInterfacePlotter(unittest.TestCase):
         actual = os.listdir(self.dir + "/plots")
         self.assertCountEqual(expected_contents, actual)
 
+    def test_multiple_files_write_each(self):
+        """Writing multiple files writes a heatmap for each file."""
+        self.interface._run(
+            ['plot'] + self.test_args +
+            [self.in_file_frame.name, self.in_file_frame2.name, '-w'])
+        expected_contents = [
+            os.path.basename(f.name) + ".png"
+            for f in [self.in_file_frame, self.in_file_frame2]]
+        actual = os.listdir(self.dir + "/plots")
+        self.assertCountEqual(expected_contents, actual)
+
+    def test_default_jobs(self):
+        """By default heatmaps are written in this process"""
+        self.assertEqual(1, self.plotparser.get_default('jobs'))
+
+    def test_multiple_files_write_one_image_when_viewed(self):
+        """Without --no-view, multiple files are written as one image."""
+        with mock.patch.object(rayleigh, '_import_pyplot'):
+            self.interface._run(
+                ['plot', self.in_file_frame.name, self.in_file_frame2.name,
+                 '-w'])
+        self.assertEqual(
+            [os.path.basename(self.in_file_frame.name) + ".png"],
+            os.listdir(self.dir + "/plots"))
+
+    def test_written_heatmaps_mask_hot_pixels(self):
+        """The heatmaps written are masked like the ones shown"""
+        occupancy = hotpixels.PixelOccupancy(min_frames=1)
+        occupancy.add([[1, 2, 1]])
+        occupancy_path = os.path.join(self.dir, hotpixels.OCCUPANCY_NAME)
+        hotpixels._write_occupancy(occupancy, occupancy_path)
+        for files in [[self.in_file_frame.name],
+                      [self.in_file_frame.name, self.in_file_frame2.name]]:
+            with self.subTest(files=len(files)):
+                with mock.patch.object(rayleigh, '_import_pyplot'), \
+                        mock.patch.object(plotter, '_write_heatmap') as write:
+                    self.interface._run(
+                        ['plot', '--write', '--hot-pixels', occupancy_path]
+                        + files)
+                _, axes, heatmaps = write.call_args[0][1]
+                if len(files) == 1:
+                    heatmaps = [heatmaps]
+                for heatmap in heatmaps:
+                    self.assertTrue(heatmap.get_array().mask[1, 2])
+
+    def test_multiple_files_write_in_workers(self):
+        """Writing multiple files with worker processes."""
+        self.interface._run(
+            ['plot'] + self.test_args +
+            [self.in_file_frame.name, self.in_file_frame2.name, '-w',
+             '--jobs', '2'])
+        expected_contents = [
+            os.path.basename(f.name) + ".png"
+            for f in [self.in_file_frame, self.in_file_frame2]]
+        actual = os.listdir(self.dir + "/plots")
+        self.assertCountEqual(expected_contents, actual)
+
+    def test_multiple_files_mosaic(self):
+        """Plotting multiple files as a mosaic."""
+        self.interface._run(
+            ['plot'] + self.test_args +
+            [self.in_file_frame.name, self.in_file_frame2.name,
+             '-w', '--mosaic', '--downsample', '2'])
+        expected_contents = [
+            os.path.basename(self.in_file_frame.name) + ".mosaic.png"]
+        actual = os.listdir(self.dir + "/plots")
+        self.assertCountEqual(expected_contents, actual)
+
     def test_no_arguments(self):
         """Should exit if no arguments provided."""
         with self.assertRaises(SystemExit):
             self.interface._run([])
 
+    def write_bad_frame(self):
+        """Helper - Write a frame file that cannot be read"""
+        bad_name = os.path.join(self.dir, "bad.json")
+        with open(bad_name, 'w') as f:
+            f.write("[[1, 2")
+        return bad_name
+
+    def test_thumbnails_exit_after_unreadable_files(self):
+        """Unreadable files are reported once the thumbnails are written"""
+        bad_name = self.write_bad_frame()
+        with mock.patch('sys.stdout', new_callable=io.StringIO), \
+                mock.patch('sys.stderr', new_callable=io.StringIO):
+            with self.assertRaises(SystemExit):
+                self.interface._run(
+                    ['plot', bad_name, self.in_file_frame.name,
+                     '--thumbnails'])
+        self.assertEqual(
+            [os.path.basename(self.in_file_frame.name) + ".png"],
+            os.listdir(os.path.join(self.dir, "thumbnails")))
+
+    def test_animation_exits_after_unreadable_files(self):
+        """Unreadable files are reported once the animation is written"""
+        bad_name = self.write_bad_frame()
+        output = os.path.join(self.dir, "run.raw")
+        with mock.patch('sys.stdout', new_callable=io.StringIO), \
+                mock.patch('sys.stderr', new_callable=io.StringIO):
+            with self.assertRaises(SystemExit):
+                self.interface._run(
+                    ['plot', bad_name, self.in_file_frame.name, '--animate',
+                     output, '--animation-format', 'raw'])
+        self.assertEqual(256 * 256 * 3, os.path.getsize(output))
+
+    def test_fps_must_be_positive(self):
+        self.assertEqual(2.5, rayleigh._positive_float("2.5"))
+        for text in ["0", "-10", "inf", "nan", "x"]:
+            with self.assertRaises(argparse.ArgumentTypeError):
+                rayleigh._positive_float(text)
+        with mock.patch('sys.stderr', new_callable=io.StringIO):
+            with self.assertRaises(SystemExit):
+                self.interface._run(
+                    ['plot', self.in_file_frame.name, '--animate',
+                     os.path.join(self.dir, "run.gif"), '--fps', '0'])
+
+    def test_jobs_must_not_be_negative(self):
+        """--jobs takes 0, for one worker per CPU, or more"""
+        self.assertEqual(0, rayleigh._non_negative_int("0"))
+        for text in ["-2", "1.5", "x"]:
+            with self.assertRaises(argparse.ArgumentTypeError):
+                rayleigh._non_negative_int(text)
+        for command in [['frame', self.dir], ['plot', self.dir],
+                        ['index', self.dir]]:
+            with mock.patch('sys.stderr', new_callable=io.StringIO):
+                with self.assertRaises(SystemExit):
+                    self.interface._run(command + ['--jobs', '-2'])
+
+    def test_command_errors_are_not_usage_errors(self):
+        """An AttributeError in a command is not taken as no command"""
+        with mock.patch.object(plotter, '_gen_heatmap_from_file',
+                               side_effect=AttributeError):
+            with self.assertRaises(AttributeError):
+                self.interface._run(
+                    ['plot'] + self.test_args + [self.in_file_frame.name])
+
+
+class TestLazyImports(unittest.TestCase):
+
+    """Commands only import the modules that they need"""
+
+    def get_loaded_modules(self, args):
+        """Helper - Run rayleigh in a new interpreter and list modules"""
+        code = (
+            "import sys\n"
+            "from analysis import rayleigh\n"
+            "try:\n"
+            "    rayleigh.RayleighApp()._run(sys.argv[1:])\n"
+            "except SystemExit:\n"
+            "    pass\n"
+            "print(' '.join(sorted(sys.modules)))\n")
+        output = subprocess.check_output(
+            [sys.executable, '-c', code] + args,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            universal_newlines=True)
+        return output.splitlines()[-1].split()
+
+    def test_version_does_not_import_plotting(self):
+        """Showing the version does not load matplotlib or NumPy"""
+        modules = self.get_loaded_modules(['--version'])
+        self.assertNotIn('matplotlib', modules)
+        self.assertNotIn('numpy', modules)
+
+    def test_frame_does_not_import_matplotlib(self):
+        """Converting frames does not load matplotlib"""
+        directory = tempfile.mkdtemp()
+        with open(os.path.join(directory, "data00.txt"), 'w') as f:
+            f.write("1 2 3")
+        modules = self.get_loaded_modules(['frame', directory])
+        shutil.rmtree(directory)
+        self.assertIn('analysis.frame_parser', modules)
+        self.assertNotIn('matplotlib', modules)
+
+    def test_thumbnails_do_not_import_matplotlib(self):
+        """Writing thumbnails does not load matplotlib"""
+        directory = tempfile.mkdtemp()
+        file_name = os.path.join(directory, "frame.json")
+        with open(file_name, 'w') as f:
+            f.write("[[1, 2, 3]]")
+        modules = self.get_loaded_modules(
+            ['plot', '--thumbnails', file_name])
+        written = os.listdir(os.path.join(directory, "thumbnails"))
+        shutil.rmtree(directory)
+        self.assertEqual(["frame.json.png"], written)
+        self.assertNotIn('matplotlib', modules)
+
+    def test_animate_does_not_import_matplotlib(self):
+        """Writing an animation does not load matplotlib"""
+        directory = tempfile.mkdtemp()
+        file_names = []
+        for k in range(2):
+            file_names.append(os.path.join(directory, "{}.json".format(k)))
+            with open(file_names[-1], 'w') as f:
+                f.write("[[1, 2, {}]]".format(k + 1))
+        output = os.path.join(directory, "run.gif")
+        modules = self.get_loaded_modules(
+            ['plot', '--animate', output] + file_names)
+        written = os.path.isfile(output)
+        shutil.rmtree(directory)
+        self.assertTrue(written)
+        self.assertNotIn('matplotlib', modules)
+
+    def test_animation_formats_match_animation(self):
+        from analysis import animation
+        self.assertCountEqual(
+            animation.ANIMATION_WRITERS, rayleigh.ANIMATION_FORMATS)
+
+    def test_output_formats_match_frame_parser(self):
+        """The frame command offers each of the frame parser formats"""
+        self.assertCountEqual(
+            frame_parser.OUTPUT_FORMATS, rayleigh.OUTPUT_FORMATS)
+
 
 class TestInterfaceFrame(unittest.TestCase):
 
@@ -168,6 +446,78 @@ class TestInterfaceFrame(unittest.TestCase):
         """There is no default output file"""
         self.assertEqual(None, self.optparser.get_default('output_file'))
 
+    def test_default_jobs(self):
+        """By default a directory is converted in a single process"""
+        self.assertEqual(1, self.optparser.get_default('jobs'))
+
+    def test_can_parse_directory_with_jobs(self):
+        """Can convert a directory with several worker processes"""
+        exp1, exp2 = get_expected_names([self.in_file1, self.in_file2])
+        self.interface._run(['frame', '--jobs', '2', self.dir])
+        self.assertCountEqual(
+            [exp1, exp2, "frames.json"], os.listdir(self.dir + "/output"))
+
+    def test_default_output_format(self):
+        """By default frames are converted to JSON"""
+        self.assertEqual('json', self.optparser.get_default('output_format'))
+
+    def test_can_parse_directory_to_binary_format(self):
+        """Can convert a directory to a binary output format"""
+        self.interface._run(['frame', '--format', 'npz', self.dir])
+        names = [os.path.splitext(n)[0] + ".npz" for n in get_base_names(
+            [self.in_file1, self.in_file2])]
+        self.assertCountEqual(
+            names + ["frames.npz"], os.listdir(self.dir + "/output"))
+
+    def test_incremental_conversion_writes_manifest(self):
+        """Incremental conversion keeps a manifest in the output"""
+        exp1, exp2 = get_expected_names([self.in_file1, self.in_file2])
+        self.interface._run(['frame', '--incremental', self.dir])
+        self.interface._run(['frame', '--incremental', '--force', self.dir])
+        self.assertCountEqual(
+            [exp1, exp2, "frames.json", "manifest.json"],
+            os.listdir(self.dir + "/output"))
+
+    def test_can_parse_directory_without_frame_files(self):
+        """Can convert a directory to only a frames file"""
+        self.interface._run(['frame', '--no-frame-files', self.dir])
+        self.assertEqual(["frames.json"], os.listdir(self.dir + "/output"))
+
+    def test_can_count_pixel_occupancy(self):
+        """Can count the pixel occupancy of a directory as it is converted"""
+        self.interface._run(['frame', '--occupancy', self.dir])
+        occupancy = hotpixels._read_occupancy(
+            os.path.join(self.dir, "output", rayleigh.OCCUPANCY_NAME))
+        self.assertEqual(2, occupancy.frames)
+
+    def test_occupancy_name_matches(self):
+        self.assertEqual(hotpixels.OCCUPANCY_NAME, rayleigh.OCCUPANCY_NAME)
+
+    def test_watch_requires_directory(self):
+        """Only directories can be watched"""
+        with self.assertRaises(SystemExit):
+            self.interface._run(['frame', '--watch', self.in_file1.name])
+
+    def test_watch_rejects_npz(self):
+        with mock.patch('sys.stdout', new_callable=io.StringIO) as out:
+            with self.assertRaises(SystemExit):
+                self.interface._run(
+                    ['frame', '--watch', '--format', 'npz', self.dir])
+        self.assertIn("npz", out.getvalue())
+
+    def test_watch_default_interval(self):
+        """By default the watched directory is checked every second"""
+        self.assertEqual(False, self.optparser.get_default('watch'))
+        self.assertEqual(1.0, self.optparser.get_default('interval'))
+
+    def test_exits_when_files_fail_to_convert(self):
+        """Exits once the batch is done if any file failed"""
+        with open(os.path.join(self.dir, "data05.txt"), 'w') as f:
+            f.write("not a frame")
+        with self.assertRaises(SystemExit):
+            self.interface._run(['frame', self.dir])
+        self.assertIn("frames.json", os.listdir(self.dir + "/output"))
+
     def test_can_parse_directory(self):
         """Can parse user file input and write"""
         exp1, exp2 = get_expected_names([self.in_file1, self.in_file2])
@@ -185,3 +535,165 @@ class TestInterfaceFrame(unittest.TestCase):
         """Exits with no arguments."""
         with self.assertRaises(SystemExit):
             rayleigh.main()
+
+
+class TestInterfaceCatalog(unittest.TestCase):
+
+    """Test the users' interface to the frame catalog"""
+
+    def setUp(self):
+        self.interface = rayleigh.RayleighApp()
+        self.dir = os.path.realpath(tempfile.mkdtemp())
+        self.catalog = os.path.join(self.dir, "catalog.db")
+        shutil.copy("tests/dsc_data.txt.dsc",
+                    os.path.join(self.dir, "data00.txt.dsc"))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_default_catalog(self):
+        """The commands share the catalog module's default catalog"""
+        self.assertEqual(
+            catalog.DEFAULT_CATALOG,
+            self.interface._parser_index.get_default('catalog'))
+        self.assertEqual(
+            catalog.DEFAULT_CATALOG,
+            self.interface._parser_query.get_default('catalog'))
+
+    def test_index_and_query(self):
+        """Can index a directory and query the catalog"""
+        self.interface._run(['index', self.dir, '--catalog', self.catalog])
+        self.assertEqual(
+            [os.path.join(self.dir, "data00.txt")],
+            catalog._query_catalog(self.catalog))
+        for name in ['bias_voltage', 'min_acquisition_time']:
+            self.assertIsNone(
+                self.interface._parser_query.get_default(name))
+        with mock.patch('sys.stdout', new_callable=io.StringIO) as out:
+            self.interface._run(
+                ['query', '--catalog', self.catalog, '--bias-voltage', '95',
+                 '--min-acquisition-time', '60'])
+        self.assertEqual(os.path.join(self.dir, "data00.txt\n"),
+                         out.getvalue())
+
+    def test_index_rejects_missing_directory(self):
+        with self.assertRaises(SystemExit):
+            self.interface._run(['index', self.dir + "/invalid"])
+
+    def test_query_missing_catalog(self):
+        with self.assertRaises(SystemExit):
+            self.interface._run(['query', '--catalog', self.catalog])
+
+
+class TestInterfaceStack(unittest.TestCase):
+
+    """Test the users' interface to frame stacking"""
+
+    def setUp(self):
+        self.interface = rayleigh.RayleighApp()
+        self.dir = tempfile.mkdtemp()
+        for k in range(3):
+            with open(os.path.join(self.dir, "data{}.txt".format(k)),
+                      'w') as f:
+                f.write("1 2 {}\n".format(k + 1))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_images_match_stack(self):
+        """The command offers each of the stack module's images"""
+        self.assertCountEqual(stack.STACK_IMAGES, rayleigh.STACK_IMAGES)
+
+    def test_stack_directory(self):
+        """Can stack a directory into an array file and a heatmap"""
+        output = os.path.join(self.dir, "run.npz")
+        with mock.patch('sys.stdout', new_callable=io.StringIO):
+            self.interface._run(['stack', self.dir, '-o', output])
+        with np.load(output) as data:
+            self.assertEqual(3, data['frames'])
+            self.assertEqual(6, data['sum'][1, 2])
+        self.assertTrue(os.path.isfile(os.path.join(self.dir, "run.png")))
+
+    def test_missing_path(self):
+        with self.assertRaises(SystemExit):
+            self.interface._run(['stack', self.dir + "/missing"])
+
+    def test_stack_without_hot_pixels(self):
+        """The hits of the hot pixels of an occupancy file are left out"""
+        os.mkdir(os.path.join(self.dir, "output"))
+        occupancy = hotpixels.PixelOccupancy(min_frames=1)
+        occupancy.add([[1, 2, 1]])
+        hotpixels._write_occupancy(occupancy, os.path.join(
+            self.dir, "output", hotpixels.OCCUPANCY_NAME))
+        output = os.path.join(self.dir, "run.npz")
+        with mock.patch('sys.stdout', new_callable=io.StringIO):
+            self.interface._run(
+                ['stack', self.dir, '-o', output, '--hot-pixels', self.dir])
+        with np.load(output) as data:
+            self.assertEqual(3, data['frames'])
+            self.assertEqual(0, data['sum'].sum())
+
+    def test_missing_hot_pixels(self):
+        with mock.patch('sys.stdout', new_callable=io.StringIO) as out:
+            with self.assertRaises(SystemExit):
+                self.interface._run(
+                    ['stack', self.dir, '--hot-pixels', self.dir])
+        self.assertIn("Failed to read hot pixels", out.getvalue())
+
+
+class TestInterfaceClusters(unittest.TestCase):
+
+    """Test the users' interface to cluster finding"""
+
+    def setUp(self):
+        self.interface = rayleigh.RayleighApp()
+        self.dir = tempfile.mkdtemp()
+        for k in range(3):
+            with open(os.path.join(self.dir, "data{}.txt".format(k)),
+                      'w') as f:
+                f.write("1 2 {}\n2 3 1\n9 9 1\n".format(k + 1))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_default_output_file(self):
+        self.assertEqual(
+            "clusters.csv",
+            self.interface._parser_clusters.get_default('output_file'))
+
+    def test_clusters_directory(self):
+        """Can write the clusters of a range of frames of a directory"""
+        output = os.path.join(self.dir, "clusters.csv")
+        with mock.patch('sys.stdout', new_callable=io.StringIO) as out:
+            self.interface._run(
+                ['clusters', self.dir, '-o', output, '--frames', '1:'])
+        self.assertIn("Found 4 cluster(s) in 2 frame(s)", out.getvalue())
+        with open(output) as f:
+            lines = f.read().splitlines()
+        self.assertEqual("1,2,3,1.333,2.333,1,2,2,3", lines[1])
+
+    def test_cluster_features_npz(self):
+        """Can write the features and classes of clusters to .npz"""
+        output = os.path.join(self.dir, "clusters.npz")
+        with mock.patch('sys.stdout', new_callable=io.StringIO):
+            self.interface._run(
+                ['clusters', self.dir, '-o', output, '--features'])
+        with np.load(output) as data:
+            self.assertEqual(6, len(data['class']))
+            self.assertEqual(
+                ['dot', 'dot'],
+                data['classes'][data['class'][:2]].tolist())
+
+    def test_other_extensions_write_csv(self):
+        output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_dir)
+        output = os.path.join(output_dir, "clusters.txt")
+        with mock.patch('sys.stdout', new_callable=io.StringIO):
+            self.interface._run(['clusters', self.dir, '-o', output])
+        with open(output) as f:
+            self.assertEqual("0,2,2,1.500,2.500,1,2,2,3",
+                             f.read().splitlines()[1])
+
+    def test_missing_path(self):
+        with self.assertRaises(SystemExit):
+            self.interface._run(['clusters', self.dir + "/missing"])
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# test_rejection.py
+
+import unittest
+
+import numpy as np
+import numpy.ma as ma
+
+from analysis import rejection
+from analysis import sparse
+
+
+def chauvenet(dense, outliers):
+    """Helper - Mask outliers as the plotter did for a dense frame"""
+    d_max = np.abs(dense - dense.mean()) / dense.std()
+    return ma.masked_array(dense, mask=d_max >= outliers)
+
+
+class TestRejection(unittest.TestCase):
+
+    """Tests for batch outlier rejection"""
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.frames = []
+        for num in [50, 1, 200, 30]:
+            pixels = rng.choice(256 * 256, num, replace=False)
+            self.frames.append(sparse.SparseFrame(
+                pixels // 256, pixels % 256, rng.randint(0, 100, num)))
+        # A frame with a single large outlier
+        self.frames.append(sparse.SparseFrame.from_hits(
+            [[k, k, 10 + k % 3] for k in range(20)] + [[100, 100, 1000]]))
+
+    def test_mask_outliers(self):
+        """Outliers are masked as the dense Chauvenet criterion does"""
+        filtered = rejection._mask_outliers(self.frames[-1], 3)
+        np.testing.assert_array_equal([False] * 20 + [True], filtered.mask)
+
+    def test_mask_outliers_constant(self):
+        """Frames with a single count have no outliers"""
+        frame = sparse.SparseFrame.from_hits([[1, 1, 5], [2, 2, 5]])
+        for method in rejection.OUTLIER_METHODS:
+            self.assertFalse(
+                rejection._mask_outliers(frame, 1, method).mask.any())
+
+    def test_sparse_batch_matches_dense_criterion(self):
+        """Each frame of a batch is filtered by its own statistics"""
+        filtered = rejection._mask_sparse_outliers(self.frames, 1)
+        for frame, result in zip(self.frames, filtered):
+            expected = chauvenet(frame.to_dense(), 1)
+            np.testing.assert_array_equal(
+                ma.getmaskarray(expected), result.to_dense().mask)
+
+    def test_stack_matches_sparse(self):
+        """Dense stacks and sparse frames give the same masks"""
+        for method in rejection.OUTLIER_METHODS:
+            stack = ma.stack([frame.to_dense() for frame in self.frames])
+            dense = rejection._mask_stack_outliers(stack, 1.5, method)
+            filtered = rejection._mask_sparse_outliers(
+                self.frames, 1.5, method)
+            for k, frame in enumerate(filtered):
+                np.testing.assert_array_equal(
+                    frame.to_dense().mask, dense[k].mask)
+
+    def test_masks_are_kept(self):
+        """Masked values stay masked and are left out of the statistics"""
+        frame = self.frames[-1].masked(np.array([False] * 20 + [True]))
+        filtered = rejection._mask_sparse_outliers([frame], 1.2)[0]
+        self.assertTrue(filtered.mask[-1])
+        # Without the outlier, the counts of 12 are 1.2 deviations out
+        np.testing.assert_array_equal(
+            [k % 3 == 2 for k in range(20)], filtered.mask[:20])
+        stack = ma.stack([frame.to_dense()])
+        self.assertTrue(
+            rejection._mask_stack_outliers(stack, 1.2)[0, 100, 100]
+            is ma.masked)
+
+    def test_median_is_robust(self):
+        """The median criterion finds outliers a large outlier hides"""
+        frame = sparse.SparseFrame.from_hits(
+            [[k, 0, 10] for k in range(10)] +
+            [[k, 1, 11] for k in range(10)] +
+            [[0, 2, 30], [0, 3, 100000]])
+        std = rejection._mask_outliers(frame, 3, 'std')
+        mad = rejection._mask_outliers(frame, 3, 'mad')
+        self.assertFalse(std.mask[-2])
+        self.assertTrue(mad.mask[-2])
+        self.assertTrue(mad.mask[-1])
+        self.assertFalse(mad.mask[:20].any())
+
+    def test_grouped_median(self):
+        values = np.array([5., 1., 3., 2., 8., 4.])
+        groups = np.array([0, 0, 0, 2, 2, 2])
+        np.testing.assert_array_equal(
+            [3., np.nan, 4.],
+            rejection._grouped_median(values, groups, 3))
+
+    def test_empty_batch(self):
+        self.assertEqual([], rejection._mask_sparse_outliers([], 1))
+
+    def test_unknown_method(self):
+        with self.assertRaises(ValueError):
+            rejection._mask_outliers(self.frames[0], 1, 'iqr')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# test_sparse.py
+
+import unittest
+
+import numpy as np
+import numpy.ma as ma
+
+from analysis import sparse
+
+
+class TestSparseFrame(unittest.TestCase):
+
+    """Tests for sparse frames"""
+
+    def setUp(self):
+        self.hits = [[1, 2, 3], [4, 5, 0], [255, 0, 9]]
+        self.frame = sparse.SparseFrame.from_hits(self.hits)
+
+    def test_from_hits(self):
+        """The coordinates and counts are split into columns"""
+        np.testing.assert_array_equal([1, 4, 255], self.frame.x)
+        np.testing.assert_array_equal([2, 5, 0], self.frame.y)
+        np.testing.assert_array_equal([3, 0, 9], self.frame.c)
+        self.assertEqual(3, len(self.frame))
+
+    def test_zero_counts_are_masked(self):
+        np.testing.assert_array_equal([False, True, False], self.frame.mask)
+        self.assertEqual(6, self.frame.values.mean())
+
+    def test_empty_frame(self):
+        frame = sparse.SparseFrame.from_hits([])
+        self.assertEqual(0, len(frame))
+        self.assertTrue(frame.to_dense().mask.all())
+
+    def test_to_dense(self):
+        """Densifying places the counts and masks the other pixels"""
+        dense = self.frame.to_dense()
+        self.assertEqual((256, 256), dense.shape)
+        self.assertEqual(3, dense[1, 2])
+        self.assertEqual(9, dense[255, 0])
+        self.assertIs(ma.masked, dense[4, 5])
+        self.assertEqual(2, dense.count())
+
+    def test_masked(self):
+        """Masking a hit leaves the original frame unchanged"""
+        masked = self.frame.masked(np.array([True, False, False]))
+        np.testing.assert_array_equal([True, True, False], masked.mask)
+        np.testing.assert_array_equal([False, True, False], self.frame.mask)
+        self.assertEqual(1, masked.to_dense().count())
+
+    def test_smaller_than_dense(self):
+        self.assertLess(self.frame.nbytes * 100,
+                        self.frame.to_dense().nbytes)
+
+    def test_to_dense_passes_arrays(self):
+        dense = self.frame.to_dense()
+        self.assertIs(dense, sparse._to_dense(dense))
+
+
+if __name__ == '__main__':
+    unittest.main()
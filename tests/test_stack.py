@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# test_stack.py
+
+import unittest
+import tempfile
+import os
+import shutil
+
+import numpy as np
+
+from analysis import frame_parser as fp
+from analysis import sparse
+from analysis import stack
+
+
+class TestFrameStack(unittest.TestCase):
+
+    """Tests for integrating frames"""
+
+    def setUp(self):
+        self.frames = [
+            [[0, 0, 5], [1, 2, 3]],
+            [[0, 0, 7]],
+            [[255, 255, 1], [1, 2, 1]]]
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_stack_frames(self):
+        """The sum, mean, max and hit count images are accumulated"""
+        result = stack._stack_frames(iter(self.frames))
+        self.assertEqual(3, result.frames)
+        self.assertEqual(12, result.sum[0, 0])
+        self.assertEqual(4, result.sum[1, 2])
+        self.assertEqual(4.0, result.mean[0, 0])
+        self.assertEqual(7, result.max[0, 0])
+        self.assertEqual(3, result.max[1, 2])
+        self.assertEqual(2, result.hits[1, 2])
+        self.assertEqual(1, result.hits[255, 255])
+        self.assertEqual(5, result.hits.sum())
+        self.assertEqual(17, result.sum.sum())
+
+    def test_stack_sparse_frames(self):
+        """The masked hits of sparse frames are not stacked"""
+        frames = [sparse.SparseFrame.from_hits(frame)
+                  for frame in self.frames]
+        frames[1] = frames[1].masked(np.array([True]))
+        result = stack._stack_frames(frames)
+        self.assertEqual(5, result.sum[0, 0])
+        self.assertEqual(1, result.hits[0, 0])
+        self.assertEqual(10, result.sum.sum())
+
+    def test_empty_stack(self):
+        """A stack of no frames has empty images"""
+        result = stack._stack_frames([])
+        self.assertEqual(0, result.frames)
+        self.assertEqual((256, 256), result.mean.shape)
+        self.assertFalse(result.mean.any())
+
+    def test_unknown_image(self):
+        with self.assertRaises(ValueError):
+            stack.FrameStack().image('median')
+
+    def test_rejects_hits_outside_frame(self):
+        """Hits off the pixels are an error rather than wrapping around"""
+        for hit in [[256, 0, 1], [0, 300, 1], [-1, 0, 1]]:
+            with self.subTest(hit=hit):
+                with self.assertRaises(ValueError):
+                    stack.FrameStack().add([[1, 2, 3], hit])
+
+    def test_iter_input_frames(self):
+        """Frames are read from directories, archives and frame files"""
+        for k, frame in enumerate(self.frames):
+            with open(os.path.join(self.dir, "data{}.txt".format(k)),
+                      'w') as f:
+                f.write("\n".join(" ".join(map(str, hit)) for hit in frame))
+        archive = os.path.join(self.dir, "run.rla")
+        with fp._ArchiveFramesWriter(archive) as writer:
+            for frame in self.frames:
+                writer.write(frame)
+        single = os.path.join(self.dir, "single.npz")
+        fp._write_frame(self.frames[0], single, 'npz')
+        frames = list(stack._iter_input_frames([self.dir, archive, single]))
+        self.assertEqual(7, len(frames))
+        for expected, frame in zip(self.frames * 2 + self.frames[:1],
+                                   frames):
+            np.testing.assert_array_equal(expected, frame)
+
+    def test_write_stack(self):
+        """The images are written to an .npz file and a heatmap"""
+        result = stack._stack_frames(self.frames)
+        file_name = os.path.join(self.dir, "stack.npz")
+        stack._write_stack(result, file_name)
+        with np.load(file_name) as data:
+            self.assertEqual(3, data['frames'])
+            for name in stack.STACK_IMAGES:
+                np.testing.assert_array_equal(result.image(name), data[name])
+        other_name = os.path.join(self.dir, "stack.images")
+        stack._write_stack(result, other_name)
+        with np.load(other_name) as data:
+            self.assertEqual(3, data['frames'])
+        heatmap = os.path.join(self.dir, "stack.png")
+        stack._write_stack_heatmap(result, heatmap, 'max')
+        self.assertTrue(os.path.isfile(heatmap))
+
+
+if __name__ == '__main__':
+    unittest.main()